@@ -10,7 +10,6 @@ import numpy as np
 import random
 import copy
 from collections import namedtuple, deque
-from itertools import compress
 import torch
 import torch.nn.functional as F
 import torch.optim as optim
@@ -19,7 +18,7 @@ from agents.ddpg.model import Actor, Critic
 from agents.utils.replay_buffer import DequeReplayBuffer
 
 from env.cards import Cards
-from env.deck import Deck
+from env.codec import cards_to_vec, vec_to_cards
 
 # Hyperparameter
 # -- Replay Buffer ------
@@ -260,8 +259,23 @@ class DDPGAgent():
         self.critic_local.load_state_dict(checkpoint['critic_state_dict'])
         print(filepath + ' successfully loaded.')
 
+    @staticmethod
+    def _row_cards(state, idx):
+        """
+        Returns the Cards vector of row idx of a state.
+
+        Rows of array states (Env(array_state=True)) are flat:
+        [hand_size, tichu_flag, cards...], list state rows are nested.
+        """
+        if isinstance(state, np.ndarray):
+            return state[idx, 2:]
+        return state[idx][2]
+
     def _flatten_state(self, state):
         """ A state flattening function. (TODO: make more pythonic) """
+        # array states are already laid out flat
+        if isinstance(state, np.ndarray):
+            return state.reshape(-1).astype('int32')
         flattened_list = [item for sublist in state for item in sublist]
         flattened_state = []
         for elem in flattened_list:
@@ -312,7 +326,8 @@ class DDPGAgent():
         conv_state = []
         conv_state.append(state_vec[0][0]) # Hand Size
         conv_state.append(state_vec[0][1]) # Tichu Flag
-        conv_state.append(suitless_enc(state_vec[0][2])) # suitless hand
+        # suitless hand
+        conv_state.append(suitless_enc(self._row_cards(state_vec, 0)))
         # get second part of state: leading player perspective
         if leading_idx == 0:
             leading_size = 0
@@ -321,7 +336,8 @@ class DDPGAgent():
         else:
             leading_size = leading_cards.size
             leading_tichu = state_vec[leading_idx][1]
-            leading_suitless = suitless_enc(state_vec[leading_idx][2])
+            leading_suitless = suitless_enc(
+                self._row_cards(state_vec, leading_idx))
         conv_state.append(is_opponent) # opponent yes/no
         conv_state.append(leading_size) # hand size
         conv_state.append(leading_tichu) # tichu flag
@@ -348,7 +364,7 @@ class DDPGAgent():
         # encode regular cards:
         for i in range(13):
             card_count = suitless_action[i]
-            available_cards = default_state[0][2][i*4:i*4+4]
+            available_cards = self._row_cards(default_state, 0)[i*4:i*4+4]
             if card_count == 0:
                 pass
             elif sum(available_cards) < card_count:
@@ -404,7 +420,7 @@ class DDPGAgent():
             action = self._cards_to_vec(Cards([]))
             return action
         # try to beat if action is "beat"
-        hand_cards = self._vec_to_cards(default_state[0][2])
+        hand_cards = self._vec_to_cards(self._row_cards(default_state, 0))
         available_combs = hand_cards.get_available_combinations()
         leading_idx, is_opponent, leading_cards, leading_type = \
           self._get_info_from_state(default_state)
@@ -512,10 +528,10 @@ class DDPGAgent():
         """
         state_vec = default_state
         # get info from full state
-        hand_cards = self._vec_to_cards(state_vec[0][2])
-        opp_cards_0 = self._vec_to_cards(state_vec[1][2])
-        teammate_cards = self._vec_to_cards(state_vec[2][2])
-        opp_cards_1 = self._vec_to_cards(state_vec[3][2])
+        hand_cards = self._vec_to_cards(self._row_cards(state_vec, 0))
+        opp_cards_0 = self._vec_to_cards(self._row_cards(state_vec, 1))
+        teammate_cards = self._vec_to_cards(self._row_cards(state_vec, 2))
+        opp_cards_1 = self._vec_to_cards(self._row_cards(state_vec, 3))
         # determine leading cards
         # new stack
         if (teammate_cards.type == 'pass' and opp_cards_0.type == 'pass' and 
@@ -543,13 +559,7 @@ class DDPGAgent():
         return leading_idx, is_opponent, leading_cards, leading_type
 
     def _cards_to_vec(self, cards):
-        all_cards = Deck().all_cards
-        vec = np.zeros(len(all_cards), int)
-        for i in range(len(all_cards)):
-            crd = Cards([all_cards[i]])
-            if cards.contains(crd):
-                vec[i] = 1
-        return vec.tolist()
+        return cards_to_vec(cards)
 
     def _vec_to_cards(self, vec):
-        return Cards(list(compress(Deck().all_cards, vec)))
+        return vec_to_cards(vec)
@@ -2,10 +2,11 @@
 # Always tries to win a stack except teammate is leading
 
 import random
+
 import numpy as np
-from itertools import compress
 
 from tichuagent.env.cards import Cards 
+from tichuagent.env.codec import cards_to_vec, vec_to_cards
 from tichuagent.env.deck import Deck
 
 COMB_TYPES = {'solo': 0,
@@ -23,16 +24,15 @@ class greedyAgent():
         self.all_cards = Deck().all_cards
 
     def act(self, state_vec):
+        # rows of array states (Env(array_state=True)) are flat
+        if isinstance(state_vec, np.ndarray):
+            state_vec = [(row[0], row[1], row[2:]) for row in state_vec]
         # get info from state
         hand_size = state_vec[0][0]
         hand_cards = self._vec_to_cards(state_vec[0][2])
         opp_cards_0 = self._vec_to_cards(state_vec[1][2])
         teammate_cards = self._vec_to_cards(state_vec[2][2])
         opp_cards_1 = self._vec_to_cards(state_vec[3][2])
-        # get available combinations and types from hand cards
-        # returns [solo, pair, triple, four_bomb, full, straight, straight_bomb, pair_seq]
-        available_comb = hand_cards.get_available_combinations()
-        available_types = self._get_available_types(available_comb)
         # pass if player has already finished
         if hand_size < 1:
             action = self._cards_to_vec(Cards([]))
@@ -43,8 +43,9 @@ class greedyAgent():
             return action
         # if stack is empty, play lowest power of a random combination type
         elif teammate_cards.type == 'pass' and opp_cards_0.type == 'pass' and opp_cards_1.type == 'pass':
-            random_type = COMB_TYPES[random.choice(available_types)]
-            action = self._cards_to_vec(available_comb[random_type][0])
+            lowest_comb = self._get_lowest_combinations(hand_cards)
+            random_type = random.choice(list(lowest_comb))
+            action = self._cards_to_vec(lowest_comb[random_type])
             return action
         # else try to beat opponent 
         else:
@@ -57,46 +58,41 @@ class greedyAgent():
                 leading_type = opp_cards_1.type
                 leading_size = opp_cards_1.size
                 leading_power = opp_cards_1.power 
-            type_index = COMB_TYPES[leading_type]
             # check if leading type is available and can be beaten
-            if available_comb[type_index]:
-                for crds in available_comb[type_index]:
+            if next(hand_cards.iter_combinations(leading_type), None) is not None:
+                for crds in hand_cards.iter_combinations(leading_type, leading_power, leading_size):
                     if crds.cards[0].name == 'Dog': # Dog can only be played alone
                         pass
-                    elif crds.power > leading_power and crds.size == leading_size:
+                    else:
                         action = self._cards_to_vec(crds)
                         return action
                 # pass if no higher combination available
                 action = self._cards_to_vec(Cards([]))
                 return action
             # if no combination exists, try to four bomb or straight bomb
-            elif available_comb[COMB_TYPES['four_bomb']] and not(leading_type == 'straight_bomb'):
-                bomb = available_comb[COMB_TYPES['four_bomb']][0]
-                action = self._cards_to_vec(bomb)
+            four_bomb = next(hand_cards.iter_combinations('four_bomb'), None)
+            if four_bomb is not None and not(leading_type == 'straight_bomb'):
+                action = self._cards_to_vec(four_bomb)
                 return action
-            elif available_comb[COMB_TYPES['straight_bomb']]:
-                bomb = available_comb[COMB_TYPES['straight_bomb']][0]
-                action = self._cards_to_vec(bomb)
+            straight_bomb = next(hand_cards.iter_combinations('straight_bomb'), None)
+            if straight_bomb is not None:
+                action = self._cards_to_vec(straight_bomb)
                 return action
             # pass if opponent cannot be beaten
-            else:
-                action = self._cards_to_vec(Cards([]))
-                return action
+            action = self._cards_to_vec(Cards([]))
+            return action
 
-    def _get_available_types(self, available_comb):
-        available_types = list()
-        for key, value in COMB_TYPES.items():
-            if available_comb[value]:
-                available_types.append(key)
-        return available_types
+    def _get_lowest_combinations(self, hand_cards):
+        # lowest combination of each available type, in order of COMB_TYPES
+        lowest_comb = dict()
+        for comb_type in COMB_TYPES:
+            crds = next(hand_cards.iter_combinations(comb_type), None)
+            if crds is not None:
+                lowest_comb[comb_type] = crds
+        return lowest_comb
 
     def _cards_to_vec(self, cards):
-        vec = np.zeros(len(self.all_cards), int)
-        for i in range(len(self.all_cards)):
-            crd = Cards([self.all_cards[i]])
-            if cards.contains(crd):
-                vec[i] = 1
-        return vec.tolist()
+        return cards_to_vec(cards)
 
     def _vec_to_cards(self, vec):
-        return Cards(list(compress(self.all_cards, vec)))
+        return vec_to_cards(vec)
@@ -0,0 +1,341 @@
+""" This module contains a batch of Tichu games stepped in lockstep. """
+
+import random
+
+import numpy as np
+
+from env import game
+from env.cards import (COMB_TYPES, DOG_MASK, DRAGON_MASK, MAJONG_MASK,
+                       PHOENIX_MASK)
+from env.classifier import classify
+from env.codec import BIT_WEIGHTS, masks_to_vecs
+from env.kernel import (GameKernel, EMPTY_STACK, LEADING, ACTIVE, PASSES,
+                        OVER, TYPE, SIZE, POWER, POINTS, DRAGON, N_PLAYED,
+                        SOLO, STRAIGHT, PAIR_SEQ, FOUR_BOMB, STRAIGHT_BOMB,
+                        INVALID_MOVE, PLAYED, PASSED, STACK_WON)
+from env.move_table import count_masks, get_move_table
+from env.player import rate_hand
+
+
+class BatchGame():
+    """
+    A batch of Tichu games held in NumPy arrays and stepped in lockstep.
+
+    The state arrays have the layout of GameKernel with one row per
+    game. step() applies one move per game: plays and passes are
+    applied to all games at once, the rare steps that play the Dog,
+    finish a Player or win a Dragon stack are applied by a GameKernel
+    upon the rows of the game, so that all games follow the rules of
+    Game. Finished games are dealt again after each step.
+    Tichu is called at deal time like in Game (hand rating above
+    TICHU_THRESHOLD, unless the teammate has called), the kernel
+    settles the calls when the first Player finishes.
+
+    Attributes
+    ----------
+    n_games: int
+      The number of games in the batch.
+    hands: np.ndarray of int64
+      The card masks of the hands, shape (n_games, 4).
+    points, tichu, tichu_points, finished: np.ndarray of int64
+      The points, Tichu flags, Tichu points and finish order of the
+      Players, shape (n_games, 4).
+    turn: np.ndarray of int64
+      The turn data of each game, shape (n_games, 5).
+    stack: np.ndarray of int64
+      The stack data of each game, shape (n_games, 6).
+    reward: np.ndarray of int64
+      The points of each Player in the last step, shape (n_games, 4).
+    done: np.ndarray of bool
+      Whether each game finished in the last step (and was reset).
+
+    Methods
+    -------
+    reset(rows):
+      Deals new games in the given rows (all rows if None).
+    step(actions):
+      Makes one move (a card mask, 0 is a pass) in each game.
+    legal_entries():
+      Returns the move table entries the active Players can play.
+    random_actions():
+      Returns a random legal move for each game.
+    greedy_actions():
+      Returns a move for each game by the policy of play_dumb_game().
+    """
+
+    def __init__(self, n_games, seed=None):
+        """
+        Constructs a batch of n_games newly dealt games.
+
+        Parameter
+        ---------
+        n_games: int
+          The number of games in the batch.
+        seed: int
+          The seed of the random generator used for dealing (optional).
+        """
+        self.n_games = n_games
+        self.hands = np.zeros((n_games, 4), dtype=np.int64)
+        self.points = np.zeros((n_games, 4), dtype=np.int64)
+        self.tichu = np.zeros((n_games, 4), dtype=np.int64)
+        self.tichu_points = np.zeros((n_games, 4), dtype=np.int64)
+        self.finished = np.zeros((n_games, 4), dtype=np.int64)
+        self.turn = np.zeros((n_games, 5), dtype=np.int64)
+        self.stack = np.zeros((n_games, 6), dtype=np.int64)
+        self.reward = np.zeros((n_games, 4), dtype=np.int64)
+        self.done = np.zeros(n_games, dtype=bool)
+        self._rows = np.arange(n_games)
+        self._rng = np.random.default_rng(seed)
+        # move table arrays for legal_entries()
+        table = get_move_table()
+        self._table = table
+        self._powers = np.rint(table.powers * 10).astype(np.int64)
+        self._dog = table.entry_index[(DOG_MASK, SOLO)]
+        self._phoenix = table.entry_index[(PHOENIX_MASK, SOLO)]
+        self._power_order = np.argsort(table.powers, kind='stable')
+        self.reset()
+
+    def reset(self, rows=None):
+        """ Deals new games in the given rows (all rows if None). """
+        if rows is None:
+            rows = self._rows
+        rows = np.asarray(rows)
+        if rows.dtype == bool:
+            rows = np.flatnonzero(rows)
+        # a random permutation of the deck, 14 Cards per Player
+        deck = self._rng.random((len(rows), 56)).argsort(axis=1)
+        weights = BIT_WEIGHTS.astype(np.int64)[deck].reshape(-1, 4, 14)
+        self.hands[rows] = weights.sum(axis=2)
+        self.points[rows] = 0
+        self.tichu[rows] = 0
+        self.tichu_points[rows] = 0
+        self.finished[rows] = -1
+        self.turn[rows] = 0
+        self.turn[rows, LEADING] = -1
+        # Player with Majong starts
+        self.turn[rows, ACTIVE] = np.argmax(
+            (self.hands[rows] & MAJONG_MASK) != 0, axis=1)
+        self.stack[rows] = EMPTY_STACK
+        self._call_tichu(rows)
+
+    def _call_tichu(self, rows):
+        """ Calls Tichu in newly dealt games like Game.__init__(). """
+        tichu_threshold = game.TICHU_THRESHOLD
+        hands = self.hands[rows].tolist()
+        actives = self.turn[rows, ACTIVE].tolist()
+        for row, hand, active in zip(rows.tolist(), hands, actives):
+            # starting from active player, teammate has not called yet
+            for i in range(4):
+                pid = (active+i) % 4
+                if self.tichu[row, (pid+2) % 4]:
+                    continue
+                if rate_hand(hand[pid]) > tichu_threshold:
+                    self.tichu[row, pid] = 1
+
+    def step(self, actions):
+        """
+        Makes one move of the active Player in each game.
+
+        actions holds one card mask per game, 0 is a pass. Returns the
+        step code of each game (see env.kernel), the points of the step
+        are written to reward. Games that finished in this step are
+        marked in done and dealt again.
+        """
+        actions = np.asarray(actions, dtype=np.int64)
+        turn = self.turn
+        stack = self.stack
+        self.reward.fill(0)
+        codes = np.full(self.n_games, INVALID_MOVE, dtype=np.int64)
+        active = turn[:, ACTIVE].copy()
+        hands = self.hands[self._rows, active]
+        passing = actions == 0
+        in_hand = (actions & hands) == actions
+        # rare steps are made by the kernel: Dog, finishing moves and
+        # passes that win a Dragon stack
+        rare = ((actions == DOG_MASK) | (in_hand & ~passing &
+                                         (actions == hands)) |
+                (passing & (stack[:, TYPE] >= 0) & (stack[:, DRAGON] != 0) &
+                 (turn[:, PASSES] >= 2)))
+        self._pass(passing & ~rare, codes)
+        self._play(np.flatnonzero(~passing & ~rare & in_hand), actions,
+                   codes)
+        for row in np.flatnonzero(rare).tolist():
+            codes[row] = self._kernel(row).step(int(active[row]),
+                                                int(actions[row]))
+        # deal finished games again
+        self.done = turn[:, OVER] != 0
+        if self.done.any():
+            self.reset(self.done)
+        return codes
+
+    def _pass(self, passing, codes):
+        """ Changes the state of the games in which a Player passes. """
+        turn = self.turn
+        stack = self.stack
+        # pass is not possible on an empty stack
+        passing &= stack[:, TYPE] >= 0
+        turn[passing, PASSES] += 1
+        won = passing & (turn[:, PASSES] >= 3)
+        goes_on = passing & ~won
+        turn[goes_on, ACTIVE] = (turn[goes_on, ACTIVE] + 1) % 4
+        codes[goes_on] = PASSED
+        # the leading Player wins the stack (without Dragon)
+        rows = np.flatnonzero(won)
+        leading = turn[rows, LEADING]
+        self.points[rows, leading] += stack[rows, POINTS]
+        self.reward[rows, leading] = stack[rows, POINTS]
+        stack[rows] = EMPTY_STACK
+        # the next Player who has not finished leads
+        leading = self._next_open(rows, leading)
+        turn[rows, LEADING] = leading
+        turn[rows, ACTIVE] = leading
+        turn[rows, PASSES] = 0
+        codes[rows] = STACK_WON
+
+    def _next_open(self, rows, pids):
+        """ Returns the first of pids and successors with Cards left. """
+        result = (pids + 3) % 4
+        for offset in (2, 1, 0):
+            pid = (pids + offset) % 4
+            result = np.where(self.hands[rows, pid] != 0, pid, result)
+        return result
+
+    def _play(self, rows, actions, codes):
+        """ Changes the state of the games in which Cards are played. """
+        turn = self.turn
+        stack = self.stack
+        actions = actions[rows]
+        types, powers, sizes, points = classify(masks_to_vecs(actions))
+        types = types.astype(np.int64)
+        powers = np.rint(powers * 10).astype(np.int64)
+        # same checks as Stack.add()
+        stack_type = stack[rows, TYPE]
+        stack_power = stack[rows, POWER]
+        combination = types < len(COMB_TYPES)
+        higher = (stack_type == types) & (stack_power < powers)
+        same_length = (((types != STRAIGHT) & (types != PAIR_SEQ)) |
+                       (stack[rows, SIZE] == sizes))
+        phoenix = ((stack_type == SOLO) & (actions == PHOENIX_MASK) &
+                   (stack_power < 150))
+        bomb = (((types == FOUR_BOMB) | (types == STRAIGHT_BOMB)) &
+                (stack_power < powers))
+        valid = combination & ((stack_type < 0) |
+                               (higher & same_length) |
+                               (~higher & (phoenix | bomb)))
+        powers = np.where(~higher & phoenix, stack_power + 5, powers)
+        rows, actions = rows[valid], actions[valid]
+        # add cards to stack
+        stack[rows, TYPE] = types[valid]
+        stack[rows, SIZE] = sizes[valid]
+        stack[rows, POWER] = powers[valid]
+        stack[rows, POINTS] += points[valid]
+        stack[rows, DRAGON] |= (actions & DRAGON_MASK) != 0
+        stack[rows, N_PLAYED] += 1
+        # next active player, remove cards from hand
+        player_ids = turn[rows, ACTIVE]
+        turn[rows, LEADING] = player_ids
+        turn[rows, ACTIVE] = (player_ids + 1) % 4
+        turn[rows, PASSES] = 0
+        self.hands[rows, player_ids] ^= actions
+        codes[rows] = PLAYED
+
+    def _kernel(self, row):
+        """ Returns a GameKernel upon the state arrays of a game. """
+        return GameKernel.from_arrays(
+            self.hands[row], self.points[row], self.tichu[row],
+            self.tichu_points[row], self.finished[row], self.turn[row],
+            self.stack[row], self.reward[row])
+
+    def legal_entries(self):
+        """
+        Returns the move table entries the active Players can play.
+
+        The result is an (n_games, table size) boolean array. It is
+        found by a subset test of rank counts, so a few entries of
+        straights and straight bombs may not be available in a suit
+        (MoveTable.draw() returns None for them). Passing is not
+        included, it is legal whenever the stack is not empty.
+        """
+        table = self._table
+        hands = self.hands[self._rows, self.turn[:, ACTIVE]]
+        missing = ~count_masks(hands)
+        legal = (table.need[None, :] & missing[:, None]) == 0
+        stack_type = self.stack[:, TYPE, None]
+        stack_power = self.stack[:, POWER, None]
+        types = table.types[None, :]
+        powers = self._powers[None, :]
+        # same type and higher power (equal length for sequences)
+        same = ((types == stack_type) & (powers > stack_power) &
+                (((stack_type != STRAIGHT) & (stack_type != PAIR_SEQ)) |
+                 (table.sizes[None, :] == self.stack[:, SIZE, None])))
+        # Dog can only be played as first card
+        same[:, self._dog] = False
+        # Phoenix can be played on solo (except Dragon)
+        same[:, self._phoenix] |= ((stack_type[:, 0] == SOLO) &
+                                   (stack_power[:, 0] < 150))
+        # bombs can be played any time
+        bombs = (((types == FOUR_BOMB) | (types == STRAIGHT_BOMB)) &
+                 (types != stack_type) & (powers > stack_power))
+        legal &= (stack_type < 0) | same | bombs
+        return legal
+
+    def random_actions(self):
+        """
+        Returns a random legal move for each game.
+
+        Each legal move table entry and passing (if legal) are equally
+        likely, the Cards of an entry are drawn uniformly.
+        """
+        return self._random_actions(self.legal_entries(), self._rows)
+
+    def greedy_actions(self):
+        """
+        Returns a move for each game by the policy of play_dumb_game().
+
+        Finished Players and Players whose teammate leads pass. On an
+        empty stack a random move is played, otherwise the legal move
+        with the lowest power (or a pass, if there is none).
+        """
+        legal = self.legal_entries()
+        active = self.turn[:, ACTIVE]
+        empty = self.stack[:, TYPE] < 0
+        actions = self._random_actions(legal, np.flatnonzero(empty))
+        opponent = ~empty & ((active + self.turn[:, LEADING]) % 2 == 1)
+        rows = np.flatnonzero(opponent)
+        hands = self.hands[rows, active[rows]].tolist()
+        by_power = legal[rows][:, self._power_order]
+        for row, hand, entries in zip(rows.tolist(), hands,
+                                      self._entry_lists(by_power)):
+            for pos in entries:
+                mask = self._table.draw(int(self._power_order[pos]), hand)
+                if mask is not None:
+                    actions[row] = mask
+                    break
+        return actions
+
+    def _random_actions(self, legal, rows):
+        """ Returns random legal moves in rows, passes in all others. """
+        actions = np.zeros(self.n_games, dtype=np.int64)
+        hands = self.hands[rows, self.turn[rows, ACTIVE]].tolist()
+        can_pass = (self.stack[rows, TYPE] >= 0).tolist()
+        for row, hand, passing, entries in zip(
+                rows.tolist(), hands, can_pass,
+                self._entry_lists(legal[rows])):
+            while entries:
+                pick = random.randrange(len(entries) + passing)
+                if pick == len(entries):
+                    break
+                mask = self._table.draw(entries[pick], hand)
+                if mask is not None:
+                    actions[row] = mask
+                    break
+                entries[pick] = entries[-1]
+                entries.pop()
+        return actions
+
+    @staticmethod
+    def _entry_lists(legal):
+        """ Returns the indices of the True entries of each row. """
+        rows, entries = np.nonzero(legal)
+        splits = np.searchsorted(rows, np.arange(1, len(legal)))
+        return [part.tolist() for part in np.split(entries, splits)]
@@ -1,7 +1,5 @@
 """ This module contains a class to represent a Tichu Card. """
 
-import hashlib
-
 SUITS = {'Spade':'♠',
          'Heart':'♡',
          'Dia':'♢',
@@ -25,10 +23,24 @@ CARD_VALUES = {'2': 2,
                'Majong': 1,
                'Dog': 0.9}
 
+# Canonical order of all Cards in a Tichu deck (same as Deck.all_cards).
+# The position of a Card in this order is its index in the 56-bit mask
+# and 56-dim vector representations of Cards.
+RANK_NAMES = ['2', '3', '4', '5', '6', '7', '8', '9', '10',
+              'J', 'Q', 'K', 'A']
+SPECIAL_NAMES = ['Phoenix', 'Dragon', 'Majong', 'Dog']
+CARD_ORDER = ([(name, suit) for name in RANK_NAMES for suit in SUITS] +
+              [(name, 'Special') for name in SPECIAL_NAMES])
+CARD_INDEX = {key: idx for idx, key in enumerate(CARD_ORDER)}
+
 class Card():
     """
     A class to represent a Tichu Card.
 
+    There is exactly one immutable instance per Card in a Tichu deck:
+    Card(name, suit) always returns the same (interned) object, so that
+    Cards can be compared by identity and hashed by their index.
+
     Inspired by the following sources:
     - https://github.com/hundredblocks/ticher
     - https://github.com/sylee421/TichuRL
@@ -45,15 +57,25 @@ class Card():
     points: int
       The points of the card.
       In Tichu, only 5, 10, K, Phoenix and Dragon give points.
+    index: int
+      The position of the Card in the canonical deck order (0...55).
+    mask: int
+      The Card as a single bit of a 56-bit mask (1 << index).
     image: str
-      A nice visualization when printing the card.
+      A nice visualization when printing the card (built on first use).
       Depending on the device, this may need to be adapted.
 
     """
 
-    def __init__(self, name=None, suit=None):
+    __slots__ = ('name', 'suit', 'special_card', 'power', 'points',
+                 'index', 'mask', '_image')
+
+    # interned instances, indexed by position in canonical deck order
+    _instances = [None] * len(CARD_ORDER)
+
+    def __new__(cls, name=None, suit=None):
         """
-        Constructs a Tichu card.
+        Returns the Tichu card (constructed on first use).
 
         Parameter
         ----------
@@ -63,43 +85,82 @@ class Card():
         suit: str
           One of the following: Spade, Heart, Dia(mond), Club or Special.
         """
-        self.name = name
-        self.suit = suit
-        self.special_card = (suit == 'Special')
-        self.power = CARD_VALUES[self.name]
-        self.points = 0
-
+        index = CARD_INDEX[(name, suit)]
+        card = cls._instances[index]
+        if card is not None:
+            return card
+        card = super().__new__(cls)
         # Tichu rules: only cards 5, 10 and K give points
-        if self.name == '5':
-            self.points = 5
-        elif self.name == '10' or self.name == 'K':
-            self.points = 10
-        elif self.name == 'Dragon':
-            self.points = 25
-        elif self.name == 'Phoenix':
-            self.points = -25
-
-        # card image is used for visualization
+        points = 0
+        if name == '5':
+            points = 5
+        elif name == '10' or name == 'K':
+            points = 10
+        elif name == 'Dragon':
+            points = 25
+        elif name == 'Phoenix':
+            points = -25
+        for attr, value in (('name', name),
+                            ('suit', suit),
+                            ('special_card', suit == 'Special'),
+                            ('power', CARD_VALUES[name]),
+                            ('points', points),
+                            ('index', index),
+                            ('mask', 1 << index),
+                            ('_image', None)):
+            object.__setattr__(card, attr, value)
+        cls._instances[index] = card
+        return card
+
+    @classmethod
+    def from_index(cls, index):
+        """ Returns the Card at index of the canonical deck order. """
+        card = cls._instances[index]
+        if card is None:
+            card = cls(*CARD_ORDER[index])
+        return card
+
+    @property
+    def image(self):
+        """ The card image is used for visualization. """
+        if self._image is None:
+            object.__setattr__(self, '_image', self._build_image())
+        return self._image
+
+    def _build_image(self):
+        """ Builds the card image. """
+        name = self.name
         if name == '10':
-            self.image = ['┍┄┄┄┑', '┆'+self.name+'   ┆',
-                         '┆  '+SUITS[self.suit]+'  ┆', '┆   '+self.name+'┆',
-                         '┖┄┄┄┚']
+            image = ['┍┄┄┄┑', '┆'+self.name+'   ┆',
+                     '┆  '+SUITS[self.suit]+'  ┆', '┆   '+self.name+'┆',
+                     '┖┄┄┄┚']
         elif name == 'Dragon':
-            self.image = ['┍┄┄┄┑', '┆ '+'Dr'+'  ┆',
-                          '┆ '+'ag'+'  ┆', '┆ '+'on'+'  ┆', '┖┄┄┄┚']
+            image = ['┍┄┄┄┑', '┆ '+'Dr'+'  ┆',
+                     '┆ '+'ag'+'  ┆', '┆ '+'on'+'  ┆', '┖┄┄┄┚']
         elif name == 'Phoenix':
-            self.image = ['┍┄┄┄┑', '┆ '+'Ph'+'  ┆',
-                          '┆ '+'oe'+'  ┆', '┆ '+'nix'+' ┆', '┖┄┄┄┚']
+            image = ['┍┄┄┄┑', '┆ '+'Ph'+'  ┆',
+                     '┆ '+'oe'+'  ┆', '┆ '+'nix'+' ┆', '┖┄┄┄┚']
         elif name == 'Dog':
-            self.image = ['┍┄┄┄┑', '┆'+' '+'    ┆', '┆ '+'Dog'+' ┆',
-                          '┆ '+' '+'   ┆', '┖┄┄┄┚']
+            image = ['┍┄┄┄┑', '┆'+' '+'    ┆', '┆ '+'Dog'+' ┆',
+                     '┆ '+' '+'   ┆', '┖┄┄┄┚']
         elif name == 'Majong':
-            self.image = ['┍┄┄┄┑', '┆'+' '+'    ┆', '┆  '+'1'+'  ┆',
-                          '┆  '+' '+'  ┆', '┖┄┄┄┚']
+            image = ['┍┄┄┄┑', '┆'+' '+'    ┆', '┆  '+'1'+'  ┆',
+                     '┆  '+' '+'  ┆', '┖┄┄┄┚']
         else:
-            self.image = ['┍┄┄┄┑', '┆ '+self.name+'   ┆',
-                          '┆  '+SUITS[self.suit]+'  ┆', '┆   '+self.name+' ┆',
-                          '┖┄┄┄┚']
+            image = ['┍┄┄┄┑', '┆ '+self.name+'   ┆',
+                     '┆  '+SUITS[self.suit]+'  ┆', '┆   '+self.name+' ┆',
+                     '┖┄┄┄┚']
+        return image
+
+    def __setattr__(self, attr, value):
+        raise AttributeError('Card instances are immutable.')
+
+    def __delattr__(self, attr):
+        raise AttributeError('Card instances are immutable.')
+
+    def __reduce__(self):
+        # unpickling and copying return the interned instance
+        return (Card, (self.name, self.suit))
 
     def __ge__(self, other):
         return self.power >= other.power
@@ -114,20 +175,13 @@ class Card():
         return self.power < other.power
 
     def __eq__(self, other):
-        if self.suit != 'Special':
-            return self.power == other.power
-        else:
-            return self.name == other.name
+        return self is other
 
     def __ne__(self, other):
-        return self.power != other.power
+        return self is not other
 
     def __hash__(self):
-        card_hash = hashlib.md5()
-        card_hash.update(self.__repr__().encode())
-        card_hash = card_hash.hexdigest()
-        card_hash = int(card_hash, 16)
-        return card_hash
+        return self.index
 
     def __repr__(self):
         return str({'name': self.name,
@@ -1,7 +1,88 @@
 """ This module contains a class to represent multiple Tichu Cards. """
 
+from env.card import Card, CARD_ORDER
+
 BOMBS = ['four_bomb', 'straight_bomb']
 
+# Combination types in the order of get_available_combinations()
+COMB_TYPES = {'solo': 0,
+              'pair': 1,
+              'triple': 2,
+              'four_bomb': 3,
+              'full': 4,
+              'straight': 5,
+              'straight_bomb': 6,
+              'pair_seq': 7}
+COMB_NAMES = list(COMB_TYPES)
+
+# Bitmask representation of Cards:
+# Bit i of a 56-bit integer is set if the i-th Card of the canonical
+# deck order (see env.card.CARD_ORDER) is contained in the set.
+FULL_MASK = (1 << len(CARD_ORDER)) - 1
+PHOENIX_MASK = 1 << 52
+DRAGON_MASK = 1 << 53
+MAJONG_MASK = 1 << 54
+DOG_MASK = 1 << 55
+FIVES_MASK = 0xF << 12
+TENS_KINGS_MASK = (0xF << 32) | (0xF << 44)
+
+REGULAR_MASK = (1 << 52) - 1
+
+# All Cards in canonical order, used to build Cards from masks
+MASK_CARDS = [Card.from_index(idx) for idx in range(len(CARD_ORDER))]
+
+# The signature table of env.classifier, bound on first use
+_SIGNATURE_TABLE = None
+
+
+def popcount(mask):
+    """ Returns the number of Cards in a mask. """
+    return bin(mask).count('1')
+
+
+def mask_points(mask):
+    """ Returns the aggregated game points of all Cards in a mask. """
+    points = (5*popcount(mask & FIVES_MASK) +
+              10*popcount(mask & TENS_KINGS_MASK))
+    if mask & DRAGON_MASK:
+        points += 25
+    if mask & PHOENIX_MASK:
+        points -= 25
+    return points
+
+
+def signature_type(mask, size):
+    """
+    Returns the type and power of a card mask from the signature table.
+
+    Returns None for card sets larger than a hand, see
+    env.classifier.SignatureTable.type_of(). The table is loaded from
+    env.classifier.SIGNATURE_TABLE_FILE, if it is set.
+    """
+    global _SIGNATURE_TABLE
+    if _SIGNATURE_TABLE is None:
+        # imported here because the signature table is built upon Cards
+        from env.classifier import get_signature_table
+        _SIGNATURE_TABLE = get_signature_table()
+    return _SIGNATURE_TABLE.type_of(mask, size)
+
+
+def mask_to_card_list(mask):
+    """ Returns the Cards of a mask as a list sorted by power. """
+    # Phoenix, Dog and Majong are lower than all regular Cards
+    card_list = [MASK_CARDS[idx] for idx in (52, 55, 54) if mask >> idx & 1]
+    # regular Cards are sorted by power in canonical order
+    regular = mask & REGULAR_MASK
+    while regular:
+        lowest = regular & -regular
+        card_list.append(MASK_CARDS[lowest.bit_length()-1])
+        regular ^= lowest
+    # Dragon is higher than all regular Cards
+    if mask & DRAGON_MASK:
+        card_list.append(MASK_CARDS[53])
+    return card_list
+
+
 class Cards():
     """
     A class to represent multiple Tichu Cards.
@@ -33,6 +114,8 @@ class Cards():
       For example: A hand has 0 power, a pair of 10s has power 10.
     points: int
       The aggregated Card points in this instance.
+    mask: int
+      A 56-bit integer with one bit per Card in canonical deck order.
 
     Methods
     -------
@@ -40,48 +123,61 @@ class Cards():
       Prints all the Cards using the Card.image attribute.
     get_available_combinations:
       Outputs a list of all possible combinations.
+    iter_combinations(comb_type, min_power, size):
+      Yields the possible combinations of one type by ascending power.
     contains(other):
       Checks whether other (list of Card objects) are contained
       in this Cards instance.
     remove(card):
       Removes a Card from this Cards instance.
+    remove_all(other):
+      Removes all Cards of other from this Cards instance.
+    from_mask(mask):
+      Constructs a Cards instance from a 56-bit mask.
+    union(other):
+      Returns a new Cards instance with the Cards of this and other.
+    difference(other):
+      Returns a new Cards instance without the Cards of other.
     """
 
     size = None
     cards = None
     phoenix_flag = None
+    mask = 0
 
-    def __init__(self, card_list):
+    def __init__(self, card_list, comb_type=None, power=None):
         """
         Constructs a Cards instance.
 
         Paramter
         --------
         card_list: A list of Card objects.
+        comb_type: The type of the Cards, if already known (optional).
+        power: The power of the Cards, if already known (optional).
         """
-        # dispatch table for type checking function
-        self.dispatch_type = {0: self._typecheck_pass,
-                              1: self._typecheck_solo,
-                              2: self._typecheck_pair,
-                              3: self._typecheck_triple,
-                              4: self._typecheck_four_bomb,
-                              5: self._typecheck_full_straight,
-                              6: self._typecheck_pair_seq}
         # set attributes
-        self.phoenix_flag = False
-        self.cards = list()
-        for i in card_list:
-            self.cards.append(i)
-            if i.name == 'Phoenix':
-                self.phoenix_flag = True
+        self.cards = list(card_list)
         self.cards.sort()
+        self.mask = 0
+        for crd in self.cards:
+            self.mask |= crd.mask
+        self.phoenix_flag = bool(self.mask & PHOENIX_MASK)
         self.size = len(self.cards)
         self.type = None
         self.power = 0
-        # run init functions
-        self._set_type_and_power()
+        # run init functions (type checks are skipped for known types)
+        if comb_type is None:
+            self._set_type_and_power()
+        else:
+            self.type = comb_type
+            self.power = power
         self._set_points()
 
+    @classmethod
+    def from_mask(cls, mask, comb_type=None, power=None):
+        """ Constructs a Cards instance from a 56-bit mask. """
+        return cls(mask_to_card_list(mask), comb_type, power)
+
     def show(self):
         """ A nice visualization of all cards in the set. """
         if self.size == 0:
@@ -95,48 +191,103 @@ class Cards():
     def _set_points(self):
         """ Set number of game points of this card set. """
         if self.type != 'pass':
-            self.points = sum([crd.points for crd in self.cards])
+            self.points = mask_points(self.mask)
         else:
             self.points = 0
 
     def _set_type_and_power(self):
-        """ Determines which combination (if any) is this card set. """
+        """
+        Determines which combination (if any) is this card set.
+
+        The type and power are looked up by the signature of the Cards
+        (see env.classifier.SignatureTable).
+        """
+        comb = signature_type(self.mask, self.size)
+        if comb is None:
+            # card sets larger than a hand are not in the table
+            self._check_type_and_power()
+        else:
+            self.type, self.power = comb
+
+    def _check_type_and_power(self):
+        """
+        Determines which combination (if any) is this card set.
+
+        Reference implementation of the type checks, which is used to
+        build the signature table and to cross-check it.
+        """
+        # dispatch table for type checking function
+        dispatch_type = {0: self._typecheck_pass,
+                         1: self._typecheck_solo,
+                         2: self._typecheck_pair,
+                         3: self._typecheck_triple,
+                         4: self._typecheck_four_bomb,
+                         5: self._typecheck_full_straight,
+                         6: self._typecheck_pair_seq}
         self.type = 'unk'
         # check for all but pair sequence depending on card length
-        self.dispatch_type[min(len(self.cards),5)]()
+        dispatch_type[min(len(self.cards),5)]()
         # if type is still unkown, check for pair sequence
         if self.type == 'unk':
-            self.dispatch_type[6]()
+            dispatch_type[6]()
         # if type is still unkown, it must be a hand
         if self.type == 'unk':
             self.type = 'hand'
             self.power = 0
 
     def get_available_combinations(self):
-        """ Get all available combinations form this card set. """
-        solo = self._get_available_solo()
-        pair = self._get_available_pair()
-        triple = self._get_available_triple()
-        four_bomb = self._get_available_four_bomb()
-        full = self._get_available_full()
-        straight, straight_bomb = self._get_available_straight()
-        pair_seq = self._get_available_pair_seq()
-        return [solo, pair, triple, four_bomb,
-                full, straight, straight_bomb, pair_seq]
+        """
+        Get all available combinations form this card set.
+
+        Returns a tuple of tuples of Cards, one tuple per combination
+        type in the order of COMB_TYPES, each sorted by ascending power.
+        The result is shared by all card sets with the same Cards
+        (see env.move_table.CombinationCache), the Cards of each
+        combination are a tuple and remove() raises a TypeError.
+        """
+        # imported here because the move table is built upon Cards
+        from env.move_table import get_combination_cache
+        return get_combination_cache().get(self.mask)
+
+    def iter_combinations(self, comb_type, min_power=None, size=None):
+        """
+        Yields the available combinations of comb_type lazily.
+
+        Combinations are yielded by ascending power. If min_power or
+        size are given, only combinations with a higher power or this
+        size are yielded. Nothing is enumerated before it is requested,
+        so callers can stop at the first combination they need.
+        """
+        # imported here because the move table is built upon Cards
+        from env.move_table import get_move_table
+        table = get_move_table()
+        for idx in table.select(self.mask, [COMB_TYPES[comb_type]],
+                                min_power, size):
+            power = float(table.powers[idx])
+            for comb_mask in table.expand(idx, self.mask):
+                yield Cards.from_mask(comb_mask, comb_type, power)
 
     def contains(self, other):
         """ Checks if this instance contains all cards from other. """
-        this_cards = [(crd.name, crd.suit) for crd in self.cards]
-        other_cards = [(crd.name, crd.suit) for crd in other.cards]
-        return all([elem in this_cards for elem in other_cards])
+        return not other.mask & ~self.mask
+
+    def union(self, other):
+        """ Returns a new Cards instance with all cards of self and other. """
+        return Cards.from_mask(self.mask | other.mask)
+
+    def difference(self, other):
+        """ Returns a new Cards instance with cards of self not in other. """
+        return Cards.from_mask(self.mask & ~other.mask)
 
     def remove(self, card):
         """ Remove a single Card and update this Cards instance. """
-        try:
-            self.cards.remove(card)
-        except ValueError: # if card is not in cards, return False
+        self._assert_mutable()
+        # if card is not in cards, return False
+        if not self.mask & card.mask:
             return False
-        self.cards.sort()
+        # removing from a sorted list keeps it sorted
+        self.cards = [crd for crd in self.cards if crd.index != card.index]
+        self.mask &= ~card.mask
         if card.name == 'Phoenix':
             self.phoenix_flag = False
         self.size = self.size - 1
@@ -144,6 +295,32 @@ class Cards():
         self._set_points()
         return True
 
+    def _assert_mutable(self):
+        """ Raises a TypeError if this is a shared (cached) combination. """
+        # cached combinations hold their Cards as a tuple
+        if isinstance(self.cards, tuple):
+            raise TypeError('Cached combinations cannot be modified.')
+
+    def remove_all(self, other):
+        """
+        Removes all Cards of other and updates this Cards instance once.
+
+        Returns False (and removes nothing) if not all Cards of other
+        are in this instance.
+        """
+        self._assert_mutable()
+        if other.mask & ~self.mask:
+            return False
+        removed = other.mask
+        self.cards = [crd for crd in self.cards if not crd.mask & removed]
+        self.mask &= ~removed
+        if removed & PHOENIX_MASK:
+            self.phoenix_flag = False
+        self.size = len(self.cards)
+        self._set_type_and_power()
+        self._set_points()
+        return True
+
     def _typecheck_pass(self):
         """ Checks whether Cards is of type pass. """
         if len(self.cards)==0:
@@ -383,213 +560,15 @@ class Cards():
             self.type = 'pair_seq'
             self.power = self.cards[-1].power
 
-    def _get_available_solo(self):
-        """ Returns a list with all possible solo combinations. """
-        solo = list()
-        for i in range(len(self.cards)):
-            solo_list = self.cards[i]
-            solo_cards = Cards([solo_list])
-            if solo_cards.type == 'solo':
-                solo.append(solo_cards)
-        return solo
-
-    def _get_available_pair(self):
-        """ Returns a list with all possible pair combinations. """
-        pair = list()
-        for i in range(len(self.cards)-1):
-            # regular pairs
-            if self.cards[i].power == self.cards[i+1].power:
-                pair_list = [self.cards[i], self.cards[i+1]]
-                pair_cards = Cards(pair_list)
-                if pair_cards.type == 'pair':
-                    pair.append(pair_cards)
-            # phoenix pairs
-            if self.phoenix_flag and self.cards[i+1].suit != 'Special':
-                pair_list = [self.cards[0], self.cards[i+1]]
-                pair_cards = Cards(pair_list)
-                if pair_cards.type == 'pair':
-                    pair.append(pair_cards)
-            # multiple pairs
-            try:
-                if self.cards[i].power == self.cards[i+2].power:
-                    pair_list = [self.cards[i], self.cards[i+2]]
-                    pair_cards = Cards(pair_list)
-                    if pair_cards.type == 'pair':
-                        pair.append(pair_cards)
-                if self.cards[i].power == self.cards[i+3].power:
-                    pair_list = [self.cards[i], self.cards[i+3]]
-                    pair_cards = Cards(pair_list)
-                    if pair_cards.type == 'pair':
-                        pair.append(pair_cards)
-            except IndexError:
-                pass
-        return pair
-
-    def _get_available_triple(self):
-        """ Returns a list with all possible triple combinations. """
-        def check_and_append_triple(cards_list, triple):
-            triple_cards = Cards(cards_list)
-            if triple_cards.type == 'triple':
-                triple.append(triple_cards)
-            return triple
-        triple = list()
-        for i in range(len(self.cards)-2):
-            # regular triple
-            if (self.cards[i].power == self.cards[i+1].power and
-                self.cards[i+1].power == self.cards[i+2].power):
-                triple_candidate = [self.cards[i], self.cards[i+1],
-                                    self.cards[i+2]]
-                triple = check_and_append_triple(triple_candidate, triple)
-            # phoenix triple
-            if (self.phoenix_flag and
-                  self.cards[i+1].power == self.cards[i+2].power):
-                triple_candidate = [self.cards[0], self.cards[i+1],
-                                    self.cards[i+2]]
-                triple = check_and_append_triple(triple_candidate, triple)
-            # multiple triples
-            try:
-                if (self.cards[i].power == self.cards[i+1].power and
-                      self.cards[i+1].power == self.cards[i+3].power):
-                    triple_candidate = [self.cards[i], self.cards[i+1],
-                                        self.cards[i+3]]
-                    triple = check_and_append_triple(triple_candidate, triple)
-                if (self.cards[i].power == self.cards[i+2].power and
-                      self.cards[i+2].power == self.cards[i+3].power):
-                    triple_candidate = [self.cards[i], self.cards[i+2],
-                                        self.cards[i+3]]
-                    triple = check_and_append_triple(triple_candidate, triple)
-                if (self.phoenix_flag and
-                      self.cards[i+1].power == self.cards[i+3].power):
-                    triple_candidate = [self.cards[0], self.cards[i+1],
-                                        self.cards[i+3]]
-                    triple = check_and_append_triple(triple_candidate, triple)
-                if (self.phoenix_flag and
-                      self.cards[i+1].power == self.cards[i+4].power):
-                    triple_candidate = [self.cards[0], self.cards[i+1],
-                                        self.cards[i+4]]
-                    triple = check_and_append_triple(triple_candidate, triple)
-            except IndexError:
-                pass
-        return triple
-
-    def _get_available_four_bomb(self):
-        """ Returns a list with all possible four bomb combinations. """
-        four_bomb = list()
-        for i in range(len(self.cards)-3):
-            if (self.cards[i].power == self.cards[i+1].power and
-                  self.cards[i+1].power == self.cards[i+2].power and
-                  self.cards[i+2].power == self.cards[i+3].power):
-                four_list = [self.cards[i], self.cards[i+1],
-                             self.cards[i+2], self.cards[i+3]]
-                four_cards = Cards(four_list)
-                if four_cards.type == 'four_bomb':
-                    four_bomb.append(four_cards)
-        return four_bomb
-
-    def _get_available_full(self):
-        """ Returns a list with all possible full house combinations. """
-        full = list()
-        pair = self._get_available_pair()
-        triple = self._get_available_triple()
-        for i in pair:
-            for j in triple:
-                if i.power != j.power:
-                    full_list = list()
-                    full_list.extend(i.cards)
-                    full_list.extend(j.cards)
-                    full_cards = Cards(full_list)
-                    if full_cards.type == 'full':
-                        full.append(full_cards)
-        return full
-
-    def _get_available_straight(self):
-        """ Returns a list with all possible straight combinations. """
-        def check_candidate(candidate_list, straight, straight_bomb):
-            if len(candidate_list) > 4:
-                straight_cards = Cards(candidate_list)
-                if straight_cards.type == 'straight':
-                    straight.append(straight_cards)
-                elif straight_cards.type == 'straight_bomb':
-                    straight_bomb.append(straight_cards)
-                else:
-                    pass
-            return straight, straight_bomb
-        straight = list()
-        straight_bomb = list()
-        for i in range(len(self.cards)-4):
-            candidate_list = list()
-            phoenix_available = self.phoenix_flag
-            for j in range(i,len(self.cards)):
-                # add first card of possible straight
-                if len(candidate_list)==0:
-                    candidate_list.append(self.cards[j])
-                    if self.cards[j].name == 'Phoenix':
-                        phoenix_available = False
-                # no check if Phoenix is last entry
-                elif candidate_list[-1].name == 'Phoenix':
-                    candidate_list.append(self.cards[j])
-                    straight, straight_bomb = check_candidate(candidate_list,
-                        straight, straight_bomb)
-                # add subsequent cards
-                elif candidate_list[-1].power+1 == self.cards[j].power:
-                    candidate_list.append(self.cards[j])
-                    straight, straight_bomb = check_candidate(candidate_list,
-                        straight, straight_bomb)
-                # skip pairs
-                elif candidate_list[-1].power == self.cards[j].power:
-                    pass
-                # use phoenix mid straight if available
-                elif (phoenix_available and
-                    candidate_list[-1].power+2 == self.cards[j].power):
-                    candidate_list.append(self.cards[0])
-                    candidate_list.append(self.cards[j])
-                    straight, straight_bomb = check_candidate(candidate_list,
-                        straight, straight_bomb)
-                    phoenix_available = False
-                # use phoenix as first/last card if available
-                elif phoenix_available:
-                    candidate_list.append(self.cards[0])
-                    straight, straight_bomb = check_candidate(candidate_list,
-                        straight, straight_bomb)
-                    phoenix_available = False
-                # no straight possible
-                else:
-                    break
-        return straight, straight_bomb
-
-    def _get_available_pair_seq(self):
-        """ Returns a list with all possible pair sequence combinations. """
-        pair_seq = list()
-        pair = self._get_available_pair()
-        for i in range(len(pair)-1):
-            candidate_list = list()
-            for j in range(i,len(pair)):
-                # add first element to candidate list
-                if len(candidate_list) == 0:
-                    candidate_list.extend(pair[j].cards)
-                # add subsequent pairs
-                elif candidate_list[-1].power+1 == pair[j].power:
-                    candidate_list.extend(pair[j].cards)
-                    if len(candidate_list) > 1:
-                        pair_seq_cards = Cards(candidate_list)
-                        if pair_seq_cards.type == 'pair_seq':
-                            pair_seq.append(pair_seq_cards)
-                # skip double pairs
-                elif candidate_list[-1].power == pair[j].power:
-                    pass
-                # break if no pair_seq possible
-                else:
-                    break
-        return pair_seq
-
     def __add__(self, card_list_to_add):
-        this_card_list = self.cards
+        # work on a copy, self may be a shared (cached) combination
+        this_card_list = list(self.cards)
         this_card_list.append(card_list_to_add)
         new_cards = Cards(card_list=this_card_list)
         return new_cards
 
     def __sub__(self, cards):
-        this_card_list = self.cards
+        this_card_list = list(self.cards)
         for crd in cards:
             this_card_list.remove(crd)
         new_cards = Cards(card_list=this_card_list)
@@ -0,0 +1,319 @@
+""" This module contains a vectorized classifier for many card sets. """
+
+import itertools
+import os
+from collections import Counter
+
+import numpy as np
+
+from env.card import Card, CARD_ORDER, RANK_NAMES, SUITS
+from env.cards import (Cards, COMB_NAMES, COMB_TYPES, REGULAR_MASK,
+                       popcount)
+from env.codec import vecs_to_masks
+
+# Type codes of card sets: COMB_TYPES, followed by hand and pass
+TYPE_NAMES = COMB_NAMES + ['hand', 'pass']
+HAND_TYPE = TYPE_NAMES.index('hand')
+PASS_TYPE = TYPE_NAMES.index('pass')
+
+# Card sets with more Cards than a hand are classified by Cards
+MAX_TABLE_SIZE = 14
+
+# Signature of a card set: the number of Cards of each rank (2...A) in
+# 3 bits per rank, followed by one bit per special card (Phoenix,
+# Dragon, Majong, Dog). Type and power of a card set only depend on its
+# signature, except for straight bombs which also need a single suit.
+RANK_WEIGHTS = 8 ** np.arange(13, dtype=np.int64)
+SPECIAL_WEIGHTS = 2 ** np.arange(39, 43, dtype=np.int64)
+CARD_POINTS = np.array([Card.from_index(idx).points
+                        for idx in range(len(CARD_ORDER))], dtype=np.int64)
+# Signature of the two ranks in a byte of a card mask
+_BYTE_SIGNATURE = [popcount(byte & 15) | popcount(byte >> 4) << 3
+                   for byte in range(256)]
+# One bit per rank (2...A) for each suit
+_SUIT_STRIPES = [sum(1 << (4*rank + suit) for rank in range(13))
+                 for suit in range(4)]
+
+# Cache file of the signature table, used by get_signature_table()
+# unless another file is given. Set it before the first Cards are
+# classified to load the table instead of building it.
+SIGNATURE_TABLE_FILE = None
+
+_SIGNATURE_TABLE = None
+
+
+def mask_signature(mask):
+    """ Returns the signature of a 56-bit card mask. """
+    return ((mask >> 52) << 39 |
+            _BYTE_SIGNATURE[(mask >> 48) & 15] << 36 |
+            _BYTE_SIGNATURE[(mask >> 40) & 255] << 30 |
+            _BYTE_SIGNATURE[(mask >> 32) & 255] << 24 |
+            _BYTE_SIGNATURE[(mask >> 24) & 255] << 18 |
+            _BYTE_SIGNATURE[(mask >> 16) & 255] << 12 |
+            _BYTE_SIGNATURE[(mask >> 8) & 255] << 6 |
+            _BYTE_SIGNATURE[mask & 255])
+
+
+def signatures(vecs):
+    """ Returns the signatures of an (N, 56) array of card vectors. """
+    vecs = np.asarray(vecs, dtype=np.int64)
+    counts = vecs[:, :52].reshape(len(vecs), 13, 4).sum(axis=2)
+    return counts @ RANK_WEIGHTS + vecs[:, 52:] @ SPECIAL_WEIGHTS
+
+
+def get_signature_table(cache_file=None):
+    """
+    Returns the global SignatureTable.
+
+    The table is built on first use. If cache_file is given (default
+    SIGNATURE_TABLE_FILE), the table is loaded from this file or saved
+    to it after building.
+    """
+    global _SIGNATURE_TABLE
+    if _SIGNATURE_TABLE is None:
+        if cache_file is None:
+            cache_file = SIGNATURE_TABLE_FILE
+        if cache_file is not None and os.path.isfile(cache_file):
+            _SIGNATURE_TABLE = SignatureTable.load(cache_file)
+        else:
+            _SIGNATURE_TABLE = SignatureTable()
+            if cache_file is not None:
+                _SIGNATURE_TABLE.save(cache_file)
+    return _SIGNATURE_TABLE
+
+
+def classify(vecs):
+    """
+    Classifies an (N, 56) array of 0/1 card vectors.
+
+    Returns four arrays of length N: the type codes (see TYPE_NAMES),
+    powers, sizes and points of the card sets, which agree with the
+    type, power, size and points of Cards.
+    """
+    vecs = np.asarray(vecs, dtype=np.int64)
+    if vecs.ndim != 2 or vecs.shape[1] != len(CARD_ORDER):
+        raise ValueError('Expected an (N, {}) array of card vectors.'
+                         .format(len(CARD_ORDER)))
+    sizes = vecs.sum(axis=1)
+    points = vecs @ CARD_POINTS
+    types, powers = get_signature_table().lookup(signatures(vecs))
+    # straights of regular Cards of a single suit are straight bombs
+    suits = vecs[:, :52].reshape(len(vecs), 13, 4).any(axis=1).sum(axis=1)
+    bomb = ((types == COMB_TYPES['straight']) &
+            (vecs[:, 52:].sum(axis=1) == 0) & (suits == 1))
+    types[bomb] = COMB_TYPES['straight_bomb']
+    powers[bomb] += 100
+    # a pass has neither power nor points
+    types[sizes == 0] = PASS_TYPE
+    # larger card sets are not in the table
+    large = np.flatnonzero(sizes > MAX_TABLE_SIZE)
+    for row, mask in zip(large, vecs_to_masks(vecs[large]).tolist()):
+        crds = Cards.from_mask(mask)
+        types[row] = TYPE_NAMES.index(crds.type)
+        powers[row] = crds.power
+    return types, powers, sizes, points
+
+
+class SignatureTable():
+    """
+    A table of the type and power of every combination signature.
+
+    Contains every signature of up to MAX_TABLE_SIZE Cards that is
+    typed as a combination by the type checks of Cards. All other card
+    sets (of this size) are hands. Cards looks up its type and power
+    in this table instead of running the type checks.
+    Straights are stored as straights, straights of a single suit are
+    turned into straight bombs by classify() and type_of().
+
+    Attributes
+    ----------
+    keys: np.ndarray of int64
+      The sorted signatures of all combinations.
+    types: np.ndarray of int8
+      The type code of each signature (see TYPE_NAMES).
+    powers: np.ndarray of float64
+      The power of each signature.
+    size: int
+      The number of entries in the table.
+
+    Methods
+    -------
+    load(filename):
+      Loads a SignatureTable from a file created by save().
+    save(filename):
+      Saves the table arrays to a .npz file.
+    lookup(keys):
+      Returns the type codes and powers of an array of signatures.
+    type_of(mask, size):
+      Returns the type and power of a single card mask.
+    """
+
+    def __init__(self, arrays=None):
+        """
+        Constructs the SignatureTable.
+
+        Parameter
+        ---------
+        arrays: tuple of np.ndarray
+          Table arrays (keys, types, powers) to use instead of
+          building the table from scratch (optional).
+        """
+        if arrays is None:
+            arrays = self._build()
+        self.keys, self.types, self.powers = arrays
+        self.size = len(self.keys)
+        self._entries = {key: (COMB_NAMES[comb_type], power)
+                         for key, comb_type, power
+                         in zip(self.keys.tolist(), self.types.tolist(),
+                                self.powers.tolist())}
+
+    @classmethod
+    def load(cls, filename):
+        """ Loads a SignatureTable from a file created by save(). """
+        with np.load(filename) as data:
+            arrays = (data['keys'], data['types'], data['powers'])
+        return cls(arrays)
+
+    def save(self, filename):
+        """ Saves the table arrays to a .npz file. """
+        with open(filename, 'wb') as npz_file:
+            np.savez(npz_file, keys=self.keys, types=self.types,
+                     powers=self.powers)
+
+    def lookup(self, keys):
+        """ Returns the type codes and powers of an array of signatures. """
+        pos = np.searchsorted(self.keys, keys)
+        pos[pos == self.size] = 0
+        found = self.keys[pos] == keys
+        types = np.where(found, self.types[pos], HAND_TYPE).astype(np.int8)
+        powers = np.where(found, self.powers[pos], 0.)
+        return types, powers
+
+    def type_of(self, mask, size):
+        """
+        Returns the type and power of a card mask with size Cards.
+
+        Returns None for card sets with more than MAX_TABLE_SIZE Cards.
+        """
+        if size > MAX_TABLE_SIZE:
+            return None
+        if size == 0:
+            return 'pass', 0
+        comb = self._entries.get(mask_signature(mask))
+        if comb is None:
+            return 'hand', 0
+        # straights of regular Cards of a single suit are straight bombs
+        if comb[0] == 'straight' and mask == mask & REGULAR_MASK:
+            for stripe in _SUIT_STRIPES:
+                if mask == mask & stripe:
+                    return 'straight_bomb', 100 + comb[1]
+        return comb
+
+    def _build(self):
+        """
+        Builds the table arrays.
+
+        Each candidate signature is classified by the type checks of
+        Cards with representative Cards, so that the table agrees
+        with Cards.
+        """
+        entries = dict()
+        for counts, specials in self._candidates():
+            crds = Cards(self._representative(counts, specials), 'unk')
+            crds._check_type_and_power()
+            if crds.type in COMB_TYPES:
+                signature = specials << 39
+                for rank, cnt in counts.items():
+                    signature |= cnt << 3*(rank-2)
+                entries[signature] = (COMB_TYPES[crds.type], crds.power)
+        keys = np.array(sorted(entries), dtype=np.int64)
+        types = np.array([entries[key][0] for key in keys.tolist()],
+                         dtype=np.int8)
+        powers = np.array([entries[key][1] for key in keys.tolist()],
+                          dtype=np.float64)
+        return keys, types, powers
+
+    @staticmethod
+    def _candidates():
+        """
+        Yields all candidate signatures as (counts, specials).
+
+        counts is a Counter of regular ranks (2...14), specials holds
+        one bit per special card (Phoenix, Dragon, Majong, Dog).
+        Card sets of more than 5 Cards can only be straights or pair
+        sequences, i.e. consecutive ranks without Dog and Dragon.
+        """
+        # all card sets of up to 5 Cards
+        for specials in range(16):
+            for size in range(6 - popcount(specials)):
+                for ranks in itertools.combinations_with_replacement(
+                        range(2, 15), size):
+                    counts = Counter(ranks)
+                    if size + specials and max(counts.values(),
+                                               default=0) <= 4:
+                        yield counts, specials
+        # straights of consecutive ranks (rank 1 being the Majong),
+        # the Phoenix may fill one gap
+        for low in range(1, 15):
+            for high in range(low+4, 15):
+                window = list(range(low, high+1))
+                gaps = [None] + window[1:-1]
+                for gap, phoenix in itertools.product(gaps, (0, 1)):
+                    ranks = [rank for rank in window if rank != gap]
+                    if 5 < len(ranks) + phoenix <= MAX_TABLE_SIZE:
+                        yield SignatureTable._split_majong(ranks, phoenix)
+        # pair sequences of consecutive ranks: the regular ranks hold
+        # pairs, with the Phoenix up to two of them may hold 1, 3 or 4
+        # Cards (Cards accepts only one, allowing all counts does not
+        # add any entry to the table)
+        for low in range(1, 14):
+            for phoenix in (0, 1):
+                for ranks in SignatureTable._runs(low, MAX_TABLE_SIZE-phoenix,
+                                                  2*phoenix):
+                    size = len(ranks) + phoenix
+                    if size > 5 and size % 2 == 0:
+                        yield SignatureTable._split_majong(ranks, phoenix)
+
+    @staticmethod
+    def _runs(low, budget, unpaired):
+        """
+        Yields runs of consecutive ranks from low upwards.
+
+        A run holds up to budget Cards, one Majong (rank 1) or 1 to 4
+        Cards per regular rank, but at most unpaired regular ranks with
+        other than 2 Cards.
+        """
+        if low == 1:
+            counts = [1]
+        else:
+            counts = [cnt for cnt in range(1, 5) if cnt == 2 or unpaired]
+        for cnt in counts:
+            if cnt > budget:
+                break
+            yield [low] * cnt
+            if low < 14:
+                left = unpaired - (low > 1 and cnt != 2)
+                for run in SignatureTable._runs(low+1, budget-cnt, left):
+                    yield [low] * cnt + run
+
+    @staticmethod
+    def _split_majong(ranks, phoenix):
+        """ Returns (counts, specials) of ranks including the Majong. """
+        counts = Counter(rank for rank in ranks if rank > 1)
+        specials = phoenix | (4 if 1 in ranks else 0)
+        return counts, specials
+
+    @staticmethod
+    def _representative(counts, specials):
+        """ Returns a list of Card objects for a candidate signature. """
+        suits = list(SUITS)
+        card_list = [Card(name=name, suit='Special')
+                     for bit, name in enumerate(('Phoenix', 'Dragon',
+                                                 'Majong', 'Dog'))
+                     if specials >> bit & 1]
+        for rank, cnt in counts.items():
+            for i in range(cnt):
+                # alternate suits so that no straight is of one suit
+                suit = suits[(rank+i) % 4]
+                card_list.append(Card(name=RANK_NAMES[rank-2], suit=suit))
+        return card_list
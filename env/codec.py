@@ -0,0 +1,44 @@
+""" This module contains conversions between Cards, masks and vectors. """
+
+import numpy as np
+
+from env.card import CARD_ORDER
+from env.cards import Cards
+
+N_CARDS = len(CARD_ORDER)
+# Bit i of a card mask is entry i of a card vector (canonical deck order)
+SHIFTS = np.arange(N_CARDS, dtype=np.uint64)
+BIT_WEIGHTS = np.left_shift(np.uint64(1), SHIFTS)
+
+
+def mask_to_vec(mask, dtype=int):
+    """ Turns a 56-bit card mask into a 0/1 vector of length 56. """
+    return ((np.uint64(mask) >> SHIFTS) & np.uint64(1)).astype(dtype)
+
+
+def vec_to_mask(vec):
+    """ Turns a vector of length 56 into a 56-bit card mask. """
+    return int(BIT_WEIGHTS[np.flatnonzero(vec)].sum())
+
+
+def cards_to_vec(cards, dtype=int):
+    """ Turns a Cards instance into a 0/1 vector of length 56. """
+    return mask_to_vec(cards.mask, dtype)
+
+
+def vec_to_cards(vec):
+    """ Turns a vector of length 56 into a Cards instance. """
+    return Cards.from_mask(vec_to_mask(vec))
+
+
+def masks_to_vecs(masks, dtype=np.int8):
+    """ Turns N card masks into an (N, 56) array of 0/1 vectors. """
+    masks = np.asarray(masks, dtype=np.uint64)
+    return ((masks[..., None] >> SHIFTS) & np.uint64(1)).astype(dtype)
+
+
+def vecs_to_masks(vecs):
+    """ Turns an (N, 56) array of vectors into N card masks (uint64). """
+    vecs = np.asarray(vecs) != 0
+    return np.bitwise_or.reduce(np.where(vecs, BIT_WEIGHTS, np.uint64(0)),
+                                axis=-1)
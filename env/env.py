@@ -1,15 +1,72 @@
 """ This module contains a wrapper class for a Tichu game to enable RL. """
 
-from itertools import compress
+from collections import namedtuple
 
 import numpy as np
 
-from env.cards import Cards
+from env.cards import COMB_NAMES, COMB_TYPES, Cards, popcount
+from env.codec import cards_to_vec, vec_to_cards, mask_to_vec
 from env.deck import Deck
 from env.game import Game
+from env.move_table import get_move_table
 
 ILLEGAL_MOVE_PENALTY = -300 # default value
 REWARD_STYLE  = 'rich'
+# cards: OHE Cards vector
+# legal: index into the legal moves of the active player (legal_actions)
+# combination: MoveTable entry index, the last index is pass
+ACTION_MODES = ('cards', 'legal', 'combination')
+BOMB_TYPES = (COMB_TYPES['four_bomb'], COMB_TYPES['straight_bomb'])
+
+# Legal actions of the active player:
+# cards: 56-dim vector of Cards that are part of at least one legal move
+# combinations: one entry per MoveTable entry, the last entry is pass
+ActionMask = namedtuple('ActionMask', ['cards', 'combinations'])
+
+
+class LazyState():
+    """
+    The states of all Players, each rendered on first access.
+
+    Behaves like the list state of Env (state[player_id]), but a
+    Players' perspective is only computed when it is requested and then
+    cached. A LazyState belongs to one step of the Env: perspectives
+    that were not rendered before the next step cannot be rendered
+    anymore.
+
+    Methods
+    -------
+    rendered(player_id):
+      Returns whether the state of player_id has been rendered.
+    """
+
+    def __init__(self, env):
+        """ Constructs a LazyState of the current step of env. """
+        self._env = env
+        self._states = [None, None, None, None]
+
+    def __len__(self):
+        return 4
+
+    def __getitem__(self, player_id):
+        state = self._states[player_id]
+        if state is None:
+            if self._env.state is not self:
+                raise RuntimeError('State of player {} is outdated, the '
+                                   'Env has taken a step since.'
+                                   .format(player_id))
+            state = self._env._render_state(player_id)
+            self._states[player_id] = state
+        return state
+
+    def __iter__(self):
+        for player_id in range(4):
+            yield self[player_id]
+
+    def rendered(self, player_id):
+        """ Returns whether the state of player_id has been rendered. """
+        return self._states[player_id] is not None
+
 
 class Env():
     """
@@ -30,8 +87,28 @@ class Env():
     There are alternative possibilites for the state-design which
     may be included in the future.
 
+    Optionally (lazy_state), the state is a LazyState that only
+    computes the perspectives of the Players that are accessed, e.g.
+    state[active_player]. It holds the same lists as the default state.
+
+    Optionally (array_state), the state is a read-only view of one
+    preallocated int8 array of shape (4, 4, 58) owned by the Env, with
+    rows [hand size, Tichu Flag, 56 Cards]. Only the changed rows are
+    patched after each step, so the same array is returned every step
+    and can be handed to a network without conversion (copy it to keep
+    a state, e.g. in a replay buffer).
+
     The action is also a OHE of Cards, e.g.:
     [1, 0, 0, 0, 1, 0, ... 0] means play a pair of 2s.
+    Alternatively, the action is a discrete index (action_mode):
+    'legal' indexes the legal moves of the active player in
+    legal_actions (pass is the last entry if the stack is not empty,
+    steps of other players are rejected as for any action),
+    'combination' indexes the MoveTable entries (plus pass, like the
+    combinations of ActionMask) and the Cards of the entry are chosen
+    deterministically from the hand, keeping bombs intact if possible. The combinations are already typed, so that they
+    are neither converted nor classified. Indices out of range are
+    illegal moves.
 
     The reward function is designed two ways:
 
@@ -55,6 +132,12 @@ class Env():
     For both reward styles, an invalid move by a Player leads to an
     immediate negative reward.
 
+    Optionally, reset() and step() additionally return a legal action
+    mask (ActionMask) of the active player, so that an Agent can avoid
+    illegal moves instead of being penalized for them.
+    The mask is given in the 56-dim Cards vector space and in the
+    discrete space of combination indices (MoveTable entries + pass).
+
     Attributes
     ----------
     dispatch_reward: dictionary
@@ -64,21 +147,37 @@ class Env():
     state_size: int
       The size of the state dimension.
     action_size: int
-      The size of the action dimension.
+      The size of the action dimension (None for the 'legal' action
+      mode, where it is the length of legal_actions).
+    action_mode: str
+      The kind of actions taken by step() (see ACTION_MODES).
+    legal_actions: list of Cards
+      The legal moves of the active player ('legal' action mode), an
+      index of a step with another player_id is rejected.
     all_cards: list of Card
       A list containing instances of all Cards in a Tichu Deck.
     game: Game
       A Tichu Game instance.
     action_buffer: list of int
-      A list containing the last actions of all Players.
-    states: list of int
-      A list of the states from all Players' perspectives.
+      A list containing the last actions of all Players (list states).
+    state: list of int, LazyState or np.ndarray of int8
+      The states from all Players' perspectives.
+    lazy_state: bool
+      Whether the state is a LazyState.
+    array_state: bool
+      Whether the state is a preallocated (4, 4, 58) array.
     rewards: list of int
       The rewards that an Agent will recieved after a step.
     done: bool
       Whether the episode (i.e. Game) is finished.
     nstep: int
       An internal step conter used for rich rewards.
+    return_action_mask: bool
+      Whether reset() and step() return the legal action mask.
+    action_mask: ActionMask
+      The legal action mask of the active player.
+    sinks: list
+      Event sinks (see env.events) passed to every Game.
 
     Methods
     -------
@@ -90,7 +189,9 @@ class Env():
     """
 
     def __init__(self, train_mode=True,
-                 illegal_move_penalty=ILLEGAL_MOVE_PENALTY):
+                 illegal_move_penalty=ILLEGAL_MOVE_PENALTY,
+                 return_action_mask=False, sinks=None, lazy_state=False,
+                 array_state=False, action_mode='cards'):
         """
         Constructs a Tichu Environment for RL.
 
@@ -98,6 +199,17 @@ class Env():
         ---------
         train_mode: bool
           If false, verbosity of Game will be set to 1.
+        return_action_mask: bool
+          If true, reset() and step() also return the legal action mask.
+        sinks: list
+          Event sinks (see env.events) passed to every Game.
+        lazy_state: bool
+          If true, the state of a player is only computed on access.
+        array_state: bool
+          If true, the state is a read-only view of a preallocated
+          int8 array that is updated in place.
+        action_mode: str
+          The kind of actions taken by step() (see ACTION_MODES).
         """
         # dispatch table for reward function
         self.dispatch_reward = {'rich': self._update_rich_rewards,
@@ -107,8 +219,17 @@ class Env():
             self.verbose = 0
         else:
             self.verbose = 1
+        if action_mode not in ACTION_MODES:
+            raise ValueError('Unknown action mode: {}'.format(action_mode))
+        self.action_mode = action_mode
+        self.legal_actions = None
         self.state_size = 232
-        self.action_size = 56
+        if action_mode == 'cards':
+            self.action_size = 56
+        elif action_mode == 'combination':
+            self.action_size = get_move_table().size + 1
+        else:
+            self.action_size = None
         self.all_cards = Deck().all_cards
         self.game = None
         self.action_buffer = [[None], [None], [None], [None]]
@@ -117,18 +238,44 @@ class Env():
         self.done = False
         self.illegal_move_penalty = illegal_move_penalty
         self.nstep = 0 # only relevant for rich rewards
+        self.return_action_mask = return_action_mask
+        self.sinks = sinks
+        self.action_mask = None
+        if lazy_state and array_state:
+            raise ValueError('lazy_state and array_state are exclusive.')
+        self.lazy_state = lazy_state
+        self.array_state = array_state
+        if array_state:
+            self._state_array = np.zeros((4, 4, 58), dtype=np.int8)
+            self.state = self._state_array.view()
+            self.state.flags.writeable = False
+            # hand size and tichu flag of each player and the player
+            # in row j of the state of player i
+            self._player_info = np.zeros((4, 2), dtype=np.int8)
+            self._seats = (np.arange(4)[:, None] + np.arange(4)) % 4
 
     def reset(self):
         """ Resets the Environment. """
-        self.game = Game(verbose=self.verbose)
-        self._reset_all_states()
-        self._reset_action_buffer()
+        self.game = Game(verbose=self.verbose, sinks=self.sinks)
+        if self.array_state:
+            self._reset_state_array()
+        elif self.lazy_state:
+            self._reset_action_buffer()
+            self.state = LazyState(self)
+        else:
+            self._reset_all_states()
+            self._reset_action_buffer()
         self._reset_rewards()
         self.done = False
         state = self.state
         rewards = self.rewards
         done = self.done
         active_player = self.game.active_player
+        if self.action_mode == 'legal':
+            self._update_legal_actions()
+        if self.return_action_mask:
+            self._update_action_mask()
+            return state, rewards, done, active_player, self.action_mask
         return state, rewards, done, active_player
 
     def step(self, player_id, action):
@@ -139,23 +286,27 @@ class Env():
         Paramter
         --------
         player_id: The id (0...3) of the player that makes a move.
-        action: The action of the player as OHE Cards representation.
+        action: The action of the player as OHE Cards representation
+          (or as index, see action_mode).
         """
-        # convert action vector and make game step
-        cards = self._vec_to_cards(action)
-        suc, points_this_step = self.game.step(player_id, cards)
+        # convert action and make game step
+        cards = self._action_to_cards(player_id, action)
+        if cards is None:
+            suc = False
+        else:
+            suc, points_this_step = self.game.step(player_id, cards)
         # illegal move
         if not suc:
             self.rewards[player_id] = self.illegal_move_penalty
         # legal move
         else:
-            self._update_action_buffer(player_id, action)
-            self._update_all_states()
+            if self.action_mode != 'cards':
+                action = cards_to_vec(cards)
+            self._update_states(player_id, action)
             # reset state and action buffer if stack has been emptied
             # and update rewards according to points in the stack
             if not self.game.stack.cards:
-                self._reset_all_states()
-                self._reset_action_buffer()
+                self._clear_last_moves()
                 self._update_rewards(points_this_step)
             # update rewards for pass move
             elif cards.type == 'pass':
@@ -163,8 +314,7 @@ class Env():
             # reset state, action_buffer and rewards if Dog has been played
             # (required because Dog skips players)
             elif cards.cards[0].name == 'Dog':
-                self._reset_all_states()
-                self._reset_action_buffer()
+                self._clear_last_moves()
                 self._reset_rewards()
            # update rewards for regular game move
             else:
@@ -177,12 +327,72 @@ class Env():
         rewards = self.rewards
         done = self.done
         active_player = self.game.active_player
+        # the game state only changes by legal moves
+        if suc and self.action_mode == 'legal':
+            self._update_legal_actions()
+        if self.return_action_mask:
+            if suc:
+                self._update_action_mask()
+            return state, rewards, done, active_player, self.action_mask
         return state, rewards, done, active_player
 
     def info(self):
         """ Outputs size of state and action dimension. """
         return self.state_size, self.action_size
 
+    def _update_states(self, player_id, action):
+        """ Updates the states after a legal move of player_id. """
+        if self.array_state:
+            self._update_state_array(player_id, action)
+        elif self.lazy_state:
+            self._update_action_buffer(player_id, action)
+            self.state = LazyState(self)
+        else:
+            self._update_action_buffer(player_id, action)
+            self._update_all_states()
+
+    def _clear_last_moves(self):
+        """ Removes the last moves of all players from the states. """
+        if self.array_state:
+            self._state_array[:, 1:, 2:] = 0
+        elif self.lazy_state:
+            # the LazyState of this step renders from the action buffer
+            self._reset_action_buffer()
+        else:
+            self._reset_all_states()
+            self._reset_action_buffer()
+
+    def _reset_state_array(self):
+        """ Resets the state array to the initial setting. """
+        state = self._state_array
+        state.fill(0)
+        for pid, player in enumerate(self.game.players):
+            state[pid, 0, 2:] = mask_to_vec(player.hand.mask, np.int8)
+        self._update_player_info()
+
+    def _update_state_array(self, player_id, action):
+        """
+        Patches the state array after a legal move of player_id.
+
+        The played Cards are removed from the hand row of player_id and
+        written to the rows of player_id in the other players' states.
+        """
+        state = self._state_array
+        hand = state[player_id, 0, 2:]
+        np.subtract(hand, action, out=hand, casting='unsafe')
+        for offset in range(1, 4):
+            np.copyto(state[(player_id+offset)%4, 4-offset, 2:], action,
+                      casting='unsafe')
+        self._update_player_info()
+
+    def _update_player_info(self):
+        """ Writes hand sizes and tichu flags to the state array. """
+        info = self._player_info
+        for pid, player in enumerate(self.game.players):
+            info[pid, 0] = player.hand_size
+            info[pid, 1] = player.tichu_flag
+        np.take(info, self._seats, axis=0, out=self._state_array[:, :, :2])
+
     def _reset_all_states(self):
         """
         Resets the state to the initial setting.
@@ -211,21 +421,97 @@ class Env():
 
     def _update_all_states(self):
         """ Updates states with latest action taken by other players. """
-        self.state = list()
-        for i in range(4):
-            this_player = i
-            player_state = list()
-            for j in range(4):
-                pid = (this_player + j)%4
-                hand_size = self.game.players[pid].hand_size
-                tichu_flag = int(self.game.players[pid].tichu_flag)
-                if pid == this_player:
-                    player_cards = self._cards_to_vec(
-                        self.game.players[pid].hand)
-                else:
-                    player_cards = self.action_buffer[pid]
-                player_state.append([hand_size, tichu_flag, player_cards])
-            self.state.append(player_state)
+        self.state = [self._render_state(i) for i in range(4)]
+
+    def _render_state(self, this_player):
+        """ Returns the state of this_player from the action buffer. """
+        player_state = list()
+        for j in range(4):
+            pid = (this_player + j)%4
+            hand_size = self.game.players[pid].hand_size
+            tichu_flag = int(self.game.players[pid].tichu_flag)
+            if pid == this_player:
+                player_cards = self._cards_to_vec(
+                    self.game.players[pid].hand)
+            else:
+                player_cards = self.action_buffer[pid]
+            player_state.append([hand_size, tichu_flag, player_cards])
+        return player_state
+
+    def _update_action_mask(self):
+        """
+        Updates the legal action mask of the active player.
+
+        Only the legal move table entries of the active player are
+        expanded, no Cards instances are created.
+        """
+        table = get_move_table()
+        hand = self.game.players[self.game.active_player].hand
+        card_mask = 0
+        comb_mask = np.zeros(table.size+1, dtype=bool)
+        for idx in self.game.stack.legal_entries(hand):
+            comb_masks = table.expand(idx, hand.mask)
+            if comb_masks:
+                comb_mask[idx] = True
+                for mask in comb_masks:
+                    card_mask |= mask
+        # passing is legal if the stack is not empty
+        comb_mask[-1] = bool(self.game.stack.cards)
+        self.action_mask = ActionMask(mask_to_vec(card_mask, np.int8),
+                                      comb_mask)
+
+    def _update_legal_actions(self):
+        """ Updates the legal moves of the active player. """
+        self.legal_actions = self.game.legal_moves(self.game.active_player)
+        if self.game.stack.cards:
+            self.legal_actions.append(Cards([], 'pass', 0))
+
+    def _action_to_cards(self, player_id, action):
+        """
+        Returns the Cards of an action (see action_mode).
+
+        Returns None (an illegal move) for an index out of range and
+        for a combination index whose entry is not available in the
+        hand of player_id.
+        """
+        if self.action_mode == 'cards':
+            return self._vec_to_cards(action)
+        action = int(action)
+        if self.action_mode == 'legal':
+            if not 0 <= action < len(self.legal_actions):
+                return None
+            return self.legal_actions[action]
+        table = get_move_table()
+        if not 0 <= action <= table.size:
+            return None
+        if action == table.size:
+            return Cards([], 'pass', 0)
+        comb_mask = self._choose_combination(
+            action, self.game.players[player_id].hand.mask)
+        if comb_mask is None:
+            return None
+        return Cards.from_mask(comb_mask, COMB_NAMES[table.types[action]],
+                               float(table.powers[action]))
+
+    @staticmethod
+    def _choose_combination(idx, hand_mask):
+        """
+        Returns the card mask of MoveTable entry idx to play from a hand.
+
+        The choice of suits is deterministic: the combination using the
+        fewest Cards of bombs in the hand is chosen, ties are broken by
+        the lowest card mask. Returns None if the entry is not available.
+        """
+        table = get_move_table()
+        comb_masks = table.expand(idx, hand_mask)
+        if not comb_masks:
+            return None
+        bomb_mask = 0
+        for bomb in table.select(hand_mask, BOMB_TYPES):
+            for mask in table.expand(bomb, hand_mask):
+                bomb_mask |= mask
+        return min(comb_masks, key=lambda mask: (popcount(mask & bomb_mask),
+                                                 mask))
 
     def _reset_action_buffer(self):
         """ Resets the action buffer. """
@@ -297,13 +583,8 @@ class Env():
 
     def _cards_to_vec(self, cards):
         """ Turns a Cards instance into a vector representation. """
-        vec = np.zeros(len(self.all_cards), int)
-        for i in range(len(self.all_cards)):
-            crd = Cards([self.all_cards[i]])
-            if cards.contains(crd):
-                vec[i] = 1
-        return vec.tolist()
+        return cards_to_vec(cards).tolist()
 
     def _vec_to_cards(self, vec):
         """ Turns a vector representation into a Cards instance. """
-        return Cards(list(compress(self.all_cards, vec)))
+        return vec_to_cards(vec)
@@ -0,0 +1,224 @@
+""" This module contains a structured event log of Tichu games. """
+
+import json
+from collections import deque, namedtuple
+
+from env.cards import Cards
+
+# Kinds of events emitted by Game
+DEAL = 'deal'
+TICHU = 'tichu'
+PLAY = 'play'
+PASS = 'pass'
+STACK_WON = 'stack_won'
+DRAGON_GIFT = 'dragon_gift'
+PLAYER_FINISHED = 'player_finished'
+TICHU_RESULT = 'tichu_result'
+GAME_END = 'game_end'
+WRONG_PLAYER = 'wrong_player'
+INVALID = 'invalid'
+
+# An event of kind, caused by player (None for the Game), with a dict
+# of plain (JSON serializable) data, e.g. Cards as 56-bit masks
+Event = namedtuple('Event', ['kind', 'player', 'data'])
+
+
+class EventLog():
+    """
+    Passes the events of a Game to sinks.
+
+    Game only holds an EventLog if there is at least one sink, so that
+    a disabled log costs a single attribute check per event.
+
+    Attributes
+    ----------
+    sinks: list
+      Objects with a write(event) method, e.g. RingBufferSink,
+      JsonlSink or ConsoleSink.
+
+    Methods
+    -------
+    emit(kind, player, **data):
+      Builds an Event and writes it to all sinks.
+    close():
+      Closes all sinks that have a close() method.
+    """
+
+    def __init__(self, sinks):
+        """
+        Constructs an EventLog.
+
+        Parameter
+        ---------
+        sinks: list
+          The sinks to write events to.
+        """
+        self.sinks = list(sinks)
+
+    def emit(self, kind, player=None, **data):
+        """ Builds an Event and writes it to all sinks. """
+        event = Event(kind, player, data)
+        for sink in self.sinks:
+            sink.write(event)
+
+    def close(self):
+        """ Closes all sinks that have a close() method. """
+        for sink in self.sinks:
+            if hasattr(sink, 'close'):
+                sink.close()
+
+
+class RingBufferSink():
+    """
+    Keeps the most recent events in memory.
+
+    Attributes
+    ----------
+    events: collections.deque of Event
+      The most recent events, oldest first.
+    """
+
+    def __init__(self, maxlen=10000):
+        """ Constructs a buffer of the maxlen most recent events. """
+        self.events = deque(maxlen=maxlen)
+
+    def write(self, event):
+        """ Appends an event, dropping the oldest if the buffer is full. """
+        self.events.append(event)
+
+
+class JsonlSink():
+    """
+    Writes events to a file, one JSON object per line.
+
+    Lines are buffered and written buffer_size events at a time, and
+    when the sink is closed (it can be used as a context manager).
+    """
+
+    def __init__(self, filename, buffer_size=1000):
+        """
+        Opens filename for appending events.
+
+        Parameter
+        ---------
+        filename: str
+          The path of the .jsonl file.
+        buffer_size: int
+          The number of events kept before writing them.
+        """
+        self.buffer_size = buffer_size
+        self._file = open(filename, 'a')
+        self._lines = list()
+
+    def write(self, event):
+        """ Buffers an event and writes the buffer if it is full. """
+        self._lines.append(json.dumps({'kind': event.kind,
+                                       'player': event.player,
+                                       **event.data}))
+        if len(self._lines) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """ Writes all buffered events to the file. """
+        if self._lines:
+            self._file.write('\n'.join(self._lines) + '\n')
+            self._lines.clear()
+        self._file.flush()
+
+    def close(self):
+        """ Writes all buffered events and closes the file. """
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *unused_args):
+        self.close()
+
+
+class ConsoleSink():
+    """
+    Pretty-prints events to the console (the verbose mode of Game).
+
+    Events are printed if their level is at most verbose: game events
+    have level 1, invalid steps and won stacks level 2.
+    """
+
+    LEVELS = {INVALID: 2, STACK_WON: 2}
+
+    def __init__(self, verbose=1):
+        """ Constructs a ConsoleSink printing events up to verbose. """
+        self.verbose = verbose
+
+    def write(self, event):
+        """ Prints an event. """
+        if self.LEVELS.get(event.kind, 1) > self.verbose:
+            return
+        getattr(self, '_print_' + event.kind)(event.player, **event.data)
+
+    @staticmethod
+    def _print_deal(player, hand, rating):
+        print('Player {0} hand (rating: {1}) is:'.format(player, rating))
+        Cards.from_mask(hand).show()
+
+    @staticmethod
+    def _print_tichu(player):
+        print('Player {} called Tichu!'.format(player))
+
+    @staticmethod
+    def _print_play(player, cards, comb_type, power):
+        print('Player {0} plays {1}.'.format(player, comb_type))
+        Cards.from_mask(cards).show()
+
+    @staticmethod
+    def _print_pass(player):
+        print('Player {0} passes'.format(player))
+
+    @staticmethod
+    def _print_stack_won(player, points):
+        print('Player {0} won the stack ({1} points)'.format(player, points))
+
+    @staticmethod
+    def _print_dragon_gift(player, receiver, points):
+        print('Player {0} gave dragon stack to player {1}'.format(
+            player, receiver))
+
+    @staticmethod
+    def _print_player_finished(player, position):
+        print('Player {0} has finished on position {1}!'.format(
+            player, position))
+
+    @staticmethod
+    def _print_tichu_result(player, success):
+        if success:
+            print('Successfull Tichu by player {0}!'.format(player))
+        else:
+            print('Tichu by player {0} was not successfull!'.format(player))
+
+    @staticmethod
+    def _print_game_end(player, points, double_victory):
+        if double_victory:
+            print('Double team victory by players {0} and {1}!'.format(
+                player, (player+2)%4))
+        print('-----')
+        print('Game is finished!')
+        print('Score of player 0 and player 2: {0}'.format(
+            points[0] + points[2]))
+        print('Score of player 1 and player 3: {0}'.format(
+            points[1] + points[3]))
+
+    @staticmethod
+    def _print_wrong_player(player, active):
+        print('Player {0} tried to make a move, but active player is {1}.'
+              .format(player, active))
+
+    @staticmethod
+    def _print_invalid(player, cards):
+        if not cards:
+            print('Pass not possible, stack is empty!')
+        else:
+            print('Invalid move by player {0}'.format(player))
+            print('Player {0} tried to play:'.format(player))
+            Cards.from_mask(cards).show()
@@ -1,11 +1,35 @@
 """ This module contains a class to represent a Tichu Game. """
 
+from collections import namedtuple
+
+from env.cards import Cards, DOG_MASK
 from env.deck import Deck
+from env import events
+from env.events import ConsoleSink, EventLog
 from env.player import Player
 from env.stack import Stack
+from env.zobrist import (ACTIVE_KEYS, FINISHED_KEYS, PASS_KEYS, hand_key,
+                         stack_key, turn_key, zobrist_hash)
 
 # Tichu is called when the hand rating of a Player exceeds the threshold.
-TICHU_THRESHOLD = 90 # 90 = roughly 30% Tichu frequency in all games
+TICHU_THRESHOLD = 92 # 92 = roughly 6.5% of hands, 25% of games with a call
+
+# Everything a step may change, recorded by Game.apply() for Game.undo().
+# suc and points_this_step are the return values of the step.
+UndoToken = namedtuple('UndoToken', ['player_id', 'suc', 'points_this_step',
+                                     'stack', 'stack_state', 'turn_state',
+                                     'player_states', 'hand_state',
+                                     'tichu_points'])
+
+# The complete state of a Game, recorded by Game.snapshot(). Cards are
+# stored as 56-bit masks, the stack as a tuple of (mask, type, power)
+# per played combination, so that a snapshot is small and picklable.
+GameSnapshot = namedtuple('GameSnapshot', ['hands', 'stack', 'stack_power',
+                                           'points', 'tichu_flags',
+                                           'hand_ratings', 'leading_player',
+                                           'active_player', 'pass_counter',
+                                           'players_finished',
+                                           'game_finished', 'tichu_points'])
 
 class Game():
     """
@@ -15,6 +39,9 @@ class Game():
     ----------
     verbose: int
       The Players' moves and Game info is printed if verbose > 0.
+    events: EventLog
+      Passes the events of the Game to sinks (see env.events), None
+      if there are no sinks.
     players: list of Player
       A list containing all 4 Players of a Tichu Game.
     Stack: Stack
@@ -31,6 +58,9 @@ class Game():
       Whether the Game is finished or not.
     tichu_points: list of int
       The points the Players have achieved when Tichu is called.
+    zobrist: int
+      The 64-bit Zobrist hash of the position (see env.zobrist),
+      updated incrementally by every step.
 
     Methods
     -------
@@ -38,30 +68,41 @@ class Game():
       Continues the Game by making a move of player_id.
     show_hands(player_id):
       Prints the hand Cards of all Players.
+    legal_moves(player_id):
+      Returns all combinations player_id can play upon the Stack.
+    apply(player_id, cards):
+      Makes a step like step() and returns a token to undo it.
+    undo(token):
+      Reverts the step of a token returned by apply().
+    snapshot():
+      Returns the state of the Game as an immutable GameSnapshot.
+    from_snapshot(snapshot, verbose, sinks):
+      Constructs a Game in the state of a GameSnapshot.
     """
 
-    def __init__(self, verbose=0):
+    def __init__(self, verbose=0, sinks=None):
         """
         Constructs a Tichu Game, distributes cards and checks Tichu calls.
 
         Paramter
         --------
         verbose: Whether to print Game states and Players actions.
+        sinks: Event sinks (see env.events) to pass Game events to.
         """
         # Create deck and distribute cards
         deck = Deck()
         sets = deck.shuffle_and_deal()
-        # Set verbosity
+        # Set verbosity and event sinks
         self.verbose = verbose
+        self.events = self._event_log(verbose, sinks)
         # Create players and assign hands
         self.players = list()
         for i in range(4):
             self.players.append(Player())
             self.players[i].assign_hand(sets[i])
-            rating = self.players[i].hand_rating
-            if self.verbose > 0:
-                print('Player {0} hand (rating: {1}) is:'.format(i, rating))
-                self.players[i].hand.show()
+            if self.events:
+                self.events.emit(events.DEAL, i, hand=sets[i].mask,
+                                 rating=self.players[i].hand_rating)
         # Create empty stack
         self.stack = Stack()
         # Determine active player and set game managing parameter
@@ -87,10 +128,11 @@ class Game():
                 pass
             elif self.players[player_idx].hand_rating > tichu_threshold:
                 self.players[player_idx].call_tichu()
-                if verbose > 0:
-                    print('Player {} called Tichu!'.format(player_idx))
+                if self.events:
+                    self.events.emit(events.TICHU, player_idx)
             else:
                 pass
+        self.zobrist = zobrist_hash(self)
 
     def step(self, player_id, cards):
         """
@@ -100,20 +142,140 @@ class Game():
         - iterates active player token
         - checks if game is finished
         """
-        dispatch_move = {True: self._pass_routine,
-                         False: self._play_routine}
-        points_this_step = [0, 0, 0, 0]
         # check if action is by active player
         if not player_id == self.active_player:
-            if self.verbose > 0:
-                print(
-                  'Player {0} tried to make a move, but active player is {1}.'
-                  .format(player_id, self.active_player))
-            return False, points_this_step
+            if self.events:
+                self.events.emit(events.WRONG_PLAYER, player_id,
+                                 active=self.active_player)
+            return False, [0, 0, 0, 0]
         # call either pass or play routine
-        suc, points_this_step = dispatch_move[cards.type == 'pass'](
-            player_id, cards)
-        return suc, points_this_step
+        if cards.type == 'pass':
+            return self._pass_routine(player_id)
+        return self._play_routine(player_id, cards)
+
+    def apply(self, player_id, cards):
+        """
+        Makes a step like step() and returns an UndoToken.
+
+        The token holds the return values of the step (suc and
+        points_this_step) and the state needed to revert it with
+        undo(). Recording the state does not copy any Cards, Players
+        or Stacks.
+        """
+        stack = self.stack
+        player = self.players[player_id]
+        hand = player.hand
+        stack_state = (len(stack.cards), stack.points, stack.power,
+                       stack.type, stack.dragon_flag)
+        turn_state = (self.leading_player, self.active_player,
+                      self.pass_counter, len(self.players_finished),
+                      self.game_finished, self.zobrist)
+        player_states = tuple((plr.points, plr.tichu_flag)
+                              for plr in self.players)
+        hand_state = (hand.cards, hand.mask, hand.phoenix_flag, hand.size,
+                      hand.type, hand.power, hand.points, player.combinations,
+                      player.hand_size, player.hand_power, player.finished)
+        tichu_points = tuple(self.tichu_points)
+        suc, points_this_step = self.step(player_id, cards)
+        return UndoToken(player_id, suc, points_this_step, stack, stack_state,
+                         turn_state, player_states, hand_state, tichu_points)
+
+    def undo(self, token):
+        """
+        Reverts the step of a token returned by apply().
+
+        Steps must be undone in reverse order of apply().
+        """
+        # restore stack (the stack may have been replaced by a new one)
+        self.stack = token.stack
+        (n_cards, self.stack.points, self.stack.power,
+         self.stack.type, self.stack.dragon_flag) = token.stack_state
+        del self.stack.cards[n_cards:]
+        # restore turn data
+        (self.leading_player, self.active_player, self.pass_counter,
+         n_finished, self.game_finished, self.zobrist) = token.turn_state
+        del self.players_finished[n_finished:]
+        self.tichu_points[:] = token.tichu_points
+        # restore points and Tichu calls of all players
+        for plr, (points, tichu_flag) in zip(self.players,
+                                             token.player_states):
+            plr.points = points
+            plr.tichu_flag = tichu_flag
+        # restore hand of the player who made the step
+        player = self.players[token.player_id]
+        hand = player.hand
+        (hand.cards, hand.mask, hand.phoenix_flag, hand.size, hand.type,
+         hand.power, hand.points, player.combinations, player.hand_size,
+         player.hand_power, player.finished) = token.hand_state
+
+    def snapshot(self):
+        """
+        Returns the state of the Game as an immutable GameSnapshot.
+
+        The snapshot only holds ints, floats, strings and tuples, it
+        can be pickled and sent to other processes.
+        """
+        players = self.players
+        return GameSnapshot(
+            hands=tuple(plr.hand.mask for plr in players),
+            stack=tuple((crds.mask, crds.type, crds.power)
+                        for crds in self.stack.cards),
+            stack_power=self.stack.power,
+            points=tuple(plr.points for plr in players),
+            tichu_flags=tuple(plr.tichu_flag for plr in players),
+            hand_ratings=tuple(plr.hand_rating for plr in players),
+            leading_player=self.leading_player,
+            active_player=self.active_player,
+            pass_counter=self.pass_counter,
+            players_finished=tuple(self.players_finished),
+            game_finished=self.game_finished,
+            tichu_points=tuple(self.tichu_points))
+
+    @classmethod
+    def from_snapshot(cls, snapshot, verbose=0, sinks=None):
+        """
+        Constructs a Game in the state of a GameSnapshot.
+
+        No Cards are dealt and no hands are rated, the hands and the
+        stack are rebuilt from their masks (the combinations of the
+        hands come from the combination cache).
+        """
+        game = cls.__new__(cls)
+        game.verbose = verbose
+        game.events = cls._event_log(verbose, sinks)
+        game.players = list()
+        for mask, points, tichu_flag, rating in zip(
+                snapshot.hands, snapshot.points, snapshot.tichu_flags,
+                snapshot.hand_ratings):
+            player = Player()
+            player.assign_hand(Cards.from_mask(mask), hand_rating=rating)
+            player.points = points
+            player.tichu_flag = tichu_flag
+            game.players.append(player)
+        game.stack = Stack()
+        if snapshot.stack:
+            game.stack.cards = [Cards.from_mask(mask, comb_type, power)
+                                for mask, comb_type, power in snapshot.stack]
+            game.stack._update()
+            game.stack.power = snapshot.stack_power
+        game.leading_player = snapshot.leading_player
+        game.active_player = snapshot.active_player
+        game.pass_counter = snapshot.pass_counter
+        game.players_finished = list(snapshot.players_finished)
+        game.game_finished = snapshot.game_finished
+        game.tichu_points = list(snapshot.tichu_points)
+        game.zobrist = zobrist_hash(game)
+        return game
+
+    def legal_moves(self, player_id):
+        """
+        Returns all combinations player_id can play upon the Stack.
+
+        The combinations are sorted by ascending power. Passing is not
+        included, it is a legal move whenever the Stack is not empty.
+        """
+        player = self.players[player_id]
+        return self.stack.legal_responses(player.hand, player.combinations)
 
     def show_hands(self, pid=None):
         """ Prints current hand cards of pid. """
@@ -125,9 +287,19 @@ class Game():
                 print('Player {0} hand is:'.format(i))
                 self.players[i].hand.show()
 
+    @staticmethod
+    def _event_log(verbose, sinks):
+        """ Returns an EventLog of sinks (and printing), None if empty. """
+        sinks = list(sinks or [])
+        if verbose > 0:
+            sinks.append(ConsoleSink(verbose))
+        if sinks:
+            return EventLog(sinks)
+        return None
+
     def _get_opponents(self, pid=None):
         """ Returns the opponents of pid as list. """
-        if not pid:
+        if pid is None:
             pid = self.leading_player
         if pid%2 == 0:
             opps = [1, 3]
@@ -137,7 +309,7 @@ class Game():
 
     def _get_teammate(self, pid=None):
         """ Returns the teammate of pid. """
-        if not pid:
+        if pid is None:
             pid = self.leading_player
         if pid == 0:
             return 2
@@ -150,27 +322,30 @@ class Game():
 
     def _pass_routine(self, player_id, *unused_args):
         """ Changes game state when active player passes. """
-        dispatch_pass = {True: self._stack_finished_routine,
-                         False: self._stack_continues_routine}
-        points_this_step = [0, 0, 0, 0]
-        if self.verbose > 0:
-            print('Player {0} passes'.format(player_id))
+        if self.events:
+            self.events.emit(events.PASS, player_id)
         # check if pass is valid (i.e. stack not empty)
         if not self.stack.cards:
-            suc = False
-            if self.verbose > 1:
-                print('Pass not possible, stack is empty!')
-        else:
-            suc = True
-            # increment pass counter
-            self.pass_counter += 1
-            # if 3 players have passed, stack is finished
-            points_this_step = dispatch_pass[self.pass_counter>=3](player_id)
-        return suc, points_this_step
+            if self.events:
+                self.events.emit(events.INVALID, player_id, cards=0)
+            return False, [0, 0, 0, 0]
+        # increment pass counter
+        self.zobrist ^= PASS_KEYS[self.pass_counter]
+        self.pass_counter += 1
+        self.zobrist ^= PASS_KEYS[self.pass_counter]
+        # if 3 players have passed, stack is finished
+        if self.pass_counter >= 3:
+            return True, self._stack_finished_routine()
+        return True, self._stack_continues_routine(player_id)
 
     def _stack_finished_routine(self, *unused_args):
         """ Changes game state when stack is won by a player. """
         points_this_step = [0, 0, 0, 0]
+        self.zobrist ^= stack_key(self.stack) ^ turn_key(
+            self.leading_player, self.active_player, self.pass_counter)
+        if self.events:
+            self.events.emit(events.STACK_WON, self.leading_player,
+                             points=self.stack.points)
         # if stack contains Dragon it must be given to opponent player
         if self.stack.dragon_flag:
             points_this_step = self._dragon_stack()
@@ -198,35 +373,42 @@ class Game():
             self.leading_player = (self.leading_player+3)%4
             self.active_player = self.leading_player
         self.pass_counter = 0
+        # the new stack is empty and has no key
+        self.zobrist ^= turn_key(self.leading_player, self.active_player,
+                                 self.pass_counter)
         return points_this_step
 
     def _stack_continues_routine(self, player_id):
         """ ‚Changes game state when stack is still playable. """
         points_this_step = [0, 0, 0, 0]
+        self.zobrist ^= ACTIVE_KEYS[self.active_player]
         self.active_player = (player_id+1)%4
+        self.zobrist ^= ACTIVE_KEYS[self.active_player]
         return points_this_step
 
     def _play_routine(self, player_id, cards):
         """ Changes game state when active player plays cards. """
-        points_this_step = [0, 0, 0, 0]
-        dispatch_valid_move = {True: self._valid_move_routine,
-                               False: self._invalid_move_routine}
         # plausibility check: cards in hand of player and matches stack type
-        suc1 = self.players[player_id].move(cards)
-        suc2 = self.stack.assert_valid_move(cards)
-        suc, points_this_step = dispatch_valid_move[(suc1 and suc2)](
-            player_id, cards)
-        return suc, points_this_step
-
-    def _valid_move_routine(self, player_id, cards):
-        """ Changes game state when player move is valid. """
-        points_this_step = [0, 0, 0, 0]
+        if not self.players[player_id].move(cards):
+            return self._invalid_move_routine(player_id, cards)
+        power = self.stack.validate(cards)
+        if power is None:
+            return self._invalid_move_routine(player_id, cards)
+        return self._valid_move_routine(player_id, cards, power)
+
+    def _valid_move_routine(self, player_id, cards, power):
+        """
+        Changes game state when player move is valid.
+
+        The move has already been validated by Stack.validate(), which
+        returned the new power of the stack.
+        """
+        self.zobrist ^= stack_key(self.stack) ^ turn_key(
+            self.leading_player, self.active_player, self.pass_counter)
         # add cards to stack
-        suc = self.stack.add(cards)
-        if not suc:
-            raise RuntimeError('This should never happen...')
+        self.stack.push(cards, power)
         # determine next active player
-        if cards.cards[0].name == 'Dog':
+        if cards.mask == DOG_MASK:
             teammate = self._get_teammate(player_id)
             if not teammate in self.players_finished:
                 self.active_player = teammate
@@ -234,8 +416,7 @@ class Game():
             elif not (teammate+1)%4 in self.players_finished:
                 self.active_player = (teammate+1)%4
                 self.leading_player = (teammate+1)%4
-            elif not ((self.leading_player+2)%4
-                      in self.players_finished):
+            elif not (teammate+2)%4 in self.players_finished:
                 self.active_player = (teammate+2)%4
                 self.leading_player = (teammate+2)%4
             else:
@@ -248,40 +429,42 @@ class Game():
         # remove cards from player hand
         _ = self.players[player_id].remove_cards(cards)
         self.pass_counter = 0
-        if self.verbose > 0:
-            print('Player {0} plays {1}.'.format(
-                    player_id, cards.type))
-            cards.show()
+        self.zobrist ^= (hand_key(player_id, cards.mask) ^
+                         stack_key(self.stack) ^
+                         turn_key(self.leading_player, self.active_player,
+                                  self.pass_counter))
+        if self.events:
+            self.events.emit(events.PLAY, player_id, cards=cards.mask,
+                             comb_type=cards.type, power=power)
         # check if player and game is finished
         if self.players[player_id].finished:
-            points_this_step = self._player_finished_routine(player_id)
-        return True, points_this_step
+            return True, self._player_finished_routine(player_id)
+        return True, [0, 0, 0, 0]
 
     def _player_finished_routine(self, player_id):
         """ Changes game state when player made finishing move. """
-        dispatch_finish = {1: lambda *args: [0, 0, 0, 0],
-                           2: self._check_double_victory,
-                           3: self._regular_game_end}
-        if self.verbose > 0:
-            print(
-              'Player {0} has finished on position {1}!'
-              .format(player_id, len(self.players_finished)+1))
+        if self.events:
+            self.events.emit(events.PLAYER_FINISHED, player_id,
+                             position=len(self.players_finished)+1)
+        self.zobrist ^= FINISHED_KEYS[len(self.players_finished)][player_id]
         self.players_finished.append(player_id)
         # check if any Tichu call was successfull or not
         tichu_points_this_step = self._check_tichu_success()
         # check if game is finished
-        points_this_step = dispatch_finish[len(self.players_finished)](
-                                                                    player_id)
+        if len(self.players_finished) == 2:
+            points_this_step = self._check_double_victory(player_id)
+        elif len(self.players_finished) == 3:
+            points_this_step = self._regular_game_end()
+        else:
+            points_this_step = [0, 0, 0, 0]
         # aggregate points from game end and tichu
         total_points_this_step = [sum(x) for x in zip(points_this_step,
                                                       tichu_points_this_step)]
-        if self.game_finished and self.verbose > 0:
-            print('-----')
-            print('Game is finished!')
-            print('Score of player 0 and player 2: {0}'.format(
-                (self.players[0].points+self.players[2].points)))
-            print('Score of player 1 and player 3: {0}'.format(
-                (self.players[1].points+self.players[3].points)))
+        if self.game_finished and self.events:
+            self.events.emit(
+                events.GAME_END, player_id,
+                points=[plr.points for plr in self.players],
+                double_victory=len(self.players_finished) == 2)
         return total_points_this_step
 
     def _check_double_victory(self, player_id):
@@ -289,13 +472,8 @@ class Game():
         points_this_step = [0, 0, 0, 0]
         if (len(self.players_finished) == 2 and
               sum(self.players_finished)%2 == 0):
-            if self.verbose > 0:
-                print(
-                  'Double team victory by players {0} and {1}!'
-                  .format(self.players_finished[0],
-                          self.players_finished[1]))
-            opponents = self._get_opponents()
-            teammate = self._get_teammate()
+            opponents = self._get_opponents(player_id)
+            teammate = self._get_teammate(player_id)
             self.players[player_id].set_points(100)
             self.players[teammate].set_points(100)
             self.players[opponents[0]].set_points(0)
@@ -350,28 +528,24 @@ class Game():
                     self.players[i].add_points(100)
                     self.tichu_points[i] = 100
                     tichu_points_this_step[i] += 100
-                    if self.verbose > 0:
-                        print('Successfull Tichu by player {0}!'
-                          .format(i))
+                    if self.events:
+                        self.events.emit(events.TICHU_RESULT, i,
+                                         success=True)
                 else:
                     self.players[i].add_points(-100)
                     self.tichu_points[i] = -100
                     tichu_points_this_step[i] -= 100
-                    if self.verbose > 0:
-                        print(
-                          'Tichu by player {0} was not successfull!'
-                          .format(i))
+                    if self.events:
+                        self.events.emit(events.TICHU_RESULT, i,
+                                         success=False)
                 # undo Tichu flag to avoids points are added more than once
                 self.players[i].tichu_flag = False
         return tichu_points_this_step
 
     def _invalid_move_routine(self, player_id, cards):
-        points_this_step = [0, 0, 0, 0]
-        if self.verbose > 1:
-            print('Invalid move by player {0}'.format(player_id))
-            print('Player {0} tried to play:'.format(player_id))
-            cards.show()
-        return False, points_this_step
+        if self.events:
+            self.events.emit(events.INVALID, player_id, cards=cards.mask)
+        return False, [0, 0, 0, 0]
 
     def _dragon_stack(self):
         """
@@ -391,29 +565,18 @@ class Game():
         points_this_step = [0, 0, 0, 0]
         # if either opponent has called tichu, give cards to other opponent
         if self.players[opponents[0]].tichu_flag:
-            self.players[opponents[1]].add_points(self.stack.points)
-            points_this_step[opponents[1]] = self.stack.points
-            if self.verbose > 0:
-                print('Player {0} gave dragon stack to player {1}'.format(
-                    self.leading_player, opponents[1]))
+            receiver = opponents[1]
         elif self.players[opponents[1]].tichu_flag:
-            self.players[opponents[0]].add_points(self.stack.points)
-            points_this_step[opponents[0]] = self.stack.points
-            if self.verbose > 0:
-                print('Player {0} gave dragon stack to player {1}'.format(
-                    self.leading_player, opponents[0]))
+            receiver = opponents[0]
         # no tichu called, stack goes to opponent with more hand cards
         elif (self.players[opponents[0]].hand_size <
               self.players[opponents[1]].hand_size):
-            self.players[opponents[1]].add_points(self.stack.points)
-            points_this_step[opponents[1]] = self.stack.points
-            if self.verbose > 0:
-                print('Player {0} gave dragon stack to player {1}'.format(
-                    self.leading_player, opponents[1]))
+            receiver = opponents[1]
         else:
-            self.players[opponents[0]].add_points(self.stack.points)
-            points_this_step[opponents[0]] = self.stack.points
-            if self.verbose > 0:
-                print('Player {0} gave dragon stack to player {1}'.format(
-                    self.leading_player, opponents[0]))
+            receiver = opponents[0]
+        self.players[receiver].add_points(self.stack.points)
+        points_this_step[receiver] = self.stack.points
+        if self.events:
+            self.events.emit(events.DRAGON_GIFT, self.leading_player,
+                             receiver=receiver, points=self.stack.points)
         return points_this_step
@@ -0,0 +1,347 @@
+""" This module contains an array-based headless Tichu game kernel. """
+
+import numpy as np
+
+from env.cards import (COMB_TYPES, DOG_MASK, DRAGON_MASK, MAJONG_MASK,
+                       PHOENIX_MASK, mask_points, popcount, signature_type)
+
+# Return codes of GameKernel.step(), negative codes are invalid steps
+WRONG_PLAYER = -2
+INVALID_MOVE = -1
+PLAYED = 0
+PASSED = 1
+STACK_WON = 2
+PLAYER_FINISHED = 3
+GAME_FINISHED = 4
+
+# Fields of GameKernel.turn
+LEADING = 0
+ACTIVE = 1
+PASSES = 2
+N_FINISHED = 3
+OVER = 4
+# Fields of GameKernel.stack, the power is stored in tenths
+# (e.g. 151 for the Dragon) and the type is -1 for an empty Stack
+TYPE = 0
+SIZE = 1
+POWER = 2
+POINTS = 3
+DRAGON = 4
+N_PLAYED = 5
+EMPTY_STACK = (-1, 0, 0, 0, 0, 0)
+
+SOLO = COMB_TYPES['solo']
+STRAIGHT = COMB_TYPES['straight']
+PAIR_SEQ = COMB_TYPES['pair_seq']
+FOUR_BOMB = COMB_TYPES['four_bomb']
+STRAIGHT_BOMB = COMB_TYPES['straight_bomb']
+
+
+class GameKernel():
+    """
+    A headless Tichu game held in a few small integer arrays.
+
+    Implements the same rules as Game (Dog handoff, dragon stack,
+    double victory, Tichu scoring and settlement with the last Player),
+    but moves are card masks, steps return integer codes and nothing is
+    printed. Game stays the readable reference of the rules, the kernel
+    is tested against it on identical deals.
+
+    Attributes
+    ----------
+    hands: np.ndarray of int64
+      The card mask of each Players' hand.
+    points: np.ndarray of int64
+      The points of each Player.
+    tichu: np.ndarray of int64
+      Whether each Player has called Tichu (reset when the first
+      Player finishes, like Player.tichu_flag).
+    tichu_points: np.ndarray of int64
+      The points each Player has achieved with a Tichu call.
+    finished: np.ndarray of int64
+      The Players in the order they finished, -1 for open positions.
+    turn: np.ndarray of int64
+      The leading Player (-1 if none), active Player, pass counter,
+      number of finished Players and whether the game is over.
+    stack: np.ndarray of int64
+      The type, size and power of the top of the Stack and the points,
+      dragon flag and number of combinations of the Stack.
+    reward: np.ndarray of int64
+      The points of each Player in the last step (points_this_step
+      of Game.step()), overwritten by every step.
+
+    Methods
+    -------
+    from_game(game):
+      Constructs a GameKernel in the current state of a Game.
+    from_arrays(arrays):
+      Constructs a GameKernel upon existing state arrays.
+    step(player_id, mask):
+      Makes a move of player_id and returns a step code.
+    """
+
+    def __init__(self, hands, tichu_flags=(0, 0, 0, 0)):
+        """
+        Constructs a GameKernel from dealt hands.
+
+        Parameter
+        ---------
+        hands: sequence of int
+          The card masks of the 4 hands.
+        tichu_flags: sequence of int
+          Whether each Player has called Tichu.
+        """
+        self.hands = np.array(hands, dtype=np.int64)
+        self.points = np.zeros(4, dtype=np.int64)
+        self.tichu = np.array(tichu_flags, dtype=np.int64)
+        self.tichu_points = np.zeros(4, dtype=np.int64)
+        self.finished = np.full(4, -1, dtype=np.int64)
+        self.turn = np.zeros(5, dtype=np.int64)
+        self.stack = np.array(EMPTY_STACK, dtype=np.int64)
+        self.reward = np.zeros(4, dtype=np.int64)
+        self._tichu_reward = np.zeros(4, dtype=np.int64)
+        # Player with Majong starts
+        self.turn[LEADING] = -1
+        for pid in range(4):
+            if int(self.hands[pid]) & MAJONG_MASK:
+                self.turn[ACTIVE] = pid
+
+    @classmethod
+    def from_game(cls, game):
+        """ Constructs a GameKernel in the current state of a Game. """
+        kernel = cls([plr.hand.mask for plr in game.players],
+                     [plr.tichu_flag for plr in game.players])
+        kernel.points[:] = [plr.points for plr in game.players]
+        kernel.tichu_points[:] = game.tichu_points
+        kernel.finished[:len(game.players_finished)] = game.players_finished
+        kernel.turn[:] = (-1 if game.leading_player is None
+                          else game.leading_player, game.active_player,
+                          game.pass_counter, len(game.players_finished),
+                          game.game_finished)
+        stack = game.stack
+        if stack.cards:
+            kernel.stack[:] = (COMB_TYPES[stack.type], stack.cards[-1].size,
+                               round(stack.power * 10), stack.points,
+                               stack.dragon_flag, len(stack.cards))
+        return kernel
+
+    @classmethod
+    def from_arrays(cls, hands, points, tichu, tichu_points, finished, turn,
+                    stack, reward):
+        """
+        Constructs a GameKernel upon existing state arrays.
+
+        The arrays are used without copying, so that steps of the
+        kernel change them (e.g. rows of the arrays of a BatchGame).
+        """
+        kernel = cls.__new__(cls)
+        kernel.hands = hands
+        kernel.points = points
+        kernel.tichu = tichu
+        kernel.tichu_points = tichu_points
+        kernel.finished = finished
+        kernel.turn = turn
+        kernel.stack = stack
+        kernel.reward = reward
+        kernel._tichu_reward = np.zeros(4, dtype=np.int64)
+        return kernel
+
+    def step(self, player_id, mask):
+        """
+        Makes a move of player_id and returns a step code.
+
+        mask holds the played Cards, 0 is a pass. The code is negative
+        if the step was invalid (WRONG_PLAYER, INVALID_MOVE), else it is
+        the most important event of the step (PLAYED, PASSED, STACK_WON,
+        PLAYER_FINISHED, GAME_FINISHED). The points of the step are
+        written to reward.
+        """
+        self.reward.fill(0)
+        if player_id != self.turn[ACTIVE]:
+            return WRONG_PLAYER
+        if not mask:
+            return self._pass(player_id)
+        return self._play(player_id, mask)
+
+    def _pass(self, player_id):
+        """ Changes the state when the active Player passes. """
+        turn = self.turn
+        # pass is not possible on an empty stack
+        if self.stack[TYPE] < 0:
+            return INVALID_MOVE
+        turn[PASSES] += 1
+        # if 3 players have passed, stack is finished
+        if turn[PASSES] >= 3:
+            self._win_stack()
+            return STACK_WON
+        turn[ACTIVE] = (player_id+1) % 4
+        return PASSED
+
+    def _win_stack(self):
+        """ Changes the state when the Stack is won by a Player. """
+        turn = self.turn
+        stack = self.stack
+        leading = int(turn[LEADING])
+        if stack[DRAGON]:
+            self._give_dragon_stack(leading)
+        else:
+            self.points[leading] += stack[POINTS]
+            self.reward[leading] = stack[POINTS]
+        stack[:] = EMPTY_STACK
+        # the next Player who has not finished leads
+        leading = self._next_open(leading)
+        turn[LEADING] = leading
+        turn[ACTIVE] = leading
+        turn[PASSES] = 0
+
+    def _give_dragon_stack(self, leading):
+        """ Gives a Stack containing the Dragon to an opponent. """
+        # same heuristic as Game._dragon_stack()
+        opp_0, opp_1 = (1, 3) if leading % 2 == 0 else (0, 2)
+        if self.tichu[opp_0]:
+            receiver = opp_1
+        elif self.tichu[opp_1]:
+            receiver = opp_0
+        elif (popcount(int(self.hands[opp_0])) <
+              popcount(int(self.hands[opp_1]))):
+            receiver = opp_1
+        else:
+            receiver = opp_0
+        self.points[receiver] += self.stack[POINTS]
+        self.reward[receiver] = self.stack[POINTS]
+
+    def _next_open(self, pid):
+        """ Returns the first of pid and its successors with Cards left. """
+        hands = self.hands
+        for offset in range(3):
+            if hands[(pid+offset) % 4]:
+                return (pid+offset) % 4
+        return (pid+3) % 4
+
+    def _play(self, player_id, mask):
+        """ Changes the state when the active Player plays Cards. """
+        turn = self.turn
+        stack = self.stack
+        hand = int(self.hands[player_id])
+        if mask & hand != mask:
+            return INVALID_MOVE
+        size = popcount(mask)
+        comb_type, power = signature_type(mask, size)
+        if comb_type not in COMB_TYPES:
+            return INVALID_MOVE
+        comb_type = COMB_TYPES[comb_type]
+        power = round(power * 10)
+        # same checks as Stack.add()
+        stack_type = stack[TYPE]
+        if stack_type < 0:
+            pass
+        elif stack_type == comb_type and stack[POWER] < power:
+            # for straight and pair_seq, equal lengths are required
+            if ((comb_type == STRAIGHT or comb_type == PAIR_SEQ) and
+                    stack[SIZE] != size):
+                return INVALID_MOVE
+            # Dog can only be played as first card
+            if mask == DOG_MASK:
+                return INVALID_MOVE
+        # Phoenix can be played on solo (except Dragon)
+        elif (stack_type == SOLO and mask == PHOENIX_MASK and
+              stack[POWER] < 150):
+            power = stack[POWER] + 5
+        # bombs can be played any time
+        elif ((comb_type == FOUR_BOMB or comb_type == STRAIGHT_BOMB) and
+              stack[POWER] < power):
+            pass
+        else:
+            return INVALID_MOVE
+        # add cards to stack
+        stack[TYPE] = comb_type
+        stack[SIZE] = size
+        stack[POWER] = power
+        stack[POINTS] += mask_points(mask)
+        if mask & DRAGON_MASK:
+            stack[DRAGON] = 1
+        stack[N_PLAYED] += 1
+        # determine next active player, the Dog passes to the teammate
+        if mask == DOG_MASK:
+            leading = self._next_open((player_id+2) % 4)
+            turn[LEADING] = leading
+            turn[ACTIVE] = leading
+            stack[:] = EMPTY_STACK
+        else:
+            turn[LEADING] = player_id
+            turn[ACTIVE] = (player_id+1) % 4
+        hand ^= mask
+        self.hands[player_id] = hand
+        turn[PASSES] = 0
+        if not hand:
+            return self._finish(player_id)
+        return PLAYED
+
+    def _finish(self, player_id):
+        """ Changes the state when a Player has played all Cards. """
+        turn = self.turn
+        n_finished = int(turn[N_FINISHED]) + 1
+        self.finished[n_finished-1] = player_id
+        turn[N_FINISHED] = n_finished
+        # check if any Tichu call was successfull or not
+        tichu_reward = self._tichu_reward
+        tichu_reward.fill(0)
+        for pid in range(4):
+            if self.tichu[pid]:
+                # Tichu is successfull when Tichu caller finishes first
+                if n_finished == 1 and not self.hands[pid]:
+                    tichu = 100
+                else:
+                    tichu = -100
+                self.points[pid] += tichu
+                self.tichu_points[pid] = tichu
+                tichu_reward[pid] += tichu
+                self.tichu[pid] = 0
+        if n_finished == 2:
+            self._check_double_victory(player_id)
+        elif n_finished == 3:
+            self._settle()
+        self.reward += tichu_reward
+        if turn[OVER]:
+            return GAME_FINISHED
+        return PLAYER_FINISHED
+
+    def _check_double_victory(self, player_id):
+        """ Ends the game if two teammates have finished first. """
+        if (self.finished[0] + self.finished[1]) % 2:
+            return
+        teammate = (player_id+2) % 4
+        points = self.points
+        reward = self.reward
+        team_tichu = (self.tichu_points[player_id] +
+                      self.tichu_points[teammate])
+        for pid in range(4):
+            points[pid] = 0
+            reward[pid] = 0
+        for pid in (player_id, teammate):
+            points[pid] = 100 + self.tichu_points[pid]
+            reward[pid] = 200 + team_tichu
+        self.turn[OVER] = 1
+
+    def _settle(self):
+        """ Ends the game with the last Player giving away Cards. """
+        points = self.points
+        reward = self.reward
+        self.turn[OVER] = 1
+        # if last stack is dragon stack
+        if self.stack[DRAGON]:
+            self._give_dragon_stack(int(self.turn[LEADING]))
+        first = int(self.finished[0])
+        for pid in range(4):
+            if self.hands[pid]:
+                last = pid
+        # opponent team gets hand of last finisher
+        hand_points = mask_points(int(self.hands[last]))
+        opponent = 1 if last % 2 == 0 else 0
+        points[opponent] += hand_points
+        reward[opponent] = hand_points
+        # first finisher gets stack of last finisher
+        reward[first] += points[last]
+        points[first] += points[last]
+        points[last] = 0
+        reward[last] = 0
@@ -0,0 +1,689 @@
+""" This module contains a precomputed table of all Tichu combinations. """
+
+import itertools
+import math
+import os
+import random
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+from env.card import Card, RANK_NAMES, SUITS
+from env.cards import (Cards, COMB_TYPES, COMB_NAMES, PHOENIX_MASK,
+                       DRAGON_MASK, MAJONG_MASK, DOG_MASK, REGULAR_MASK,
+                       popcount)
+
+SPECIAL_MASK = PHOENIX_MASK | DRAGON_MASK | MAJONG_MASK | DOG_MASK
+# One bit per rank (2...A) for each suit
+SUIT_STRIPES = [sum(1 << (4*rank + suit) for rank in range(13))
+                for suit in range(4)]
+
+# Rank-count encoding: the 4 bits of a rank hold a "thermometer" of the
+# number of Cards of this rank (e.g. 0b0011 for a pair), special cards
+# keep their bits. Card sets then contain enough Cards for a combination
+# if the count mask of the combination is a subset of the count mask of
+# the card set.
+_NIBBLE_COUNT = [(1 << popcount(nib)) - 1 for nib in range(16)]
+_BYTE_COUNT = [_NIBBLE_COUNT[byte & 15] | _NIBBLE_COUNT[byte >> 4] << 4
+               for byte in range(256)]
+# All subsets of a 4-bit suit mask with a given number of Cards
+_SUBSETS = [[[sub for sub in range(16) if sub & ~nib == 0 and
+              popcount(sub) == cnt] for cnt in range(5)]
+            for nib in range(16)]
+
+# Rank bitmaps: bit 0 is the Majong, bits 1...13 are the ranks 2...A.
+# Rank-presence (from bit 0) and pair-presence bits (from bit 16) of
+# the two ranks in a byte and the four ranks in 16 bits of a card mask
+_BYTE_RANKS = [bool(byte & 15) | bool(byte >> 4) << 1 |
+               (popcount(byte & 15) > 1) << 16 |
+               (popcount(byte >> 4) > 1) << 17 for byte in range(256)]
+_CHUNK_RANKS = [_BYTE_RANKS[chunk & 255] | _BYTE_RANKS[chunk >> 8] << 2
+                for chunk in range(1 << 16)]
+# Rank-presence bits of each suit (from bits 0, 16, 32 and 48) of the
+# two ranks in a byte and the four ranks in 16 bits of a card mask
+_BYTE_SUITS = [sum(((byte >> (4*rank + suit)) & 1) << (16*suit + rank)
+                   for rank in range(2) for suit in range(4))
+               for byte in range(256)]
+_CHUNK_SUITS = [_BYTE_SUITS[chunk & 255] | _BYTE_SUITS[chunk >> 8] << 2
+                for chunk in range(1 << 16)]
+_NIBBLE_POPCOUNT = [popcount(nib) for nib in range(16)]
+# Vectorized rank-count encoding (see count_masks())
+_NIBBLE_COUNT_ARRAY = np.array(_NIBBLE_COUNT, dtype=np.uint64)
+_RANK_SHIFTS = np.arange(0, 52, 4, dtype=np.uint64)
+# Number of ways to choose k of n Cards of a rank (BINOMIAL[n, k])
+BINOMIAL = np.array([[math.comb(n, k) for k in range(5)] for n in range(5)],
+                    dtype=np.int64)
+# Combination types enumerated by rank windows instead of subset tests
+WINDOW_TYPES = (COMB_TYPES['straight'], COMB_TYPES['straight_bomb'],
+                COMB_TYPES['pair_seq'])
+
+# Size of the combination cache shared by all Cards instances
+COMBINATION_CACHE_SIZE = 4096
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+_MOVE_TABLE = None
+_COMBINATION_CACHE = None
+
+
+def count_mask(mask):
+    """ Converts a 56-bit card mask into a rank-count mask. """
+    cmask = mask & SPECIAL_MASK
+    for shift in range(0, 48, 8):
+        cmask |= _BYTE_COUNT[(mask >> shift) & 255] << shift
+    cmask |= _NIBBLE_COUNT[(mask >> 48) & 15] << 48
+    return cmask
+
+
+def count_masks(masks):
+    """ Converts an array of card masks into rank-count masks (uint64). """
+    masks = np.asarray(masks).astype(np.uint64)
+    nibbles = (masks[..., None] >> _RANK_SHIFTS) & np.uint64(15)
+    counts = _NIBBLE_COUNT_ARRAY[nibbles.astype(np.intp)] << _RANK_SHIFTS
+    return (np.bitwise_or.reduce(counts, axis=-1) |
+            (masks & np.uint64(SPECIAL_MASK)))
+
+
+def rank_bitmaps(mask):
+    """ Returns the rank-presence and pair-presence bitmaps of a mask. """
+    regular = mask & REGULAR_MASK
+    ranks = (_CHUNK_RANKS[regular & 0xFFFF] |
+             _CHUNK_RANKS[(regular >> 16) & 0xFFFF] << 4 |
+             _CHUNK_RANKS[(regular >> 32) & 0xFFFF] << 8 |
+             _CHUNK_RANKS[regular >> 48] << 12)
+    presence = (ranks & 0x1FFF) << 1 | (mask & MAJONG_MASK) >> 54
+    return presence, (ranks >> 16) << 1
+
+
+def suit_bitmaps(mask):
+    """ Returns the rank-presence bitmap of each suit of a card mask. """
+    suits = (_CHUNK_SUITS[mask & 0xFFFF] |
+             _CHUNK_SUITS[(mask >> 16) & 0xFFFF] << 4 |
+             _CHUNK_SUITS[(mask >> 32) & 0xFFFF] << 8 |
+             _CHUNK_SUITS[(mask >> 48) & 0xF] << 12)
+    return [((suits >> shift) & 0x1FFF) << 1 for shift in (0, 16, 32, 48)]
+
+
+def get_move_table(cache_file=None):
+    """
+    Returns the global MoveTable.
+
+    The table is built on first use. If cache_file is given, the table
+    is loaded from this file or saved to it after building.
+    """
+    global _MOVE_TABLE
+    if _MOVE_TABLE is None:
+        if cache_file is not None and os.path.isfile(cache_file):
+            _MOVE_TABLE = MoveTable.load(cache_file)
+        else:
+            _MOVE_TABLE = MoveTable()
+            if cache_file is not None:
+                _MOVE_TABLE.save(cache_file)
+    return _MOVE_TABLE
+
+
+def get_combination_cache():
+    """ Returns the global CombinationCache. """
+    global _COMBINATION_CACHE
+    if _COMBINATION_CACHE is None:
+        _COMBINATION_CACHE = CombinationCache(COMBINATION_CACHE_SIZE)
+    return _COMBINATION_CACHE
+
+
+class CombinationCache():
+    """
+    A least recently used (LRU) cache of available combinations.
+
+    Maps the mask of a card set to its available combinations. The
+    combinations are stored as a tuple with one tuple of Cards per
+    type and are shared by all callers, so each combination holds its
+    Cards as a tuple (remove() and remove_all() raise a TypeError,
+    + and - return new instances).
+
+    Attributes
+    ----------
+    maxsize: int
+      The maximum number of card sets in the cache.
+    hits: int
+      The number of lookups that were found in the cache.
+    misses: int
+      The number of lookups that had to be enumerated.
+
+    Methods
+    -------
+    get(mask):
+      Returns the available combinations of a card mask.
+    info():
+      Returns hits, misses, maxsize and current size of the cache.
+    resize(maxsize):
+      Changes the maximum size and evicts entries if necessary.
+    clear():
+      Removes all entries and resets the counters.
+    """
+
+    def __init__(self, maxsize):
+        """
+        Constructs an empty cache.
+
+        Parameter
+        ---------
+        maxsize: int
+          The maximum number of card sets in the cache.
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, mask):
+        """ Returns the available combinations of a card mask. """
+        try:
+            combs = self._entries[mask]
+        except KeyError:
+            self.misses += 1
+            combs = tuple(tuple(type_combs) for type_combs
+                          in get_move_table().combinations(mask))
+            for type_combs in combs:
+                for crds in type_combs:
+                    crds.cards = tuple(crds.cards)
+            self._entries[mask] = combs
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+            return combs
+        self.hits += 1
+        self._entries.move_to_end(mask)
+        return combs
+
+    def info(self):
+        """ Returns hits, misses, maxsize and current size of the cache. """
+        return CacheInfo(self.hits, self.misses, self.maxsize,
+                         len(self._entries))
+
+    def resize(self, maxsize):
+        """ Changes the maximum size and evicts entries if necessary. """
+        self.maxsize = maxsize
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """ Removes all entries and resets the counters. """
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+class MoveTable():
+    """
+    A table of every legal Tichu combination.
+
+    Combinations are stored suit-independent as rank-count masks, so
+    that legal moves of a hand can be found with a single vectorized
+    subset test. When selecting single types, straights and pair
+    sequences are instead looked up in window tables indexed by the
+    rank-presence and pair-presence bitmaps of the hand (see
+    rank_bitmaps()), straight bombs by the rank-presence bitmap of each
+    suit. Only the matching entries are then expanded into the actual
+    Cards of the hand.
+    The entries are sorted by type, power and size.
+
+    Attributes
+    ----------
+    need: np.ndarray of uint64
+      The rank-count mask of each combination (see count_mask()).
+    types: np.ndarray of int8
+      The type of each combination (see COMB_TYPES).
+    sizes: np.ndarray of int8
+      The number of Cards of each combination.
+    powers: np.ndarray of float64
+      The power of each combination.
+    size: int
+      The number of entries in the table.
+
+    Methods
+    -------
+    load(filename):
+      Loads a MoveTable from a file created by save().
+    save(filename):
+      Saves the table arrays to a .npz file.
+    match(mask):
+      Returns the indices of all entries available in a card mask.
+    expand(idx, mask):
+      Returns the card masks of entry idx available in a card mask.
+    combinations(mask):
+      Returns all available combinations of a card mask by type.
+    select(mask, comb_types, min_power, size):
+      Returns the indices of the entries available in a card mask that
+      match the given types, power and size.
+    find(mask, comb_types, min_power, size):
+      Returns the available combinations of a card mask that match
+      the given types, power and size.
+    cards(idx, mask):
+      Returns the combinations of entry idx in a card mask as Cards.
+    count(mask):
+      Returns the number of available combinations of each entry.
+    sample(mask, type_weights):
+      Draws one available combination of a card mask at random.
+    draw(idx, mask):
+      Draws one combination of entry idx in a card mask at random.
+    """
+
+    def __init__(self, arrays=None):
+        """
+        Constructs the MoveTable.
+
+        Parameter
+        ---------
+        arrays: tuple of np.ndarray
+          Table arrays (need, types, sizes, powers) to use instead of
+          building the table from scratch (optional).
+        """
+        if arrays is None:
+            arrays = self._build()
+        self.need, self.types, self.sizes, self.powers = arrays
+        self.size = len(self.need)
+        self._set_layout()
+        # entries are sorted by type, so each type is a slice of the table
+        self.type_slices = [
+            slice(*np.searchsorted(self.types, [code, code+1]))
+            for code in range(len(COMB_NAMES))]
+        self.entry_index = {(need, comb_type): idx for idx, (need, comb_type)
+                            in enumerate(zip(self.need.tolist(),
+                                             self.types.tolist()))}
+        self._set_windows()
+        self._set_counting()
+
+    @classmethod
+    def load(cls, filename):
+        """ Loads a MoveTable from a file created by save(). """
+        with np.load(filename) as data:
+            arrays = (data['need'], data['types'],
+                      data['sizes'], data['powers'])
+        return cls(arrays)
+
+    def save(self, filename):
+        """ Saves the table arrays to a .npz file. """
+        with open(filename, 'wb') as npz_file:
+            np.savez(npz_file, need=self.need, types=self.types,
+                     sizes=self.sizes, powers=self.powers)
+
+    def match(self, mask):
+        """ Returns the indices of all entries available in a card mask. """
+        missing = self.need & np.uint64(~count_mask(mask) & (2**64-1))
+        return np.flatnonzero(missing == 0)
+
+    def expand(self, idx, mask):
+        """ Returns the card masks of entry idx available in a card mask. """
+        ranks, specials = self._layout[idx]
+        comb_type = self.types[idx]
+        # straight bombs consist of one suit only
+        if comb_type == COMB_TYPES['straight_bomb']:
+            window = sum(15 << shift for shift, _ in ranks)
+            return [window & stripe for stripe in SUIT_STRIPES
+                    if mask & window & stripe == window & stripe]
+        choices = [[sub << shift
+                    for sub in _SUBSETS[(mask >> shift) & 15][cnt]]
+                   for shift, cnt in ranks]
+        comb_masks = [specials | sum(subs)
+                      for subs in itertools.product(*choices)]
+        # straights with all Cards of one suit are straight bombs
+        if comb_type == COMB_TYPES['straight'] and not specials:
+            comb_masks = [comb for comb in comb_masks
+                          if all(comb & ~stripe for stripe in SUIT_STRIPES)]
+        return comb_masks
+
+    def combinations(self, mask):
+        """
+        Returns all available combinations of a card mask.
+
+        The result is a list with one list of Cards per combination
+        type (in the order of COMB_TYPES), sorted by ascending power.
+        """
+        combs = [list() for _ in COMB_NAMES]
+        for idx in self.match(mask):
+            combs[self.types[idx]].extend(self.cards(idx, mask))
+        return combs
+
+    def select(self, mask, comb_types, min_power=None, size=None):
+        """
+        Returns the indices of the entries available in a card mask.
+
+        Only entries of comb_types (list of type codes) with a power
+        higher than min_power and the given size (if not None) are
+        tested. The result is sorted by type and ascending power.
+        """
+        not_available = None
+        bitmaps = None
+        selected = list()
+        for code in comb_types:
+            if code in WINDOW_TYPES:
+                if bitmaps is None:
+                    bitmaps = rank_bitmaps(mask)
+                selected.extend(
+                    idx for idx in self._window_entries(code, mask, bitmaps)
+                    if (min_power is None or self._powers[idx] > min_power)
+                    and (size is None or self._sizes[idx] == size))
+                continue
+            if not_available is None:
+                not_available = np.uint64(~count_mask(mask) & (2**64-1))
+            entries = self.type_slices[code]
+            select = (self.need[entries] & not_available) == 0
+            if min_power is not None:
+                select &= self.powers[entries] > min_power
+            if size is not None:
+                select &= self.sizes[entries] == size
+            selected.extend((np.flatnonzero(select) + entries.start).tolist())
+        return selected
+
+    def find(self, mask, comb_types, min_power=None, size=None):
+        """
+        Returns the available combinations of a card mask as a list.
+
+        See select() for the arguments. The result is sorted by type
+        and ascending power.
+        """
+        return [crds for idx in self.select(mask, comb_types, min_power, size)
+                for crds in self.cards(idx, mask)]
+
+    def cards(self, idx, mask):
+        """ Returns the combinations of entry idx in a mask as Cards. """
+        comb_name = COMB_NAMES[self.types[idx]]
+        power = float(self.powers[idx])
+        return [Cards.from_mask(comb_mask, comb_name, power)
+                for comb_mask in self.expand(idx, mask)]
+
+    def _set_layout(self):
+        """ Decodes the rank counts of each entry for expand(). """
+        self._layout = list()
+        for need in self.need.tolist():
+            ranks = tuple((shift, popcount((need >> shift) & 15))
+                          for shift in range(0, 52, 4)
+                          if (need >> shift) & 15)
+            self._layout.append((ranks, need & SPECIAL_MASK))
+
+    def count(self, mask):
+        """
+        Returns the number of available combinations of each entry.
+
+        The counts are computed from the number of Cards per rank of
+        the mask, without expanding any entry.
+        """
+        hand = np.array([_NIBBLE_POPCOUNT[(mask >> shift) & 15]
+                         for shift in range(0, 52, 4)])
+        # product of the ways to choose the Cards of each rank
+        counts = np.multiply.reduceat(BINOMIAL[hand].ravel()[self._count_index],
+                                      self._count_starts)
+        counts[(self._specials & ~(mask & SPECIAL_MASK)) != 0] = 0
+        # straights of a single suit are straight bombs
+        straights, bombs = self._flush_entries
+        counts[bombs] = 0
+        suits = [bitmap for bitmap in suit_bitmaps(mask)
+                 if popcount(bitmap) >= 5]
+        if suits:
+            flush = sum((self._flush_presence & ~bitmap) == 0
+                        for bitmap in suits)
+            counts[straights] -= flush[:len(straights)]
+            counts[bombs] = flush[len(straights):]
+        return counts
+
+    def sample(self, mask, type_weights=None):
+        """
+        Draws one available combination of a card mask at random.
+
+        Without type_weights, every combination is equally likely (as
+        a random choice from all available combinations). Otherwise,
+        type_weights maps type names to weights: an available type is
+        drawn by its weight and a combination of this type uniformly.
+        Returns None if no combination is available.
+        """
+        weights = self.count(mask).astype(np.float64)
+        if type_weights is not None:
+            for code, entries in enumerate(self.type_slices):
+                total = weights[entries].sum()
+                if total > 0:
+                    weights[entries] *= (type_weights.get(COMB_NAMES[code], 0)
+                                         / total)
+        cumulative = np.cumsum(weights)
+        if cumulative[-1] <= 0:
+            return None
+        idx = int(np.searchsorted(cumulative, random.random()*cumulative[-1],
+                                  side='right'))
+        comb_name = COMB_NAMES[self.types[idx]]
+        return Cards.from_mask(self._sample_expansion(idx, mask), comb_name,
+                               float(self.powers[idx]))
+
+    def draw(self, idx, mask):
+        """
+        Returns a uniformly drawn card mask of entry idx in a mask.
+
+        Returns None if the entry is not available in the mask, which
+        includes straights whose Cards only form straight bombs.
+        """
+        if int(self.need[idx]) & ~count_mask(mask):
+            return None
+        ranks, specials = self._layout[idx]
+        comb_type = self.types[idx]
+        if comb_type == COMB_TYPES['straight_bomb']:
+            comb_masks = self.expand(idx, mask)
+            return random.choice(comb_masks) if comb_masks else None
+        if comb_type == COMB_TYPES['straight'] and not specials:
+            # with one Card per rank, all Cards may be of one suit
+            window = mask & sum(15 << shift for shift, _ in ranks)
+            if popcount(window) == len(ranks) and any(
+                    window & ~stripe == 0 for stripe in SUIT_STRIPES):
+                return None
+        return self._sample_expansion(idx, mask)
+
+    def _sample_expansion(self, idx, mask):
+        """ Returns a uniformly drawn card mask of entry idx in a mask. """
+        ranks, specials = self._layout[idx]
+        comb_type = self.types[idx]
+        if comb_type == COMB_TYPES['straight_bomb']:
+            return random.choice(self.expand(idx, mask))
+        while True:
+            comb_mask = specials
+            for shift, cnt in ranks:
+                comb_mask |= random.choice(
+                    _SUBSETS[(mask >> shift) & 15][cnt]) << shift
+            # straights of a single suit are drawn again
+            if (comb_type != COMB_TYPES['straight'] or specials or
+                    all(comb_mask & ~stripe for stripe in SUIT_STRIPES)):
+                return comb_mask
+
+    def _set_counting(self):
+        """
+        Decodes the number of Cards per rank of each entry for count().
+
+        The (rank, count) pairs of all entries are stored as one flat
+        array, entry idx starts at _count_starts[idx]. Entries without
+        regular Cards choose 0 Cards of the first rank.
+        """
+        ranks = [layout[0] or ((0, 0),) for layout in self._layout]
+        self._count_starts = np.cumsum([0] + [len(r) for r in ranks[:-1]])
+        # index into the (rank, count) binomials of a hand
+        self._count_index = np.array([5*(shift // 4) + cnt for r in ranks
+                                      for shift, cnt in r], dtype=np.int64)
+        self._specials = (self.need & np.uint64(SPECIAL_MASK)).astype(np.int64)
+        # straights without special cards and straight bombs depend on
+        # the windows of a single suit in the hand
+        straights = self.type_slices[COMB_TYPES['straight']]
+        bombs = self.type_slices[COMB_TYPES['straight_bomb']]
+        self._flush_entries = (
+            np.flatnonzero(self._specials[straights] == 0) + straights.start,
+            np.arange(bombs.start, bombs.stop))
+        self._flush_presence = self._presence[
+            np.concatenate(self._flush_entries)]
+
+    def _set_windows(self):
+        """
+        Builds the window tables of straights and pair sequences.
+
+        For every rank bitmap, the tables hold the entries whose ranks
+        are all present (straights) or all hold a pair (pair sequences).
+        With a Phoenix, one rank of a straight window is missing and
+        one rank of a pair sequence window holds a single Card only.
+        """
+        need = self.need.tolist()
+        bitmaps = [rank_bitmaps(entry) for entry in need]
+        self._singles = [presence & ~pairs for presence, pairs in bitmaps]
+        self._presence = np.array([presence for presence, _ in bitmaps],
+                                  dtype=np.int64)
+        self._powers = self.powers.tolist()
+        self._sizes = self.sizes.tolist()
+        self._windows = dict()
+        for code in WINDOW_TYPES:
+            by_phoenix = (list(), list())
+            for idx in range(self.type_slices[code].start,
+                             self.type_slices[code].stop):
+                presence, pairs = bitmaps[idx]
+                required = pairs if code == COMB_TYPES['pair_seq'] else presence
+                by_phoenix[bool(need[idx] & PHOENIX_MASK)].append(
+                    (required, idx))
+            self._windows[code] = tuple(self._bitmap_index(entries)
+                                        for entries in by_phoenix)
+
+    @staticmethod
+    def _bitmap_index(entries):
+        """
+        Returns the entries of every 14-bit rank bitmap.
+
+        entries is a list of (required, idx). The result is a tuple
+        (offsets, indices) of lists, indices[offsets[b]:offsets[b+1]]
+        are all idx (ascending) whose required bits are contained in b.
+        """
+        required = np.array([req for req, _ in entries], dtype=np.int64)
+        bitmaps = np.arange(1 << 14, dtype=np.int64)[:, None]
+        rows, cols = np.nonzero((required[None, :] & ~bitmaps) == 0)
+        offsets = np.zeros((1 << 14) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=1 << 14), out=offsets[1:])
+        indices = np.array([idx for _, idx in entries], dtype=np.int64)
+        return offsets.tolist(), indices[cols].tolist()
+
+    def _window_entries(self, code, mask, bitmaps):
+        """
+        Returns the entries of a window type available in a card mask.
+
+        bitmaps are the rank bitmaps of mask (see rank_bitmaps()).
+        The result is sorted by power.
+        """
+        presence, pairs = bitmaps
+        plain, phoenix = self._windows[code]
+        if code == COMB_TYPES['straight']:
+            if mask & PHOENIX_MASK:
+                return sorted(self._lookup(plain, presence) +
+                              self._lookup(phoenix, presence))
+            return self._lookup(plain, presence)
+        if code == COMB_TYPES['straight_bomb']:
+            # a straight bomb is a straight of a single suit
+            offsets, _ = self._windows[COMB_TYPES['straight']][0]
+            if offsets[presence] == offsets[presence+1]:
+                return []
+            return sorted({idx for bitmap in suit_bitmaps(mask)
+                           for idx in self._lookup(plain, bitmap)})
+        if mask & PHOENIX_MASK:
+            # the single Card of a Phoenix window must be present
+            return sorted(self._lookup(plain, pairs) +
+                          [idx for idx in self._lookup(phoenix, pairs)
+                           if not self._singles[idx] & ~presence])
+        return self._lookup(plain, pairs)
+
+    @staticmethod
+    def _lookup(window_index, bitmap):
+        """ Returns the entries of a window table for a rank bitmap. """
+        offsets, indices = window_index
+        return indices[offsets[bitmap]:offsets[bitmap+1]]
+
+    def _build(self):
+        """
+        Builds the table arrays from the game rules.
+
+        Each candidate is classified by the type checks of Cards with
+        representative Cards, so that the table agrees with Cards.
+        """
+        entries = dict()
+        for comb_name, ranks, specials in self._candidates():
+            card_list = self._representative(ranks, specials,
+                                             comb_name == 'straight_bomb')
+            crds = Cards(card_list)
+            if crds.type != comb_name:
+                continue
+            need = specials
+            for rank, cnt in ranks:
+                need |= self._rank_need(rank, cnt)
+            entries[(need, COMB_TYPES[comb_name])] = (crds.size, crds.power)
+        order = sorted(entries, key=lambda key: (key[1], entries[key][1],
+                                                 entries[key][0], key[0]))
+        need = np.array([key[0] for key in order], dtype=np.uint64)
+        types = np.array([key[1] for key in order], dtype=np.int8)
+        sizes = np.array([entries[key][0] for key in order], dtype=np.int8)
+        powers = np.array([entries[key][1] for key in order],
+                          dtype=np.float64)
+        return need, types, sizes, powers
+
+    @staticmethod
+    def _candidates():
+        """
+        Yields all combination candidates as (type, ranks, specials).
+
+        ranks is a list of (rank, count) with rank 1 being the Majong
+        and ranks 2...14 the regular Cards (2...A).
+        """
+        regular = range(2, 15)
+        for special in (PHOENIX_MASK, DRAGON_MASK, MAJONG_MASK, DOG_MASK):
+            yield 'solo', [], special
+        for rank in regular:
+            yield 'solo', [(rank, 1)], 0
+            yield 'pair', [(rank, 2)], 0
+            yield 'pair', [(rank, 1)], PHOENIX_MASK
+            yield 'triple', [(rank, 3)], 0
+            yield 'triple', [(rank, 2)], PHOENIX_MASK
+            yield 'four_bomb', [(rank, 4)], 0
+        for triple, pair in itertools.permutations(regular, 2):
+            yield 'full', [(triple, 3), (pair, 2)], 0
+            yield 'full', [(triple, 2), (pair, 2)], PHOENIX_MASK
+            yield 'full', [(triple, 3), (pair, 1)], PHOENIX_MASK
+        for low in range(1, 15):
+            for high in range(low+4, 15):
+                window = list(range(low, high+1))
+                yield 'straight', [(rank, 1) for rank in window], 0
+                if low > 1:
+                    yield ('straight_bomb',
+                           [(rank, 1) for rank in window], 0)
+                # Phoenix replaces any Card of the straight
+                for gap in window:
+                    yield ('straight', [(rank, 1) for rank in window
+                                        if rank != gap], PHOENIX_MASK)
+        for low in range(2, 15):
+            for high in range(low+1, min(low+7, 15)):
+                window = list(range(low, high+1))
+                yield 'pair_seq', [(rank, 2) for rank in window], 0
+                # Phoenix replaces one Card of any pair
+                for single in window:
+                    yield ('pair_seq', [(rank, 1 if rank == single else 2)
+                                        for rank in window], PHOENIX_MASK)
+
+    @staticmethod
+    def _rank_need(rank, cnt):
+        """ Returns the rank-count mask of cnt Cards of a rank. """
+        if rank == 1:
+            return MAJONG_MASK
+        return ((1 << cnt) - 1) << 4*(rank-2)
+
+    @staticmethod
+    def _representative(ranks, specials, same_suit):
+        """ Returns a list of Card objects for a combination candidate. """
+        suits = list(SUITS)
+        card_list = [Card(name=name, suit='Special')
+                     for name, special in (('Phoenix', PHOENIX_MASK),
+                                           ('Dragon', DRAGON_MASK),
+                                           ('Majong', MAJONG_MASK),
+                                           ('Dog', DOG_MASK))
+                     if specials & special]
+        for pos, (rank, cnt) in enumerate(ranks):
+            if rank == 1:
+                card_list.append(Card(name='Majong', suit='Special'))
+                continue
+            for i in range(cnt):
+                # alternate suits so that only bombs are of one suit
+                suit = suits[0] if same_suit else suits[(pos+i) % 4]
+                card_list.append(Card(name=RANK_NAMES[rank-2], suit=suit))
+        return card_list
@@ -1,8 +1,54 @@
 """ This module contains a class to represent a Tichu Player. """
 
-import random
+from env.cards import (COMB_TYPES, DOG_MASK, DRAGON_MASK, PHOENIX_MASK,
+                       popcount)
+from env.move_table import get_move_table
+
+# Kings and Aces of all suits
+KINGS_MASK = 0xF << 44
+ACES_MASK = 0xF << 48
+
+def rate_hand(mask):
+    """
+    Returns a rating of a hand (card mask) based on a heuristic.
+
+    The hand rating is based on the individual cards
+    and available combinations of the hand.
+    A high rating can be achieved if the Player has
+    a lot of high cards (Kings, Aces and Dragon or Phoenix)
+    and a lot of good combinations (bomb, straight, triple, full).
+    The combinations are counted by the move table (see
+    MoveTable.count()), no Cards are created.
+    """
+    table = get_move_table()
+    score = 0
+    # update score based on individual cards
+    score += 20 * popcount(mask & (ACES_MASK | DRAGON_MASK))
+    score += 10 * popcount(mask & (KINGS_MASK | PHOENIX_MASK))
+    if mask & DOG_MASK:
+        score -= 40
+    # update score based on combinations, other combinations are
+    # counted without the Cards of four bombs
+    for shift in range(0, 52, 4):
+        if (mask >> shift) & 15 == 15:
+            score += 40
+            mask &= ~(15 << shift)
+    counts = table.count(mask)
+    straight_bombs = table.type_slices[COMB_TYPES['straight_bomb']]
+    score += 40 * int(counts[straight_bombs].sum())
+    # mean power of all fulls and triples
+    for comb_type in ('full', 'triple'):
+        entries = table.type_slices[COMB_TYPES[comb_type]]
+        n_combs = counts[entries].sum()
+        if n_combs:
+            score += float(counts[entries] @ table.powers[entries]) / n_combs
+    # size of the longest straight
+    straights = table.type_slices[COMB_TYPES['straight']]
+    available = counts[straights] > 0
+    if available.any():
+        score += int(table.sizes[straights][available].max())
+    return score
 
-from env.cards import Cards
 
 class Player():
     """
@@ -24,10 +70,13 @@ class Player():
       Whether this Player has finished (i.e. no more hand Cards).
     hand_rating: float
       A rating of how good the hand is.
+    combinations: list of tuple of Cards
+      All available combinations of the hand, one tuple per type.
+      The index is updated by delta when Cards are removed.
 
     Methods
     -------
-    assign_hand(cards):
+    assign_hand(cards, hand_rating):
       Adds a Cards instance to the Players' hand.
     remove_cards(cards):
       Removes Cards from Players hand.
@@ -38,7 +87,7 @@ class Player():
       Sets Players points and overrides the points achieved so far.
     move(cards):
       Checks whether hand contains cards (i.e. if move is possible).
-    random_move():
+    random_move(type_weights):
       Makes a random choice from all available combinations of hand.
     call_tichu():
       Sets tichu_flag if Player did not play any hand cards yet.
@@ -57,19 +106,27 @@ class Player():
         self.finished = False
         self.hand = None
         self.hand_rating = 0
+        self.combinations = None
 
-    def assign_hand(self, cards):
-        """ Assigns a Cards instance to the Players' hand. """
+    def assign_hand(self, cards, hand_rating=None):
+        """
+        Assigns a Cards instance to the Players' hand.
+
+        The hand is rated, unless a known hand_rating is given.
+        """
         self.hand = cards
+        self.combinations = list(cards.get_available_combinations())
         self._update()
-        self._set_hand_rating()
+        if hand_rating is None:
+            self._set_hand_rating()
+        else:
+            self.hand_rating = hand_rating
         return True
 
     def remove_cards(self, cards):
         """ Removes all Card instances in Cards from Players' hand. """
-        if self.hand.contains(cards):
-            for crd in cards.cards:
-                self.hand.remove(crd)
+        if self.hand.remove_all(cards):
+            self._update_combinations(cards.mask)
             self._update()
             return True
         else:
@@ -87,11 +144,19 @@ class Player():
         """ Returns true if Cards is a valid move. """
         return bool(self.hand.contains(cards))
 
-    def random_move(self):
-        """ Randomly play one available combination. """
-        available_comb = self.hand.get_available_combinations()
-        flattened = [item for sublist in available_comb for item in sublist]
-        random_comb = random.choice(flattened)
+    def random_move(self, type_weights=None):
+        """
+        Randomly play one available combination.
+
+        All combinations are equally likely, unless type_weights (type
+        name to weight) is given: then the type is drawn by weight and
+        the combination uniformly within its type.
+        The combination is drawn without enumerating all combinations
+        (see MoveTable.sample()).
+        """
+        random_comb = get_move_table().sample(self.hand.mask, type_weights)
+        if random_comb is None:
+            return False
         suc = self.move(random_comb)
         if suc: # double-check, move should always return True
             return random_comb
@@ -117,65 +182,18 @@ class Player():
         if self.hand_size == 0:
             self.finished = True
 
-    def _set_hand_rating(self):
+    def _update_combinations(self, removed_mask):
         """
-        Set hand rating of Players' hand based on a heuristic.
+        Drops all combinations containing removed Cards from the index.
 
-        The hand rating is based on the individual cards
-        and available combinations of the Players' hand.
-        A high rating can be achieved if the Player has
-        a lot of high cards (Kings, Aces and Dragon or Phoenix)
-        and a lot of good combinations (bomb, straight, triple, full).
+        A combination only depends on its own Cards, so the remaining
+        combinations are exactly the combinations of the new hand and
+        nothing needs to be enumerated again.
         """
-        good_cards = ['A', 'K', 'Dragon', 'Phoenix']
-        bad_cards = {'Dog'}
-        comb_types = {'solo': 0,
-                      'pair': 1,
-                      'triple': 2,
-                      'four_bomb': 3,
-                      'full': 4,
-                      'straight': 5,
-                      'straight_bomb': 6,
-                      'pair_seq': 7}
-        # initialize cards and score
-        card_list = self.hand.cards
-        cards = Cards(card_list)
-        score = 0
-        # update score based on individual cards
-        good_cards_list = [elem for elem in cards.cards
-                            if elem.name in good_cards]
-        for crd in good_cards_list:
-            if crd.name == 'Dragon' or crd.name == 'A':
-                score += 20
-            else:
-                score += 10
-        bad_cards_list = [elem for elem in cards.cards
-                            if elem.name in bad_cards]
-        if bad_cards_list:
-            score -= 40
-        # update score based on combinations
-        avail_combs = cards.get_available_combinations()
-        if avail_combs[comb_types['four_bomb']]:
-            for crds in avail_combs[comb_types['four_bomb']]:
-                score += 40
-                for crd in crds.cards:
-                    cards.remove(crd)
-                avail_combs = cards.get_available_combinations()
-        if avail_combs[comb_types['straight_bomb']]:
-            for crds in avail_combs[comb_types['straight_bomb']]:
-                score += 40
-        if avail_combs[comb_types['full']]:
-            max_fulls =  sum([full.power for full
-                              in avail_combs[comb_types['full']]]
-                             )/len(avail_combs[comb_types['full']])
-            score += max_fulls
-        if avail_combs[comb_types['triple']]:
-            max_triple = sum([triple.power
-                            for triple in avail_combs[comb_types['triple']]]
-                            )/len(avail_combs[comb_types['triple']])
-            score += max_triple
-        if avail_combs[comb_types['straight']]:
-            max_len = max([strt.size
-                           for strt in avail_combs[comb_types['straight']]])
-            score += max_len
-        self.hand_rating = score
+        self.combinations = [
+            tuple(crds for crds in type_combs if not crds.mask & removed_mask)
+            for type_combs in self.combinations]
+
+    def _set_hand_rating(self):
+        """ Set hand rating of Players' hand (see rate_hand()). """
+        self.hand_rating = rate_hand(self.hand.mask)
@@ -1,5 +1,8 @@
 """ This module contains a class to represent a Tichu Stack. """
 
+from env.cards import COMB_TYPES, PHOENIX_MASK, DRAGON_MASK, DOG_MASK
+from env.move_table import get_move_table
+
 BOMBS = ['four_bomb', 'straight_bomb']
 
 class Stack():
@@ -24,8 +27,18 @@ class Stack():
     -------
     add(cards):
       Adds Cards to the stack if the move is valid.
+    assert_valid_move(cards):
+      Checks whether Cards can be added to the stack.
+    validate(cards):
+      Returns the power of the stack after adding Cards, None if invalid.
+    push(cards, power):
+      Puts validated Cards on top of the stack.
     check_valid_move(old_cards, new_cards):
       Checks whether new_cards can be played on top of old_cards.
+    legal_responses(hand):
+      Returns all combinations of hand that can be added to the Stack.
+    legal_entries(hand):
+      Returns the move table indices of the legal combinations of hand.
     """
 
     def __init__(self):
@@ -65,89 +78,138 @@ class Stack():
 
     def add(self, cards_to_add):
         """ Adds cards to stack according to game rules. """
-        suc = bool()
-        # all but hand and pass can be played on empty stack
-        if (not(self.cards) and
-              cards_to_add.type != 'hand' and
-              cards_to_add.type != 'pass'):
-            self.cards.append(cards_to_add)
-            self._update()
-            suc = True
-        # if stack not empty, cards_to_add must be same type and higher power
-        elif (self.type == cards_to_add.type and
-              self.power < cards_to_add.power):
-            # for straight and pair_seq, equal lengths are required
-            if (self.type == 'straight' and
-                  not self.cards[-1].size == cards_to_add.size):
-                suc = False
-            elif (self.type == 'pair_seq' and
-                  not self.cards[-1].size == cards_to_add.size):
-                suc = False
-            # Dog can only be played as first card
-            elif cards_to_add.cards[0].name == 'Dog':
-                suc = False
-            # append and update stack if successful move
-            else:
-                self.cards.append(cards_to_add)
-                self._update()
-                suc = True
-        # special moves: Phoenix can be played on solo (except Dragon)
-        elif (self.type == 'solo' and
-              cards_to_add.type == 'solo' and
-              cards_to_add.phoenix_flag and
-              self.power < 15):
-            old_power = self.power
-            self.cards.append(cards_to_add)
-            self._update()
-            self.power = old_power + 0.5
-            suc = True
-        # bombs can be played any time
-        elif cards_to_add.type in BOMBS and self.power < cards_to_add.power:
-            self.cards.append(cards_to_add)
-            self._update()
-            suc = True
-        # illegal move
-        else:
-            suc = False
-        return suc
+        power = self.validate(cards_to_add)
+        if power is None:
+            return False
+        self.push(cards_to_add, power)
+        return True
 
     def assert_valid_move(self, cards_to_add):
         """ Checks whether cards_to_add can be added to current stack. """
-        suc = bool()
+        return self.validate(cards_to_add) is not None
+
+    def validate(self, cards_to_add):
+        """
+        Checks whether cards_to_add can be added to current stack.
+
+        Returns the power of the Stack after adding the Cards, or None
+        if the move is not valid.
+        """
         # all but hand and pass can be played on empty stack
-        if (not(self.cards) and
-              cards_to_add.type != 'hand' and
-              cards_to_add.type != 'pass'):
-            suc = True
+        if not self.cards:
+            if cards_to_add.type == 'hand' or cards_to_add.type == 'pass':
+                return None
+            return cards_to_add.power
         # if stack not empty, cards_to_add must be same type and higher power
-        elif (self.type == cards_to_add.type and
+        if (self.type == cards_to_add.type and
               self.power < cards_to_add.power):
             # for straight and pair_seq, equal lengths are required
-            if (self.type == 'straight' and
-                  not self.cards[-1].size == cards_to_add.size):
-                suc = False
-            elif (self.type == 'pair_seq' and
+            if ((self.type == 'straight' or self.type == 'pair_seq') and
                   not self.cards[-1].size == cards_to_add.size):
-                suc = False
+                return None
             # Dog can only be played as first card
-            elif cards_to_add.cards[0].name == 'Dog':
-                suc = False
-            # append and update stack if successful move
-            else:
-                suc = True
+            if cards_to_add.mask == DOG_MASK:
+                return None
+            return cards_to_add.power
         # special moves: Phoenix can be played on solo (except Dragon)
-        elif (self.type == 'solo' and
-              cards_to_add.type == 'solo' and
-              cards_to_add.phoenix_flag and
+        if (self.type == 'solo' and
+              cards_to_add.mask == PHOENIX_MASK and
               self.power < 15):
-            suc = True
+            return self.power + 0.5
         # bombs can be played any time
-        elif cards_to_add.type in BOMBS and self.power < cards_to_add.power:
-            suc = True
+        if cards_to_add.type in BOMBS and self.power < cards_to_add.power:
+            return cards_to_add.power
         # illegal move
+        return None
+
+    def push(self, cards_to_add, power):
+        """
+        Puts validated Cards on top of the stack with the given power.
+
+        The points and dragon flag are updated from the new Cards only.
+        """
+        self.cards.append(cards_to_add)
+        self.points += cards_to_add.points
+        self.power = power
+        self.type = cards_to_add.type
+        if cards_to_add.mask & DRAGON_MASK:
+            self.dragon_flag = True
+
+    def legal_responses(self, hand, combinations=None):
+        """
+        Returns all combinations of hand that assert_valid_move accepts.
+
+        If the available combinations of hand are already known (one
+        sequence of Cards per type), they are filtered instead of being
+        looked up in the move table.
+        The result is sorted by ascending power. Passing is not included.
+        """
+        if combinations is not None:
+            combs = self._filter_responses(combinations)
         else:
-            suc = False
-        return suc
+            table = get_move_table()
+            combs = [crds for idx in self.legal_entries(hand)
+                     for crds in table.cards(idx, hand.mask)]
+        combs.sort(key=lambda crds: crds.power)
+        return combs
+
+    def _filter_responses(self, combinations):
+        """ Returns the combinations that can be added to the Stack. """
+        # all combinations can be played on empty stack
+        if not self.cards:
+            return [crds for type_combs in combinations
+                    for crds in type_combs]
+        # same type and higher power (equal length for sequences)
+        size = None
+        if self.type == 'straight' or self.type == 'pair_seq':
+            size = self.cards[-1].size
+        combs = [crds for crds in combinations[COMB_TYPES[self.type]]
+                 if crds.power > self.power and
+                 (size is None or crds.size == size) and
+                 # Dog can only be played as first card
+                 crds.mask != DOG_MASK]
+        # special moves: Phoenix can be played on solo (except Dragon)
+        if self.type == 'solo' and self.power < 15:
+            combs.extend(crds for crds in combinations[COMB_TYPES['solo']]
+                         if crds.mask == PHOENIX_MASK)
+        # bombs can be played any time
+        for bomb in BOMBS:
+            if self.type != bomb:
+                combs.extend(crds for crds in combinations[COMB_TYPES[bomb]]
+                             if crds.power > self.power)
+        return combs
+
+    def legal_entries(self, hand):
+        """
+        Returns the move table indices of the legal combinations of hand.
+
+        Only the combination types that can be played upon the Stack
+        are looked up in the move table.
+        """
+        table = get_move_table()
+        # all combinations can be played on empty stack
+        if not self.cards:
+            return table.select(hand.mask, range(len(COMB_TYPES)))
+        # same type and higher power (equal length for sequences)
+        size = None
+        if self.type == 'straight' or self.type == 'pair_seq':
+            size = self.cards[-1].size
+        entries = table.select(hand.mask, [COMB_TYPES[self.type]],
+                               self.power, size)
+        if self.type == 'solo':
+            # Dog can only be played as first card
+            dog = table.entry_index[(DOG_MASK, COMB_TYPES['solo'])]
+            entries = [idx for idx in entries if idx != dog]
+            # special moves: Phoenix can be played on solo (except Dragon)
+            if self.power < 15 and hand.phoenix_flag:
+                entries.insert(0, table.entry_index[(PHOENIX_MASK,
+                                                     COMB_TYPES['solo'])])
+        # bombs can be played any time
+        for bomb in BOMBS:
+            if self.type != bomb:
+                entries.extend(table.select(hand.mask, [COMB_TYPES[bomb]],
+                                            self.power))
+        return entries
 
     @staticmethod
     def check_valid_move(old_cards, new_cards):
@@ -0,0 +1,423 @@
+""" This module contains vectors of Tichu Envs with batched steps. """
+
+import os
+import random
+import traceback
+import multiprocessing as mp
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from env.env import ACTION_MODES, ActionMask, Env
+from env.move_table import get_move_table
+
+
+def _table_layout(n_envs, action_mode='cards'):
+    """ Returns (name, shape, dtype, offset) of each array and the size. """
+    if action_mode == 'cards':
+        actions = ('actions', (n_envs, 56), np.int8)
+    else:
+        actions = ('actions', (n_envs,), np.int64)
+    layout = (actions,
+              ('states', (n_envs, 4, 4, 58), np.int8),
+              ('rewards', (n_envs, 4), np.int64),
+              ('dones', (n_envs,), bool),
+              ('active_players', (n_envs,), np.int64),
+              ('card_masks', (n_envs, 56), np.int8),
+              ('comb_masks', (n_envs, get_move_table().size+1), bool))
+    specs = list()
+    offset = 0
+    for name, shape, dtype in layout:
+        specs.append((name, shape, dtype, offset))
+        nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        # keep every array 8-byte aligned
+        offset += -(-nbytes // 8) * 8
+    return specs, offset
+
+
+def table_arrays(n_envs, buffer=None, action_mode='cards'):
+    """
+    Returns the action and result arrays of n_envs tables.
+
+    The arrays are views of buffer (e.g. of shared memory) if it is
+    given, else they are newly allocated. The actions are OHE Cards or
+    indices, depending on the action_mode of the Envs.
+    """
+    specs, _ = _table_layout(n_envs, action_mode)
+    if buffer is None:
+        return {name: np.zeros(shape, dtype)
+                for name, shape, dtype, _ in specs}
+    return {name: np.ndarray(shape, dtype, buffer=buffer, offset=offset)
+            for name, shape, dtype, offset in specs}
+
+
+class VecEnv():
+    """
+    Runs N Tichu Envs (tables) side by side with batched step and reset.
+
+    Each table is an Env with array states. The results of all tables
+    are stacked into preallocated arrays, so that an Agent can act on
+    all tables with one forward pass. A table whose game has finished
+    is reset right away: its done flag and rewards belong to the
+    finished game, its state and active player to the new game.
+
+    The returned arrays are read-only views that are overwritten by
+    the next step (copy them to keep them, e.g. in a replay buffer).
+
+    Attributes
+    ----------
+    n_envs: int
+      The number of tables.
+    envs: list of Env
+      The Envs of the tables.
+    state_size: int
+      The size of the state dimension of a single Player.
+    action_size: int
+      The size of the action dimension.
+    states: np.ndarray of int8
+      The states of all Players of each table, shape (n_envs, 4, 4, 58).
+    rewards: np.ndarray of int64
+      The rewards of each table, shape (n_envs, 4).
+    dones: np.ndarray of bool
+      Whether the game of each table finished in the last step.
+    active_players: np.ndarray of int64
+      The active Player of each table.
+    action_mask: ActionMask
+      The stacked legal action masks of the active Players (only if
+      return_action_mask is set).
+
+    Methods
+    -------
+    reset():
+      Starts new games on all tables.
+    step(actions):
+      Takes a step with the active Player on each table.
+    active_states():
+      Returns the state of the active Player of each table.
+    """
+
+    def __init__(self, n_envs, return_action_mask=False, arrays=None,
+                 **env_kwargs):
+        """
+        Constructs a VecEnv of n_envs tables.
+
+        Parameter
+        ---------
+        n_envs: int
+          The number of tables.
+        return_action_mask: bool
+          If true, reset() and step() also return the stacked legal
+          action masks.
+        arrays: dict of np.ndarray
+          The arrays the results are written to, as returned by
+          table_arrays() (e.g. views of shared memory). Allocated if None.
+        env_kwargs:
+          Further arguments of Env (e.g. illegal_move_penalty, sinks).
+        """
+        self.n_envs = n_envs
+        self.return_action_mask = return_action_mask
+        self.envs = [Env(return_action_mask=return_action_mask,
+                         array_state=True, **env_kwargs)
+                     for _ in range(n_envs)]
+        self.state_size, self.action_size = self.envs[0].info()
+        if arrays is None:
+            arrays = table_arrays(n_envs)
+        self._states = arrays['states']
+        self._rewards = arrays['rewards']
+        self._dones = arrays['dones']
+        self._active_players = arrays['active_players']
+        self.states = self._read_only(self._states)
+        self.rewards = self._read_only(self._rewards)
+        self.dones = self._read_only(self._dones)
+        self.active_players = self._read_only(self._active_players)
+        self.action_mask = None
+        if return_action_mask:
+            self._card_masks = arrays['card_masks']
+            self._comb_masks = arrays['comb_masks']
+            self.action_mask = ActionMask(self._read_only(self._card_masks),
+                                          self._read_only(self._comb_masks))
+
+    def reset(self):
+        """ Starts new games on all tables. """
+        self._rewards.fill(0)
+        self._dones.fill(False)
+        for idx, env in enumerate(self.envs):
+            self._reset_table(idx, env)
+        return self._results()
+
+    def step(self, actions):
+        """
+        Takes a step with the active Player on each table.
+
+        Parameter
+        ---------
+        actions: np.ndarray
+          One OHE Cards action per table, shape (n_envs, 56), or one
+          index per table (see Env.action_mode).
+        """
+        for idx, env in enumerate(self.envs):
+            _, rewards, done, _ = env.step(self._active_players[idx],
+                                           actions[idx])[:4]
+            self._rewards[idx] = rewards
+            self._dones[idx] = done
+            if done:
+                self._reset_table(idx, env)
+            else:
+                self._write_table(idx, env)
+        return self._results()
+
+    def active_states(self):
+        """ Returns the state of the active Player of each table. """
+        return self._states[np.arange(self.n_envs), self._active_players]
+
+    def _reset_table(self, idx, env):
+        """ Starts a new game on table idx. """
+        env.reset()
+        self._write_table(idx, env)
+
+    def _write_table(self, idx, env):
+        """ Copies the state, active Player and mask of table idx. """
+        self._states[idx] = env.state
+        self._active_players[idx] = env.game.active_player
+        if self.return_action_mask:
+            self._card_masks[idx] = env.action_mask.cards
+            self._comb_masks[idx] = env.action_mask.combinations
+
+    def _results(self):
+        """ Returns the results of reset() and step(). """
+        if self.return_action_mask:
+            return (self.states, self.rewards, self.dones,
+                    self.active_players, self.action_mask)
+        return self.states, self.rewards, self.dones, self.active_players
+
+    @staticmethod
+    def _read_only(array):
+        """ Returns a read-only view of an array. """
+        view = array.view()
+        view.flags.writeable = False
+        return view
+
+
+class SubprocVecEnv(VecEnv):
+    """
+    Runs N Tichu Envs (tables) in worker processes.
+
+    Each worker process owns a VecEnv of a contiguous slice of the
+    tables. The actions and all results live in one shared memory
+    block: step() writes the actions to it and only sends a short
+    command to each worker over a pipe, the workers write states,
+    rewards, done flags, active players and masks of their tables
+    directly to the block. Nothing is pickled per step.
+
+    Results are returned like by VecEnv. The workers are stopped by
+    close() (a SubprocVecEnv can be used as a context manager). Errors of
+    workers are raised as RuntimeError, if a worker dies, all workers
+    are stopped.
+
+    Attributes
+    ----------
+    n_envs: int
+      The number of tables.
+    n_workers: int
+      The number of worker processes.
+
+    Methods
+    -------
+    reset():
+      Starts new games on all tables.
+    step(actions):
+      Takes a step with the active Player on each table.
+    active_states():
+      Returns the state of the active Player of each table.
+    close():
+      Stops the workers and releases the shared memory.
+    """
+
+    def __init__(self, n_envs, n_workers=None, return_action_mask=False,
+                 seed=None, start_method=None, **env_kwargs):
+        """
+        Constructs a SubprocVecEnv of n_envs tables.
+
+        Parameter
+        ---------
+        n_envs: int
+          The number of tables.
+        n_workers: int
+          The number of worker processes (number of CPUs if None).
+        return_action_mask: bool
+          If true, reset() and step() also return the stacked legal
+          action masks.
+        seed: int
+          Worker i deals with a random generator seeded by seed + i.
+          Workers are seeded from the OS if None.
+        start_method: str
+          The multiprocessing start method (default of the platform if
+          None).
+        env_kwargs:
+          Further arguments of Env (e.g. illegal_move_penalty).
+        """
+        self.n_envs = n_envs
+        self.n_workers = min(n_envs, n_workers or os.cpu_count())
+        self.return_action_mask = return_action_mask
+        action_mode = env_kwargs.get('action_mode', 'cards')
+        if action_mode not in ACTION_MODES:
+            raise ValueError('Unknown action mode: {}'.format(action_mode))
+        specs, nbytes = _table_layout(n_envs, action_mode)
+        shapes = {name: shape for name, shape, _, _ in specs}
+        self.state_size = int(np.prod(shapes['states'][2:]))
+        if action_mode == 'cards':
+            self.action_size = shapes['actions'][1]
+        elif action_mode == 'combination':
+            self.action_size = shapes['comb_masks'][1]
+        else:
+            self.action_size = None
+        self._shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        arrays = table_arrays(n_envs, self._shm.buf, action_mode)
+        self._actions = arrays['actions']
+        self._states = arrays['states']
+        self._active_players = arrays['active_players']
+        self.states = self._read_only(arrays['states'])
+        self.rewards = self._read_only(arrays['rewards'])
+        self.dones = self._read_only(arrays['dones'])
+        self.active_players = self._read_only(arrays['active_players'])
+        self.action_mask = None
+        if return_action_mask:
+            self.action_mask = ActionMask(
+                self._read_only(arrays['card_masks']),
+                self._read_only(arrays['comb_masks']))
+        # start workers upon contiguous slices of the tables
+        context = mp.get_context(start_method)
+        bounds = np.linspace(0, n_envs, self.n_workers+1).astype(int)
+        self._conns = list()
+        self._procs = list()
+        for wid in range(self.n_workers):
+            conn, worker_conn = context.Pipe()
+            proc = context.Process(
+                target=_worker, daemon=True,
+                args=(worker_conn, self._shm.name, n_envs, bounds[wid],
+                      bounds[wid+1], return_action_mask,
+                      None if seed is None else seed + wid, env_kwargs))
+            proc.start()
+            worker_conn.close()
+            self._conns.append(conn)
+            self._procs.append(proc)
+        self._closed = False
+
+    def reset(self):
+        """ Starts new games on all tables. """
+        self._command('reset')
+        return self._results()
+
+    def step(self, actions):
+        """
+        Takes a step with the active Player on each table.
+
+        Parameter
+        ---------
+        actions: np.ndarray
+          One OHE Cards action per table, shape (n_envs, 56), or one
+          index per table (see Env.action_mode).
+        """
+        self._command('step', actions)
+        return self._results()
+
+    def close(self):
+        """ Stops the workers and releases the shared memory. """
+        if self._closed:
+            return
+        self._closed = True
+        for conn in self._conns:
+            try:
+                conn.send('close')
+            except (BrokenPipeError, OSError):
+                pass
+        for proc in self._procs:
+            proc.join(timeout=5)
+            if proc.is_alive():
+                proc.terminate()
+        for conn in self._conns:
+            conn.close()
+        # views of the block must be released before it is closed
+        del (self._actions, self._states, self._active_players, self.states,
+             self.rewards, self.dones, self.active_players, self.action_mask)
+        self._shm.close()
+        self._shm.unlink()
+
+    def _command(self, command, actions=None):
+        """
+        Sends a command to all workers and waits for them.
+
+        If a worker has died, the other workers are stopped as well,
+        since their pipes are out of sync.
+        """
+        if self._closed:
+            raise RuntimeError('SubprocVecEnv is closed.')
+        if actions is not None:
+            np.copyto(self._actions, actions, casting='unsafe')
+        try:
+            for conn in self._conns:
+                conn.send(command)
+            errors = [error for error in (conn.recv() for conn in self._conns)
+                      if error is not None]
+        except (EOFError, OSError):
+            self.close()
+            raise RuntimeError('Worker died')
+        if errors:
+            raise RuntimeError('Worker failed:\n' + errors[0])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *unused_args):
+        self.close()
+
+    def __del__(self):
+        if not getattr(self, '_closed', True):
+            self.close()
+
+
+def _worker(conn, shm_name, n_envs, start, stop, return_action_mask, seed,
+            env_kwargs):
+    """ Steps the tables start to stop of a SubprocVecEnv on command. """
+    shm = _attach_shared_memory(shm_name)
+    action_mode = env_kwargs.get('action_mode', 'cards')
+    arrays = {name: array[start:stop] for name, array
+              in table_arrays(n_envs, shm.buf, action_mode).items()}
+    actions = arrays['actions']
+    random.seed(seed)
+    vec_env = VecEnv(stop-start, return_action_mask, arrays=arrays,
+                     **env_kwargs)
+    try:
+        while True:
+            command = conn.recv()
+            if command == 'close':
+                break
+            try:
+                if command == 'step':
+                    vec_env.step(actions)
+                elif command == 'reset':
+                    vec_env.reset()
+                conn.send(None)
+            except Exception:
+                conn.send(traceback.format_exc())
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        del vec_env, arrays, actions
+        shm.close()
+        conn.close()
+
+
+def _attach_shared_memory(name):
+    """ Attaches to a shared memory block created by another process. """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # before Python 3.13, attaching registers the block with the
+        # resource tracker, which would unlink it when the worker exits
+        register = resource_tracker.register
+        resource_tracker.register = lambda *unused_args: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
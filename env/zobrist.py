@@ -0,0 +1,197 @@
+""" This module contains Zobrist hashing of Tichu Game positions. """
+
+import random
+
+from env.cards import COMB_NAMES
+
+# All keys are drawn from a fixed seed, so that hashes are the same in
+# every process and can be used to dedupe data across runs.
+_RNG = random.Random(0x7ac4)
+
+
+def _keys(*shape):
+    """ Returns nested lists of random 64-bit keys. """
+    if len(shape) == 1:
+        return [_RNG.getrandbits(64) for _ in range(shape[0])]
+    return [_keys(*shape[1:]) for _ in range(shape[0])]
+
+
+# One key per Card in each Players' hand
+CARD_KEYS = _keys(4, 56)
+# XOR of the card keys of every byte of a hand mask
+_BYTE_KEYS = [[[0] * 256 for _ in range(7)] for _ in range(4)]
+for _pid in range(4):
+    for _pos in range(7):
+        for _byte in range(1, 256):
+            _low = _byte & -_byte
+            _BYTE_KEYS[_pid][_pos][_byte] = (
+                _BYTE_KEYS[_pid][_pos][_byte ^ _low] ^
+                CARD_KEYS[_pid][8*_pos + _low.bit_length() - 1])
+# Leading Player (None is the last entry), active Player, pass counter
+LEADING_KEYS = _keys(5)
+ACTIVE_KEYS = _keys(4)
+PASS_KEYS = _keys(4)
+# Player who finished on each position
+FINISHED_KEYS = _keys(4, 4)
+# Stack top, keys are drawn on first use of a (type, size, power)
+_STACK_KEYS = dict()
+_STACK_TYPE_KEYS = _keys(len(COMB_NAMES) + 1)
+
+
+def hand_key(player_id, mask):
+    """ Returns the XOR of the card keys of a hand mask of player_id. """
+    byte_keys = _BYTE_KEYS[player_id]
+    key = 0
+    pos = 0
+    while mask:
+        key ^= byte_keys[pos][mask & 255]
+        mask >>= 8
+        pos += 1
+    return key
+
+
+def stack_key(stack):
+    """ Returns the key of the top of a Stack (0 for an empty Stack). """
+    if not stack.cards:
+        return 0
+    top = (stack.type, stack.cards[-1].size, stack.power)
+    try:
+        return _STACK_KEYS[top]
+    except KeyError:
+        # derived from the top, so that keys do not depend on the order
+        # in which stack tops occur
+        key = _STACK_TYPE_KEYS[COMB_NAMES.index(top[0])]
+        key = _mix(key ^ (top[1] << 32) ^ round(top[2] * 10))
+        _STACK_KEYS[top] = key
+        return key
+
+
+def turn_key(leading_player, active_player, pass_counter):
+    """ Returns the key of the turn data of a Game. """
+    if leading_player is None:
+        leading_player = 4
+    return (LEADING_KEYS[leading_player] ^ ACTIVE_KEYS[active_player] ^
+            PASS_KEYS[pass_counter])
+
+
+def zobrist_hash(game):
+    """
+    Computes the Zobrist hash of a Game position from scratch.
+
+    The hash covers the hands, the top of the stack (type, size and
+    power), the leading and active Player, the pass counter and the
+    order of finished Players. Game maintains the same hash
+    incrementally in Game.zobrist.
+    """
+    key = turn_key(game.leading_player, game.active_player,
+                   game.pass_counter)
+    key ^= stack_key(game.stack)
+    for pid, player in enumerate(game.players):
+        key ^= hand_key(pid, player.hand.mask)
+    for pos, pid in enumerate(game.players_finished):
+        key ^= FINISHED_KEYS[pos][pid]
+    return key
+
+
+def _mix(key):
+    """ Scrambles a 64-bit integer (splitmix64 finalizer). """
+    key = (key ^ (key >> 30)) * 0xbf58476d1ce4e5b9 & 0xffffffffffffffff
+    key = (key ^ (key >> 27)) * 0x94d049bb133111eb & 0xffffffffffffffff
+    return key ^ (key >> 31)
+
+
+class TranspositionTable():
+    """
+    A hash-keyed table of position evaluations with bounded memory.
+
+    The table has a fixed number of slots, a position is stored in the
+    slot given by the low bits of its Zobrist hash. When two positions
+    share a slot, the entry of the current search or with the greater
+    depth is kept (depth-preferred replacement with aging, see
+    new_search()). Lookups compare the full hash, so entries of other
+    positions are never returned.
+
+    Attributes
+    ----------
+    size: int
+      The number of slots (a power of 2).
+    hits: int
+      The number of lookups that found their position.
+    misses: int
+      The number of lookups that did not find their position.
+
+    Methods
+    -------
+    get(key, default):
+      Returns the value stored for a hash, or default.
+    store(key, value, depth):
+      Stores the value of a hash, if the replacement policy allows it.
+    new_search():
+      Marks all stored entries as old, so they are replaced first.
+    clear():
+      Removes all entries and resets the counters.
+    """
+
+    def __init__(self, size_bits=16):
+        """
+        Constructs an empty TranspositionTable.
+
+        Parameter
+        ---------
+        size_bits: int
+          The table has 2**size_bits slots.
+        """
+        self.size = 1 << size_bits
+        self.hits = 0
+        self.misses = 0
+        self._index_mask = self.size - 1
+        self._generation = 0
+        self.clear()
+
+    def __len__(self):
+        return self.size - self._keys.count(None)
+
+    def __contains__(self, key):
+        return self._keys[key & self._index_mask] == key
+
+    def get(self, key, default=None):
+        """ Returns the value stored for a hash, or default. """
+        slot = key & self._index_mask
+        if self._keys[slot] == key:
+            self.hits += 1
+            return self._values[slot]
+        self.misses += 1
+        return default
+
+    def store(self, key, value, depth=0):
+        """
+        Stores the value of a hash in its slot.
+
+        An entry of another position is only replaced if it is from an
+        earlier search or was not searched deeper. Returns whether the
+        value was stored.
+        """
+        slot = key & self._index_mask
+        old_key = self._keys[slot]
+        if (old_key is not None and old_key != key and
+                self._generations[slot] == self._generation and
+                self._depths[slot] > depth):
+            return False
+        self._keys[slot] = key
+        self._values[slot] = value
+        self._depths[slot] = depth
+        self._generations[slot] = self._generation
+        return True
+
+    def new_search(self):
+        """ Marks all stored entries as old, so they are replaced first. """
+        self._generation += 1
+
+    def clear(self):
+        """ Removes all entries and resets the counters. """
+        self._keys = [None] * self.size
+        self._values = [None] * self.size
+        self._depths = [0] * self.size
+        self._generations = [0] * self.size
+        self.hits = 0
+        self.misses = 0
@@ -0,0 +1,98 @@
+# pytest test cases for class BatchGame
+
+import random
+
+import numpy as np
+
+from env.batch_game import BatchGame
+from env.cards import Cards
+from env.game import Game
+from env.kernel import GameKernel
+
+def _kernel_copy(batch, row):
+    kernel = GameKernel(batch.hands[row].tolist())
+    for name in ('points', 'tichu', 'tichu_points', 'finished', 'turn',
+                 'stack'):
+        getattr(kernel, name)[:] = getattr(batch, name)[row]
+    return kernel
+
+def test_deal():
+    batch = BatchGame(8, seed=0)
+    assert (np.bitwise_or.reduce(batch.hands, axis=1) == 2**56-1).all()
+    for hands in batch.hands.tolist():
+        assert [bin(hand).count('1') for hand in hands] == [14] * 4
+    assert (batch.turn[:, 0] == -1).all()
+
+def test_tichu_calls(monkeypatch):
+    # Tichu is called at deal time like in Game
+    batch = BatchGame(64, seed=7)
+    assert batch.tichu.any()
+    for row in range(64):
+        class Deck():
+            def shuffle_and_deal(self):
+                return [Cards.from_mask(hand)
+                        for hand in batch.hands[row].tolist()]
+        monkeypatch.setattr('env.game.Deck', Deck)
+        game = Game()
+        assert ([plr.tichu_flag for plr in game.players] ==
+                batch.tichu[row].astype(bool).tolist())
+
+def test_tichu_settlement(monkeypatch):
+    # active Player and the next Player call, first finish settles
+    monkeypatch.setattr('env.game.TICHU_THRESHOLD', float('-inf'))
+    random.seed(8)
+    batch = BatchGame(16, seed=8)
+    active = batch.turn[:, 1]
+    assert (batch.tichu.sum(axis=1) == 2).all()
+    assert (batch.tichu[np.arange(16), active] == 1).all()
+    assert (batch.tichu[np.arange(16), (active + 1) % 4] == 1).all()
+    callers = batch.tichu.copy()
+    n_settled = 0
+    while n_settled < 16:
+        batch.step(batch.random_actions())
+        settled = (batch.finished[:, 0] >= 0) & (callers.sum(axis=1) > 0)
+        for row in np.flatnonzero(settled).tolist():
+            first = batch.finished[row, 0]
+            for pid in np.flatnonzero(callers[row]).tolist():
+                tichu = 100 if pid == first else -100
+                assert batch.tichu_points[row, pid] == tichu
+            assert not batch.tichu[row].any()
+            callers[row] = 0
+            n_settled += 1
+
+def test_differential():
+    # every game of the batch follows the rules of GameKernel
+    random.seed(5)
+    batch = BatchGame(16, seed=5)
+    kernels = [_kernel_copy(batch, row) for row in range(16)]
+    n_done = 0
+    for it in range(600):
+        if it % 2:
+            actions = batch.random_actions()
+        else:
+            actions = batch.greedy_actions()
+        # random card sets are mostly invalid
+        row = random.randrange(16)
+        actions[row] = (int(batch.hands[row, random.randrange(4)]) &
+                        random.getrandbits(56))
+        player_ids = batch.turn[:, 1].tolist()
+        codes = batch.step(actions)
+        for row, kernel in enumerate(kernels):
+            assert kernel.step(player_ids[row],
+                               int(actions[row])) == codes[row]
+            assert (kernel.reward == batch.reward[row]).all()
+            if batch.done[row]:
+                n_done += 1
+                kernels[row] = _kernel_copy(batch, row)
+            else:
+                assert (kernel.hands == batch.hands[row]).all()
+                assert (kernel.points == batch.points[row]).all()
+                assert (kernel.turn == batch.turn[row]).all()
+                assert (kernel.stack == batch.stack[row]).all()
+    assert n_done > 0
+
+def test_random_actions_legal():
+    random.seed(6)
+    batch = BatchGame(32, seed=6)
+    for _ in range(200):
+        assert (batch.step(batch.random_actions()) >= 0).all()
@@ -1,11 +1,17 @@
 # pytest test cases for class Card
 
+import pickle
+
 import pytest
 
+from env.card import Card
+
 # test logical operators
 
 def test_logical_eq(Spd_2, Hrt_2):
-    assert (Spd_2 == Hrt_2) == True
+    # Cards are only equal to themselves (same power is not enough)
+    assert (Spd_2 == Hrt_2) == False
+    assert (Spd_2 == Card(name='2', suit='Spade')) == True
 
 def test_logical_ge(Dia_2, Clb_2):
     assert (Dia_2 >= Clb_2) == True
@@ -61,3 +67,17 @@ def test_points_Special(Phoenix, Dragon, Majong, Dog):
     assert Dragon.points == 25
     assert Majong.points == 0
     assert Dog.points == 0
+
+# test interned instances
+
+def test_interned(Dragon, Clb_K):
+    assert Card(name='Dragon', suit='Special') is Dragon
+    assert Card.from_index(Clb_K.index) is Clb_K
+    assert pickle.loads(pickle.dumps(Clb_K)) is Clb_K
+    assert hash(Clb_K) == Clb_K.index
+    assert len({Card.from_index(idx) for idx in range(56)}) == 56
+
+def test_immutable(Spd_A):
+    with pytest.raises(AttributeError):
+        Spd_A.power = 20
+    assert Spd_A.power == 14
@@ -218,6 +218,14 @@ def test_remove_0(Spd_10, Hrt_10, Phoenix, Dragon):
     assert remove_0.power == 10
     assert remove_0.remove(Phoenix) == False
 
+def test_remove_all(Spd_10, Hrt_10, Phoenix, Dragon):
+    remove_1 = Cards([Spd_10, Hrt_10, Phoenix, Dragon])
+    assert remove_1.remove_all(Cards([Dragon, Phoenix])) == True
+    assert (remove_1.type, remove_1.size, remove_1.power) == ('pair', 2, 10)
+    assert remove_1.points == 20 and not remove_1.phoenix_flag
+    assert remove_1.remove_all(Cards([Spd_10, Dragon])) == False
+    assert remove_1.size == 2
+
 # test other cards functions
 
 def test_contains_0(hand_0, Spd_10, Hrt_10):
@@ -232,10 +240,10 @@ def test_avail_comb_0(hand_0):
     assert len(avail_combs[1]) == 8
     assert len(avail_combs[2]) == 2
     assert len(avail_combs[3]) == 0
-    assert len(avail_combs[4]) == 2
+    assert len(avail_combs[4]) == 1 # Phoenix, 10, 10, J, J (counted once)
     assert len(avail_combs[5]) == 0
     assert len(avail_combs[6]) == 0
-    assert len(avail_combs[7]) == 1
+    assert len(avail_combs[7]) == 5 # 10-J and 4 Phoenix pair sequences
 
 def test_avail_comb_1(hand_6):
     avail_combs = hand_6.get_available_combinations()
@@ -243,7 +251,59 @@ def test_avail_comb_1(hand_6):
     assert len(avail_combs[1]) == 12
     assert len(avail_combs[2]) == 5
     assert len(avail_combs[3]) == 0
-    assert len(avail_combs[4]) == 12
+    assert len(avail_combs[4]) == 9 # incl. K triple with Phoenix pairs
     assert len(avail_combs[5]) == 1
     assert len(avail_combs[6]) == 0
-    assert len(avail_combs[7]) == 3
+    assert len(avail_combs[7]) == 12 # 3 K-A and 9 Phoenix pair sequences
+
+# test bitmask representation
+
+def test_mask_0(hand_0, Spd_10, Hrt_10):
+    assert hand_0.mask & Spd_10.mask
+    assert hand_0.mask & Hrt_10.mask
+    assert bin(hand_0.mask).count('1') == hand_0.size
+
+def test_mask_1(hand_0):
+    from_mask = Cards.from_mask(hand_0.mask)
+    assert from_mask.mask == hand_0.mask
+    assert from_mask.type == hand_0.type
+    assert from_mask.points == hand_0.points
+
+def test_union_difference(pair_0, triple_0):
+    union = pair_0.union(triple_0)
+    assert union.size == 5
+    assert union.type == 'full'
+    assert union.difference(pair_0).mask == triple_0.mask
+    assert union.contains(pair_0) == True
+
+def test_remove_1(Spd_5, Hrt_5):
+    remove_1 = Cards([Spd_5, Hrt_5])
+    assert remove_1.remove(Hrt_5) == True
+    assert remove_1.mask == Spd_5.mask
+    assert remove_1.remove(Hrt_5) == False
+
+def test_reference_typecheck(hand_6):
+    # the signature table agrees with the reference type checks
+    hand = Cards(hand_6.cards)
+    for combs in hand.get_available_combinations():
+        for crds in combs:
+            table = Cards(crds.cards)
+            ref = Cards(crds.cards, 'unk')
+            ref._check_type_and_power()
+            assert (table.type, table.power) == (ref.type, ref.power)
+    ref = Cards(hand.cards, 'unk')
+    ref._check_type_and_power()
+    assert (hand.type, hand.power) == (ref.type, ref.power)
+
+def test_iter_combinations(hand_6):
+    hand = Cards(hand_6.cards)
+    avail_combs = hand.get_available_combinations()
+    fulls = list(hand.iter_combinations('full'))
+    assert [crds.mask for crds in fulls] == [crds.mask for crds in avail_combs[4]]
+    # only higher combinations of the given size are yielded
+    higher = [crds.mask for crds in avail_combs[0] if crds.power > 13]
+    assert [crds.mask for crds in hand.iter_combinations('solo', 13)] == higher
+    assert list(hand.iter_combinations('straight', size=6)) == []
+    # the first combination is found without enumerating all others
+    first = next(hand.iter_combinations('pair'))
+    assert first.type == 'pair' and first.mask == avail_combs[1][0].mask
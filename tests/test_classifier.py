@@ -0,0 +1,75 @@
+# pytest test cases for the batch classifier
+
+import os
+
+import pytest
+import numpy as np
+
+from env.cards import Cards
+from env.classifier import (classify, get_signature_table, mask_signature,
+                            signatures, SignatureTable, TYPE_NAMES)
+from env.codec import masks_to_vecs
+
+# all Cards fixtures of test_cards.py
+CARDS_FIXTURES = (['hand_{}'.format(i) for i in range(7)] +
+                  ['pass_0'] + ['solo_{}'.format(i) for i in range(4)] +
+                  ['pair_{}'.format(i) for i in range(3)] +
+                  ['triple_0', 'triple_1', 'four_0', 'four_1'] +
+                  ['full_{}'.format(i) for i in range(3)] +
+                  ['strt_{}'.format(i) for i in range(8)] +
+                  ['ps_{}'.format(i) for i in range(6)])
+
+def test_agrees_with_cards(request):
+    # fixtures may have been changed by other tests, so the reference
+    # Cards are constructed from their current Cards
+    refs = [Cards(request.getfixturevalue(name).cards)
+            for name in CARDS_FIXTURES]
+    types, powers, sizes, points = classify(
+        masks_to_vecs([ref.mask for ref in refs]))
+    for ref, comb_type, power, size, pts in zip(refs, types, powers,
+                                                 sizes, points):
+        assert TYPE_NAMES[comb_type] == ref.type
+        assert power == ref.power
+        assert size == ref.size
+        assert pts == ref.points
+
+def test_large_sets(Phoenix, Majong):
+    # Phoenix and all ranks from Majong to A is a straight of 15 Cards
+    mask = Majong.mask | Phoenix.mask
+    for rank in range(13):
+        mask |= 1 << 4*rank + rank % 4
+    types, powers, sizes, _ = classify(masks_to_vecs([mask, 2**56-1]))
+    assert [TYPE_NAMES[code] for code in types] == ['straight', 'hand']
+    assert powers[0] == 15 and list(sizes) == [15, 56]
+
+def test_signatures(hand_6):
+    mask = Cards(hand_6.cards).mask
+    assert signatures(masks_to_vecs([mask]))[0] == mask_signature(mask)
+
+def test_cache(tmp_path):
+    cache_file = str(tmp_path / 'signature_table.npz')
+    get_signature_table().save(cache_file)
+    table = SignatureTable.load(cache_file)
+    assert (table.keys == get_signature_table().keys).all()
+    assert (table.powers == get_signature_table().powers).all()
+
+def test_cache_setting(tmp_path, monkeypatch, hand_6):
+    # Cards use the module-level cache file of the signature table
+    table = get_signature_table()
+    comb_type = Cards(hand_6.cards).type
+    cache_file = str(tmp_path / 'signature_table.npz')
+    monkeypatch.setattr('env.classifier.SIGNATURE_TABLE_FILE', cache_file)
+    monkeypatch.setattr('env.classifier._SIGNATURE_TABLE', None)
+    monkeypatch.setattr('env.cards._SIGNATURE_TABLE', None)
+    assert Cards(hand_6.cards).type == comb_type
+    assert os.path.isfile(cache_file)
+    # the next first use loads the saved table
+    monkeypatch.setattr('env.classifier._SIGNATURE_TABLE', None)
+    monkeypatch.setattr('env.cards._SIGNATURE_TABLE', None)
+    monkeypatch.setattr(SignatureTable, '_build', None)
+    assert Cards(hand_6.cards).type == comb_type
+    assert (get_signature_table().keys == table.keys).all()
+
+def test_shape():
+    with pytest.raises(ValueError):
+        classify(np.zeros(56))
@@ -0,0 +1,30 @@
+# pytest test cases for module codec
+
+import pytest
+import numpy as np
+
+from env.cards import Cards
+from env.codec import (cards_to_vec, vec_to_cards, mask_to_vec, vec_to_mask,
+                       masks_to_vecs, vecs_to_masks)
+
+def test_cards_to_vec(hand_6):
+    hand = Cards(hand_6.cards)
+    vec = cards_to_vec(hand)
+    assert vec.shape == (56,)
+    assert vec.sum() == hand.size
+    for card in hand.cards:
+        assert vec[card.index] == 1
+
+def test_roundtrip(Phoenix, Dragon, Majong, Dog, Spd_A, Hrt_2):
+    cards = Cards([Phoenix, Dragon, Majong, Dog, Spd_A, Hrt_2])
+    assert vec_to_cards(cards_to_vec(cards)).mask == cards.mask
+    assert vec_to_mask(mask_to_vec(cards.mask)) == cards.mask
+    assert vec_to_mask(np.zeros(56)) == 0
+
+def test_batched(Phoenix, Dog, Spd_A, Hrt_2):
+    masks = [Cards([Phoenix, Dog]).mask, Cards([Spd_A, Hrt_2]).mask, 0]
+    vecs = masks_to_vecs(masks)
+    assert vecs.shape == (3, 56) and vecs.dtype == np.int8
+    for mask, vec in zip(masks, vecs):
+        assert (vec == mask_to_vec(mask)).all()
+    assert [int(m) for m in vecs_to_masks(vecs)] == masks
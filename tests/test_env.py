@@ -1,10 +1,16 @@
 # pytest test cases for class Env
 
+import random
+
 import pytest
 import numpy as np
 
+from env.codec import cards_to_vec
+from env.cards import COMB_TYPES
 from env.env import Env
+from env.move_table import get_move_table
 from utils import play_greedy_game
+from agents.heuristic.greedy import greedyAgent
 
 TEST_N_ENV = 1000
 
@@ -28,3 +34,161 @@ def test_env():
     while game_cnt < TEST_N_ENV:
         play_greedy_game(verbose=False)
         game_cnt += 1
+
+def test_env_action_mask():
+    env = Env(return_action_mask=True)
+    state, _, _, active_player, action_mask = env.reset()
+    # every hand card can be played on the empty stack, pass is illegal
+    assert (action_mask.cards == state[active_player][0][2]).all()
+    assert action_mask.combinations[:-1].any()
+    assert not action_mask.combinations[-1]
+    # a legal move from the mask is accepted by the environment
+    crds = [crds for crds in env.game.legal_moves(active_player)
+            if crds.cards[0].name != 'Dog'][0]
+    action = np.array(env._cards_to_vec(crds))
+    _, rewards, _, next_player, action_mask = env.step(active_player, action)
+    assert next_player != active_player
+    assert action_mask.combinations[-1]
+
+def _flatten(state):
+    """ Flattens a list state of Env. """
+    return np.array([[[size, flag, *cards] for size, flag, cards in rows]
+                     for rows in state]).reshape(-1)
+
+def test_env_array_state():
+    agent = greedyAgent()
+    for seed in range(20):
+        random.seed(seed)
+        list_env = Env()
+        list_state, _, _, active_player = list_env.reset()
+        random.seed(seed)
+        array_env = Env(array_state=True)
+        array_state, _, _, _ = array_env.reset()
+        assert array_state.shape == (4, 4, 58)
+        assert array_state.dtype == np.int8
+        assert not array_state.flags.writeable
+        done = False
+        while not done:
+            # the array holds the flattened list state
+            assert (array_state.reshape(-1) ==
+                    _flatten(list_state)).all()
+            action = agent.act(array_state[active_player])
+            list_state, rewards, done, next_player = list_env.step(
+                active_player, action)
+            # the same array is patched in place
+            assert array_env.step(active_player, action)[0] is array_state
+            assert array_env.rewards == rewards
+            active_player = next_player
+
+def test_env_lazy_state():
+    agent = greedyAgent()
+    for seed in range(20):
+        random.seed(seed)
+        list_env = Env()
+        list_state, _, _, active_player = list_env.reset()
+        random.seed(seed)
+        lazy_env = Env(lazy_state=True)
+        lazy_state, _, _, _ = lazy_env.reset()
+        done = False
+        while not done:
+            assert lazy_state[active_player] == list_state[active_player]
+            # only the requested perspective is rendered
+            assert sum(lazy_state.rendered(pid) for pid in range(4)) == 1
+            action = agent.act(lazy_state[active_player])
+            list_state, rewards, done, next_player = list_env.step(
+                active_player, action)
+            last_state = lazy_state
+            lazy_state, _, _, _ = lazy_env.step(active_player, action)
+            assert lazy_env.rewards == rewards
+            active_player = next_player
+        assert list(lazy_state) == list_state
+    # perspectives of earlier steps cannot be rendered anymore
+    assert last_state is not lazy_state
+    pid = [pid for pid in range(4) if not last_state.rendered(pid)][0]
+    with pytest.raises(RuntimeError):
+        last_state[pid]
+
+def test_env_legal_actions():
+    for seed in range(10):
+        random.seed(seed)
+        cards_env = Env()
+        cards_state, _, _, active_player = cards_env.reset()
+        random.seed(seed)
+        legal_env = Env(action_mode='legal')
+        legal_state, _, done, _ = legal_env.reset()
+        n_step = 0
+        while not done:
+            assert legal_state == cards_state
+            legal_actions = legal_env.legal_actions
+            assert all(crds.type for crds in legal_actions)
+            action = n_step % len(legal_actions)
+            cards = legal_actions[action]
+            cards_state, rewards, _, next_player = cards_env.step(
+                active_player, np.array(cards_to_vec(cards)))
+            legal_state, legal_rewards, done, _ = legal_env.step(
+                active_player, action)
+            assert legal_rewards == rewards
+            # legal actions are never penalized
+            assert legal_env.game.active_player == next_player
+            assert next_player != active_player or cards.type == 'pass'
+            active_player = next_player
+            n_step += 1
+
+def test_env_combination_actions():
+    env = Env(action_mode='combination', return_action_mask=True)
+    assert env.action_size == len(env.reset()[-1].combinations)
+    table = get_move_table()
+    for _ in range(10):
+        _, _, done, active_player, action_mask = env.reset()
+        # an entry that is not in the hand is an illegal move
+        hand = env.game.players[active_player].hand.mask
+        missing = [idx for idx in range(table.size)
+                   if table.draw(idx, hand) is None][0]
+        _, rewards, _, next_player, _ = env.step(active_player, missing)
+        assert next_player == active_player
+        assert rewards[active_player] == env.illegal_move_penalty
+        while not done:
+            action = random.choice(
+                np.flatnonzero(action_mask.combinations).tolist())
+            n_cards = env.game.players[active_player].hand_size
+            _, rewards, done, next_player, action_mask = env.step(
+                active_player, action)
+            assert rewards[active_player] != env.illegal_move_penalty
+            # the drawn combination is one of the chosen entry
+            if action < table.size:
+                assert (n_cards - env.game.players[active_player].hand_size
+                        == table.sizes[action])
+            active_player = next_player
+
+def test_env_index_actions_out_of_range():
+    for action_mode, n_actions in (('legal', None),
+                                   ('combination', get_move_table().size+1)):
+        env = Env(action_mode=action_mode)
+        _, _, _, active_player = env.reset()
+        if n_actions is None:
+            n_actions = len(env.legal_actions)
+        for action in (n_actions, n_actions + 1, -1, -n_actions):
+            _, rewards, _, next_player = env.step(active_player, action)
+            assert next_player == active_player
+            assert rewards[active_player] == env.illegal_move_penalty
+            assert env.game.players[active_player].hand_size == 14
+        # legal actions of the active player are rejected for others
+        _, rewards, _, next_player = env.step((active_player+1)%4, 0)
+        assert next_player == active_player
+        assert env.game.players[(active_player+1)%4].hand_size == 14
+
+def test_env_combination_keeps_bombs():
+    # straight bomb 2-6 of one suit and another 3: the solo 3 is the
+    # one outside the bomb, the pair of 3s has to break it
+    table = get_move_table()
+    bomb = (1 << 0) | (1 << 4) | (1 << 8) | (1 << 12) | (1 << 16)
+    hand = bomb | (1 << 5)
+    env = Env(action_mode='combination')
+    env.reset()
+    solos = [idx for idx in table.select(hand, [COMB_TYPES['solo']])
+             if 1 << 5 in table.expand(idx, hand)]
+    assert len(solos) == 1
+    for _ in range(10):
+        assert env._choose_combination(solos[0], hand) == 1 << 5
+    pair = table.select(hand, [COMB_TYPES['pair']])[0]
+    assert env._choose_combination(pair, hand) == (1 << 4) | (1 << 5)
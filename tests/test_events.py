@@ -0,0 +1,67 @@
+# pytest test cases for the event log of Game
+
+import json
+import random
+
+from env.cards import Cards
+from env.events import (ConsoleSink, Event, EventLog, JsonlSink,
+                        RingBufferSink, DEAL, PLAY, PASS, GAME_END, INVALID)
+from env.game import Game
+
+def _play_random_game(game):
+    while not game.game_finished:
+        player_id = game.active_player
+        moves = game.legal_moves(player_id)
+        if game.stack.cards:
+            moves.append(Cards([]))
+        game.step(player_id, random.choice(moves))
+
+def test_disabled():
+    assert Game().events is None
+
+def test_ring_buffer():
+    random.seed(7)
+    sink = RingBufferSink(maxlen=100000)
+    game = Game(sinks=[sink])
+    assert [event.kind for event in list(sink.events)[:4]] == [DEAL] * 4
+    assert game.step((game.active_player+1)%4, Cards([]))[0] == False
+    # pass on empty stack is invalid
+    assert game.step(game.active_player, Cards([]))[0] == False
+    assert sink.events[-1].kind == INVALID
+    _play_random_game(game)
+    kinds = [event.kind for event in sink.events]
+    assert kinds[-1] == GAME_END
+    assert sink.events[-1].data['points'] == [plr.points
+                                              for plr in game.players]
+    # every played combination is in the log
+    played = sum(event.data['cards'] for event in sink.events
+                 if event.kind == PLAY)
+    assert played == (2**56 - 1) - sum(plr.hand.mask
+                                       for plr in game.players)
+    small = RingBufferSink(maxlen=3)
+    EventLog([small]).emit(PASS, 0)
+    assert len(small.events) == 1
+
+def test_jsonl(tmp_path):
+    random.seed(8)
+    filename = str(tmp_path / 'events.jsonl')
+    with JsonlSink(filename, buffer_size=7) as sink:
+        buffer = RingBufferSink()
+        game = Game(sinks=[sink, buffer])
+        _play_random_game(game)
+    with open(filename) as jsonl_file:
+        lines = [json.loads(line) for line in jsonl_file]
+    assert len(lines) == len(buffer.events)
+    for line, event in zip(lines, buffer.events):
+        assert line == dict(kind=event.kind, player=event.player,
+                            **event.data)
+
+def test_console(capsys):
+    random.seed(9)
+    game = Game(verbose=1)
+    _play_random_game(game)
+    out = capsys.readouterr().out
+    assert 'Game is finished!' in out
+    assert 'Pass not possible' not in out
+    ConsoleSink(verbose=2).write(Event(INVALID, 1, {'cards': 0}))
+    assert 'Pass not possible' in capsys.readouterr().out
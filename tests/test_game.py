@@ -1,7 +1,12 @@
 # pytest test cases for class Game
 
+import pickle
+import random
+
 import pytest
 
+from env.cards import DOG_MASK, Cards
+from env.game import Game, GameSnapshot
 from utils import play_dumb_game
 
 TEST_N_GAME = 1000
@@ -19,3 +24,120 @@ def test_game():
     while game_cnt < TEST_N_GAME:
         play_dumb_game(verbose=0)
         game_cnt += 1
+
+def _game_state(game):
+    """ Returns everything a step may change as comparable values. """
+    stack = game.stack
+    return (id(stack), [id(crds) for crds in stack.cards], stack.points,
+            stack.power, stack.type, stack.dragon_flag,
+            game.leading_player, game.active_player, game.pass_counter,
+            list(game.players_finished), game.game_finished,
+            list(game.tichu_points),
+            [(plr.points, plr.tichu_flag, plr.finished, plr.hand_size,
+              plr.hand_power, plr.hand.mask, plr.hand.size, plr.hand.type,
+              plr.hand.power, plr.hand.points, plr.hand.phoenix_flag,
+              [crd.index for crd in plr.hand.cards],
+              [[crds.mask for crds in combs] for combs in plr.combinations])
+             for plr in game.players])
+
+def test_apply_undo():
+    random.seed(1)
+    for _ in range(20):
+        game = Game()
+        tokens = [(_game_state(game), None)]
+        while not game.game_finished and len(tokens) < 300:
+            player_id = game.active_player
+            moves = game.legal_moves(player_id)
+            if game.stack.cards:
+                moves.append(Cards([]))
+            state = _game_state(game)
+            # every legal move can be undone
+            for cards in random.sample(moves, min(len(moves), 3)):
+                game.undo(game.apply(player_id, cards))
+                assert _game_state(game) == state
+            token = game.apply(player_id, random.choice(moves))
+            assert token.suc
+            tokens.append((_game_state(game), token))
+        # undo the whole game in reverse order
+        for (state, token), (prev_state, _) in zip(tokens[:0:-1],
+                                                   tokens[-2::-1]):
+            assert _game_state(game) == state
+            game.undo(token)
+            assert _game_state(game) == prev_state
+
+def test_snapshot():
+    random.seed(2)
+    for _ in range(20):
+        game = Game()
+        while not game.game_finished:
+            snapshot = pickle.loads(pickle.dumps(game.snapshot()))
+            clone = Game.from_snapshot(snapshot)
+            assert clone.snapshot() == game.snapshot()
+            # clone and game continue identically
+            for plr, clone_plr in zip(game.players, clone.players):
+                assert clone_plr.hand.size == plr.hand.size
+                assert clone_plr.finished == plr.finished
+            player_id = game.active_player
+            moves = game.legal_moves(player_id)
+            assert ([crds.mask for crds in clone.legal_moves(player_id)] ==
+                    [crds.mask for crds in moves])
+            if game.stack.cards:
+                moves.append(Cards([]))
+            cards = random.choice(moves)
+            result = game.step(player_id, cards)
+            assert clone.step(player_id, cards) == result
+            assert clone.snapshot() == game.snapshot()
+
+def _position(hands, active_player, leading_player=None,
+              players_finished=(), tichu_flags=(False,)*4):
+    """ Returns a Game with an empty Stack in the given position. """
+    return Game.from_snapshot(GameSnapshot(
+        hands=hands, stack=(), stack_power=0, points=(0, 0, 0, 0),
+        tichu_flags=tichu_flags, hand_ratings=(0, 0, 0, 0),
+        leading_player=leading_player, active_player=active_player,
+        pass_counter=0, players_finished=players_finished,
+        game_finished=False, tichu_points=(0, 0, 0, 0)))
+
+def test_tichu_calls_of_player_0(monkeypatch):
+    # every hand qualifies: the first two players in turn call Tichu,
+    # their teammates (including player 0) do not
+    monkeypatch.setattr('env.game.TICHU_THRESHOLD', float('-inf'))
+    for seed in range(8):
+        random.seed(seed)
+        game = Game()
+        first = game.active_player
+        flags = [plr.tichu_flag for plr in game.players]
+        assert flags[first] and flags[(first+1)%4]
+        assert not flags[(first+2)%4] and not flags[(first+3)%4]
+    assert game._get_teammate(0) == 2
+    assert game._get_opponents(0) == [1, 3]
+
+def test_dog_of_player_0():
+    # player 0 (who called Tichu) plays the Dog to teammate 2
+    game = _position(hands=(DOG_MASK | 1, 1 << 4, 1 << 8, 1 << 12),
+                     active_player=0, tichu_flags=(True, False, False, False))
+    suc, _ = game.step(0, Cards.from_mask(DOG_MASK))
+    assert suc
+    assert game.active_player == 2
+    assert game.leading_player == 2
+
+def test_dog_handoff_to_teammate():
+    # teammate 3 and the next player 0 have finished, so the Dog of
+    # player 1 comes back to player 1 (not to leading_player+2)
+    game = _position(hands=(0, DOG_MASK | 1, 1 << 4, 0), active_player=1,
+                     leading_player=1, players_finished=(3, 0))
+    suc, _ = game.step(1, Cards.from_mask(DOG_MASK))
+    assert suc
+    assert game.active_player == 1
+    assert game.leading_player == 1
+
+def test_double_victory_of_finishing_team():
+    # player 0 finishes second with the Dog after teammate 2, the Dog
+    # makes player 3 leading, but team 0 and 2 wins
+    game = _position(hands=(DOG_MASK, 1, 0, 1 << 4), active_player=0,
+                     players_finished=(2,))
+    suc, points_this_step = game.step(0, Cards.from_mask(DOG_MASK))
+    assert suc
+    assert game.game_finished
+    assert points_this_step == [200, 0, 200, 0]
+    assert [plr.points for plr in game.players] == [100, 0, 100, 0]
@@ -0,0 +1,63 @@
+# pytest test cases for class GameKernel
+
+import random
+
+import numpy as np
+
+from env.cards import Cards
+from env.game import Game
+from env.kernel import GameKernel, GAME_FINISHED, WRONG_PLAYER
+
+def _assert_same_state(kernel, game):
+    assert kernel.hands.tolist() == [plr.hand.mask for plr in game.players]
+    assert kernel.points.tolist() == [plr.points for plr in game.players]
+    assert kernel.tichu.tolist() == [plr.tichu_flag for plr in game.players]
+    assert kernel.tichu_points.tolist() == game.tichu_points
+    n_finished = len(game.players_finished)
+    assert kernel.finished[:n_finished].tolist() == game.players_finished
+    assert kernel.turn.tolist() == [
+        -1 if game.leading_player is None else game.leading_player,
+        game.active_player, game.pass_counter, n_finished,
+        game.game_finished]
+    assert kernel.stack[-1] == len(game.stack.cards)
+    assert (kernel.stack[2] == round(game.stack.power * 10) and
+            kernel.stack[3] == game.stack.points and
+            kernel.stack[4] == game.stack.dragon_flag)
+
+def test_differential():
+    # kernel and Game agree on identical deals and moves
+    random.seed(4)
+    for _ in range(100):
+        game = Game()
+        kernel = GameKernel.from_game(game)
+        _assert_same_state(kernel, game)
+        while not game.game_finished:
+            # random card sets (mostly invalid) give the same result
+            pid = random.randrange(4)
+            hand = game.players[pid].hand
+            if hand.size:
+                cards = Cards(random.sample(hand.cards,
+                                            random.randint(1, hand.size)))
+                suc, points = game.step(pid, cards)
+                code = kernel.step(pid, cards.mask)
+                assert (code >= 0) == suc
+                assert kernel.reward.tolist() == points
+                _assert_same_state(kernel, game)
+                if suc:
+                    continue
+            player_id = game.active_player
+            moves = game.legal_moves(player_id)
+            if game.stack.cards:
+                moves.append(Cards([]))
+            cards = random.choice(moves)
+            suc, points = game.step(player_id, cards)
+            code = kernel.step(player_id, cards.mask)
+            assert suc and code >= 0
+            assert kernel.reward.tolist() == points
+            _assert_same_state(kernel, game)
+        assert code == GAME_FINISHED
+
+def test_wrong_player(hand_6):
+    kernel = GameKernel([hand_6.mask, 0, 0, 0])
+    assert kernel.step(1, 0) == WRONG_PLAYER
+    assert not np.any(kernel.reward)
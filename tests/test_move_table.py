@@ -0,0 +1,108 @@
+# pytest test cases for class MoveTable
+
+import pytest
+
+from env.cards import Cards, COMB_TYPES
+from env.move_table import (MoveTable, CombinationCache, get_move_table,
+                            count_mask, count_masks, rank_bitmaps,
+                            suit_bitmaps)
+
+def test_table_size():
+    table = get_move_table()
+    assert table.size == len(table.types) == len(table.powers)
+    assert sum(table.types == COMB_TYPES['four_bomb']) == 13
+    assert sum(table.types == COMB_TYPES['straight_bomb']) == 45
+
+def test_count_mask(pair_0, triple_0):
+    # a pair is contained in a triple of the same rank count-wise
+    assert count_mask(triple_0.mask) == 0b0111 << 44
+    assert count_mask(pair_0.mask) == 0b0011 << 36
+
+def test_types_agree(hand_6):
+    # pre-typed combinations match the type checks of Cards
+    for combs in hand_6.get_available_combinations():
+        for crds in combs:
+            ref = Cards(crds.cards)
+            assert (ref.type, ref.power) == (crds.type, crds.power)
+            assert hand_6.contains(crds)
+
+def test_straight_bomb(strt_4):
+    avail_combs = strt_4.get_available_combinations()
+    assert len(avail_combs[COMB_TYPES['straight']]) == 0
+    assert len(avail_combs[COMB_TYPES['straight_bomb']]) == 1
+
+def test_cache(tmp_path):
+    cache_file = str(tmp_path / 'move_table.npz')
+    get_move_table().save(cache_file)
+    table = MoveTable.load(cache_file)
+    assert (table.need == get_move_table().need).all()
+    assert (table.powers == get_move_table().powers).all()
+
+def test_combination_cache(Spd_10, Hrt_10, Dia_J):
+    cache = CombinationCache(maxsize=2)
+    hand = Cards([Spd_10, Hrt_10, Dia_J])
+    combs = cache.get(hand.mask)
+    assert cache.info() == (0, 1, 2, 1)
+    # another instance with the same cards hits the cache
+    assert cache.get(Cards([Dia_J, Spd_10, Hrt_10]).mask) is combs
+    assert cache.info() == (1, 1, 2, 1)
+    # least recently used entry is evicted
+    cache.get(Spd_10.mask)
+    cache.get(Hrt_10.mask)
+    assert cache.info().currsize == 2
+    cache.get(hand.mask)
+    assert cache.info().misses == 4
+
+def test_cached_combinations_immutable(Spd_10, Hrt_10, Dia_J, Clb_2):
+    cache = CombinationCache(maxsize=2)
+    hand = Cards([Spd_10, Hrt_10, Dia_J])
+    pair = cache.get(hand.mask)[COMB_TYPES['pair']][0]
+    mask = pair.mask
+    # + and - return new Cards and leave the cached entry unchanged
+    assert (pair + Clb_2).size == 3
+    assert (pair - [Spd_10]).size == 1
+    assert pair.mask == mask and pair.size == 2 and len(pair.cards) == 2
+    with pytest.raises(TypeError):
+        pair.remove(Spd_10)
+    with pytest.raises(TypeError):
+        pair.remove_all(Cards([Spd_10]))
+    assert cache.get(hand.mask)[COMB_TYPES['pair']][0].mask == mask
+
+def test_rank_bitmaps(Majong, Spd_2, Hrt_2, Clb_3, Spd_A):
+    mask = Cards([Majong, Spd_2, Hrt_2, Clb_3, Spd_A]).mask
+    presence, pairs = rank_bitmaps(mask)
+    assert presence == 0b10000000000111
+    assert pairs == 0b10
+    assert suit_bitmaps(mask) == [0b10000000000010, 0b10, 0, 0b100]
+
+def test_window_select(Phoenix, Spd_3, Hrt_4, Clb_5, Hrt_7, Spd_7):
+    # Phoenix fills the gap of a straight and the single of a pair_seq
+    table = get_move_table()
+    hand = Cards([Phoenix, Spd_3, Hrt_4, Clb_5, Hrt_7, Spd_7])
+    straights = table.find(hand.mask, [COMB_TYPES['straight']])
+    assert [crds.power for crds in straights] == [7, 7]
+    assert table.find(hand.mask, [COMB_TYPES['pair_seq']]) == []
+    hand = Cards([Phoenix, Spd_3, Hrt_4, Clb_5, Hrt_7])
+    assert len(table.find(hand.mask, [COMB_TYPES['straight']])) == 1
+
+def test_count(hand_6, strt_4):
+    # counts agree with the enumeration, including straight bombs
+    table = get_move_table()
+    for hand in (Cards(hand_6.cards), Cards(strt_4.cards)):
+        counts = table.count(hand.mask)
+        for code, combs in enumerate(hand.get_available_combinations()):
+            assert counts[table.type_slices[code]].sum() == len(combs)
+
+def test_count_masks(hand_6, strt_4, pair_0):
+    masks = [hand_6.mask, strt_4.mask, pair_0.mask]
+    assert count_masks(masks).tolist() == [count_mask(m) for m in masks]
+
+def test_draw(strt_4, hand_6):
+    # straights of a single suit are only available as straight bombs
+    table = get_move_table()
+    hand = Cards(strt_4.cards)
+    for idx in table.match(hand.mask):
+        drawn = table.draw(idx, hand.mask)
+        assert (drawn is not None) == bool(table.expand(idx, hand.mask))
+        if drawn is not None:
+            assert drawn in table.expand(idx, hand.mask)
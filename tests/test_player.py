@@ -1,7 +1,11 @@
 # pytest test cases for class Player
 
+import random
+from collections import Counter
+
 import pytest
 
+from env.card import Card
 from env.cards import Cards
 
 def test_assign(player_0, hand_0):
@@ -32,3 +36,48 @@ def test_finish(player_1, hand_1, Clb_J, Dia_J, Phoenix, Dog):
     assert player_1.move(comb) == True
     assert player_1.remove_cards(comb) == True
     assert player_1.has_finished() == True
+
+def test_combination_index(player_1, hand_6, Hrt_K, Hrt_A):
+    player_1.assign_hand(Cards(hand_6.cards))
+    assert player_1.remove_cards(Cards([Hrt_K])) == True
+    assert player_1.remove_cards(Cards([Hrt_A])) == True
+    # index is updated by delta and matches a new enumeration
+    expected = Cards(player_1.hand.cards).get_available_combinations()
+    for index_combs, new_combs in zip(player_1.combinations, expected):
+        assert ({crds.mask for crds in index_combs} ==
+                {crds.mask for crds in new_combs})
+
+def test_random_move(player_1, Phoenix, Spd_2, Hrt_2, Clb_3, Hrt_4, Dia_5):
+    player_1.assign_hand(Cards([Phoenix, Spd_2, Hrt_2, Clb_3, Hrt_4, Dia_5]))
+    flattened = {crds.mask for type_combs in player_1.combinations
+                 for crds in type_combs}
+    # same distribution as a random choice from all combinations
+    random.seed(0)
+    n_draws = 200 * len(flattened)
+    draws = Counter(player_1.random_move().mask for _ in range(n_draws))
+    assert set(draws) == flattened
+    assert all(abs(cnt - 200) < 60 for cnt in draws.values())
+    # type weights restrict the types that are played
+    for _ in range(20):
+        assert player_1.random_move({'pair': 1}).type == 'pair'
+
+@pytest.mark.parametrize('names, rating', [
+    # straight bomb 3-7 of Hearts (missed by the old enumeration)
+    (['10 Club', '10 Heart', '3 Heart', '4 Club', '4 Heart', '5 Heart',
+      '6 Heart', '7 Club', '7 Heart', '8 Spade', 'A Club', 'K Dia',
+      'K Heart', 'Phoenix Special'], 117.5),
+    (['2 Club', '2 Dia', '3 Club', '3 Heart', '7 Spade', '8 Club',
+      '8 Heart', 'A Dia', 'A Heart', 'J Club', 'K Dia', 'K Heart',
+      'Phoenix Special', 'Q Dia'], 94.4),
+    (['10 Club', '10 Dia', '10 Heart', '3 Heart', '4 Spade', '5 Club',
+      '5 Dia', '7 Heart', 'A Dia', 'A Spade', 'J Club', 'K Heart',
+      'Phoenix Special', 'Q Dia'], 86.67543859649122),
+    (['2 Dia', '3 Club', '4 Spade', '8 Spade', 'Dragon Special', 'J Dia',
+      'J Heart', 'J Spade', 'K Club', 'K Heart', 'Majong Special',
+      'Phoenix Special', 'Q Heart', 'Q Spade'], 78.14705882352942)])
+def test_hand_rating(player_0, names, rating):
+    # pins the ratings TICHU_THRESHOLD is tuned against
+    hand = Cards([Card(name=name, suit=suit)
+                  for name, suit in map(str.split, names)])
+    player_0.assign_hand(hand)
+    assert player_0.hand_rating == pytest.approx(rating)
@@ -59,3 +59,48 @@ def test_check_valid_move_4(strt_2, strt_1):
 
 def test_check_valid_move_5(strt_1, strt_0):
     assert Stack.check_valid_move(strt_1, strt_0) == False
+
+def test_legal_responses_0(Spd_10, Hrt_10, Phoenix, Dragon, Dia_J, solo_0):
+    hand = Cards([Spd_10, Hrt_10, Phoenix, Dragon, Dia_J])
+    # empty stack: all combinations of hand, sorted by power
+    stack = Stack()
+    legal = stack.legal_responses(hand)
+    n_combs = sum(len(combs) for combs in hand.get_available_combinations())
+    assert len(legal) == n_combs
+    assert [crds.power for crds in legal] == sorted(
+        crds.power for crds in legal)
+    # solo Ace: only Phoenix and Dragon
+    stack.add(solo_0)
+    legal = stack.legal_responses(hand)
+    assert [crds.cards[0].name for crds in legal] == ['Phoenix', 'Dragon']
+
+def test_legal_responses_1(Clb_J, Phoenix, Dog, solo_1, four_0, pair_0):
+    stack = Stack()
+    stack.add(solo_1)
+    # Dog can only be played as first card
+    legal = stack.legal_responses(Cards([Clb_J, Phoenix, Dog]))
+    assert all(stack.assert_valid_move(crds) for crds in legal)
+    assert [crds.cards[0].name for crds in legal] == ['Phoenix', 'J']
+    # bombs beat everything and are the highest responses
+    legal = stack.legal_responses(four_0)
+    assert [crds.type for crds in legal] == ['solo']*4 + ['four_bomb']
+    stack = Stack()
+    stack.add(pair_0)
+    assert [crds.type for crds in stack.legal_responses(four_0)] == [
+        'four_bomb']
+
+def test_running_aggregates(Spd_3, Phoenix, Dragon, Spd_K, Hrt_5):
+    # incremental points, power and dragon flag agree with a full update
+    stack = Stack()
+    for cards in ([Hrt_5], [Spd_K], [Phoenix], [Dragon]):
+        power = stack.validate(Cards(cards))
+        assert power is not None
+        stack.push(Cards(cards), power)
+        aggregates = (stack.points, stack.power, stack.type, stack.dragon_flag)
+        stack._update()
+        if cards == [Phoenix]:
+            stack.power = 13.5
+        assert aggregates == (stack.points, stack.power, stack.type,
+                              stack.dragon_flag)
+    assert stack.validate(Cards([Spd_3])) is None
+    assert stack.assert_valid_move(Cards([Spd_3])) == False
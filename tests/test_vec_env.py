@@ -0,0 +1,113 @@
+# pytest test cases for class VecEnv
+
+import random
+
+import numpy as np
+import pytest
+
+from env.codec import cards_to_vec
+from env.env import ILLEGAL_MOVE_PENALTY, Env
+from env.vec_env import SubprocVecEnv, VecEnv
+
+N_ENVS = 6
+
+def _lowest_move(env, player_id):
+    # the lowest legal move, or a pass
+    moves = env.game.legal_moves(player_id)
+    if moves and (not env.game.stack.cards or len(moves) % 3):
+        return cards_to_vec(moves[0])
+    return np.zeros(56, dtype=int)
+
+def test_vec_env():
+    random.seed(3)
+    vec_env = VecEnv(N_ENVS, return_action_mask=True)
+    states, rewards, dones, active_players, mask = vec_env.reset()
+    random.seed(3)
+    envs = [Env(array_state=True, return_action_mask=True)
+            for _ in range(N_ENVS)]
+    results = [env.reset() for env in envs]
+    assert states.shape == (N_ENVS, 4, 4, 58)
+    assert not states.flags.writeable
+    n_done = 0
+    for it in range(400):
+        for idx, env in enumerate(envs):
+            state, _, _, active_player, env_mask = results[idx]
+            assert (states[idx] == state).all()
+            assert active_players[idx] == active_player
+            assert (mask.cards[idx] == env_mask.cards).all()
+            assert (mask.combinations[idx] == env_mask.combinations).all()
+            assert (vec_env.active_states()[idx] == state[active_player]).all()
+        actions = np.array([_lowest_move(env, env.game.active_player)
+                            for env in envs])
+        # an illegal move (pass or Cards of another hand) once in a while
+        if it % 7 == 0:
+            actions[it % N_ENVS] = 1 - actions[it % N_ENVS]
+        # tables are dealt again in the same order by both
+        rng_state = random.getstate()
+        states, rewards, dones, active_players, mask = vec_env.step(actions)
+        random.setstate(rng_state)
+        for idx, env in enumerate(envs):
+            results[idx] = env.step(env.game.active_player, actions[idx])
+            assert (rewards[idx] == results[idx][1]).all()
+            assert dones[idx] == results[idx][2]
+            if results[idx][2]:
+                results[idx] = env.reset()
+                n_done += 1
+    assert n_done > 0
+
+def test_subproc_vec_env():
+    # each worker deals like a VecEnv of its tables seeded by seed + i
+    n_workers = 2
+    with SubprocVecEnv(N_ENVS, n_workers, return_action_mask=True,
+                       seed=11) as subproc_env:
+        states, rewards, dones, active_players, mask = subproc_env.reset()
+        vec_envs = list()
+        rng_states = list()
+        for wid in range(n_workers):
+            random.seed(11 + wid)
+            vec_envs.append(VecEnv(N_ENVS // n_workers,
+                                   return_action_mask=True))
+            vec_envs[-1].reset()
+            rng_states.append(random.getstate())
+        n_done = 0
+        for _ in range(200):
+            for wid, vec_env in enumerate(vec_envs):
+                rows = slice(wid * 3, (wid+1) * 3)
+                assert (states[rows] == vec_env.states).all()
+                assert (rewards[rows] == vec_env.rewards).all()
+                assert (dones[rows] == vec_env.dones).all()
+                assert (active_players[rows] == vec_env.active_players).all()
+                assert (mask.combinations[rows] ==
+                        vec_env.action_mask.combinations).all()
+            envs = [env for vec_env in vec_envs for env in vec_env.envs]
+            actions = np.array([_lowest_move(env, env.game.active_player)
+                                for env in envs])
+            states, rewards, dones, active_players, mask = subproc_env.step(
+                actions)
+            for wid, vec_env in enumerate(vec_envs):
+                random.setstate(rng_states[wid])
+                vec_env.step(actions[wid * 3:(wid+1) * 3])
+                rng_states[wid] = random.getstate()
+            n_done += dones.sum()
+        assert n_done > 0
+
+def test_subproc_vec_env_combination_actions():
+    with SubprocVecEnv(4, 2, return_action_mask=True, seed=2,
+                       action_mode='combination') as subproc_env:
+        _, _, _, _, mask = subproc_env.reset()
+        for _ in range(100):
+            actions = mask.combinations.argmax(axis=1)
+            _, rewards, _, _, mask = subproc_env.step(actions)
+            assert (rewards > ILLEGAL_MOVE_PENALTY).all()
+
+def test_subproc_vec_env_worker_died():
+    subproc_env = SubprocVecEnv(4, 2, seed=0)
+    assert (subproc_env.state_size, subproc_env.action_size) == Env().info()
+    subproc_env.reset()
+    subproc_env._procs[0].terminate()
+    subproc_env._procs[0].join()
+    with pytest.raises(RuntimeError, match='Worker died'):
+        subproc_env.step(np.zeros((4, 56)))
+    # the env is closed, later steps fail the same way
+    with pytest.raises(RuntimeError):
+        subproc_env.step(np.zeros((4, 56)))
@@ -0,0 +1,56 @@
+# pytest test cases for Zobrist hashing and TranspositionTable
+
+import random
+
+from env.cards import Cards
+from env.game import Game
+from env.zobrist import TranspositionTable, hand_key, zobrist_hash
+
+def test_hand_key(Phoenix, Spd_2, Dog):
+    mask = Cards([Phoenix, Spd_2, Dog]).mask
+    assert hand_key(0, mask) == (hand_key(0, Phoenix.mask) ^
+                                 hand_key(0, Spd_2.mask) ^
+                                 hand_key(0, Dog.mask))
+    assert hand_key(0, mask) != hand_key(1, mask)
+    assert hand_key(0, 0) == 0
+
+def test_incremental_hash():
+    random.seed(3)
+    for _ in range(20):
+        game = Game()
+        seen = {game.zobrist}
+        while not game.game_finished:
+            assert game.zobrist == zobrist_hash(game)
+            player_id = game.active_player
+            moves = game.legal_moves(player_id)
+            if game.stack.cards:
+                moves.append(Cards([]))
+            # undo restores the hash
+            before = game.zobrist
+            token = game.apply(player_id, random.choice(moves))
+            assert game.zobrist not in seen
+            seen.add(game.zobrist)
+            game.undo(token)
+            assert game.zobrist == before
+            game.step(player_id, random.choice(moves))
+        assert game.zobrist == zobrist_hash(game)
+        clone = Game.from_snapshot(game.snapshot())
+        assert clone.zobrist == game.zobrist
+
+def test_transposition_table():
+    table = TranspositionTable(size_bits=2)
+    assert table.size == 4 and len(table) == 0
+    assert table.store(5, 'a', depth=2)
+    assert 5 in table and table.get(5) == 'a'
+    # 9 shares the slot of 5, shallower entries do not replace it
+    assert not table.store(9, 'b', depth=1)
+    assert 9 not in table and table.get(9) is None
+    assert table.store(9, 'b', depth=2)
+    assert table.get(9) == 'b' and table.get(5, 'x') == 'x'
+    # entries of an earlier search are always replaced
+    table.new_search()
+    assert table.store(13, 'c', depth=0)
+    assert len(table) == 1
+    assert (table.hits, table.misses) == (2, 2)
+    table.clear()
+    assert len(table) == 0 and table.hits == 0
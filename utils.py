@@ -1,5 +1,9 @@
 # Utility functions for Python Implementation of Tichu
 
+import random
+import time
+import tracemalloc
+
 # import all
 from env.card import Card
 from env.cards import Cards
@@ -10,19 +14,10 @@ from env.game import Game
 from env.env import Env
 from agents.heuristic.greedy import greedyAgent
 
-COMB_TYPES = {'solo': 0,
-              'pair': 1,
-              'triple': 2,
-              'four_bomb': 3,
-              'full': 4,
-              'straight': 5,
-              'straight_bomb': 6,
-              'pair_seq': 7}
-
 def play_dumb_game(max_steps=1000, verbose=1):
     """
     This function plays a Tichu game with four "dumb" players.
-    Each player iterates over all available combinations and tries to beat opponents.
+    Each player plays the lowest legal combination to beat opponents.
     New stacks are played with a random combination.
     """
     game = Game(verbose=verbose)
@@ -40,23 +35,12 @@ def play_dumb_game(max_steps=1000, verbose=1):
             suc, _ = game.step(active_player, comb)
         # try to make a matching move if opponent is leading
         elif ((active_player+leading_player)%2) !=0:
-            leading_type = game.stack.type
-            leading_idx = COMB_TYPES[leading_type]
-            avail_comb = game.players[active_player].hand.get_available_combinations()
-            # try to play, starting with lowest combination
-            suc = False
-            if avail_comb[leading_idx]:
-                for i in range(len(avail_comb[leading_idx])):
-                    suc, _ = game.step(active_player, avail_comb[leading_idx][i])  
-                    if suc:
-                        break
-            # Try to bomb if no combination exists
-            if not(suc) and avail_comb[COMB_TYPES['four_bomb']]:
-                suc, _ = game.step(active_player, avail_comb[COMB_TYPES['four_bomb']][0])
-            elif not(suc) and avail_comb[COMB_TYPES['straight_bomb']]:
-                suc, _ = game.step(active_player, avail_comb[COMB_TYPES['straight_bomb']][0])
+            # play lowest legal combination (bombs are the highest)
+            legal_moves = game.legal_moves(active_player)
+            if legal_moves:
+                suc, _ = game.step(active_player, legal_moves[0])
             # pass if nothing works
-            elif not(suc):
+            else:
                 suc, _ = game.step(active_player, Cards([]))
         # pass if teammate is leading player
         else:
@@ -79,7 +63,7 @@ def play_greedy_game(verbose=True):
     (This should not happen when environment and greedyAgent is bugfree.)
     """
     agent = greedyAgent()
-    env = Env(train_mode=not(verbose))
+    env = Env(train_mode=not(verbose), lazy_state=True)
     state, rewards, done, active_player = env.reset()
     conseq_active_counter = 0
     cummulative_reward = [0, 0, 0, 0]
@@ -127,3 +111,58 @@ def set_tichu_percentage(threshold):
                 print('Player calls Tichu with a hand rating of {:.1f}.'.format(score))
                 print('\n')
     print('Tichu percentage: {:.2f}'.format(tichu_cnt/100))
+
+def benchmark_game_step(n_games=20, seed=0, verbose=True):
+    """
+    Microbenchmark of Game.step in games with random legal moves.
+
+    Moves are chosen before each step, so only the step is measured.
+    The games are played twice with the same seed: once to measure
+    the time per step, and once under tracemalloc to measure the
+    memory allocated per step (peak) and kept after it (net).
+    Returns a dict with the number of steps and the means per step.
+    """
+    def run(measure):
+        random.seed(seed)
+        steps = 0
+        for _ in range(n_games):
+            game = Game()
+            while not game.game_finished:
+                player_id = game.active_player
+                moves = game.legal_moves(player_id)
+                if game.stack.cards:
+                    moves.append(Cards([]))
+                measure(game, player_id, random.choice(moves))
+                steps += 1
+        return steps
+
+    elapsed = [0.]
+    def timed_step(game, player_id, cards):
+        start = time.perf_counter()
+        game.step(player_id, cards)
+        elapsed[0] += time.perf_counter() - start
+
+    allocated = [0, 0]
+    def traced_step(game, player_id, cards):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        game.step(player_id, cards)
+        current, peak = tracemalloc.get_traced_memory()
+        allocated[0] += peak - before
+        allocated[1] += current - before
+
+    steps = run(timed_step)
+    tracemalloc.start()
+    try:
+        run(traced_step)
+    finally:
+        tracemalloc.stop()
+    result = {'steps': steps,
+              'us_per_step': 1e6 * elapsed[0] / steps,
+              'peak_bytes_per_step': allocated[0] / steps,
+              'net_bytes_per_step': allocated[1] / steps}
+    if verbose:
+        print('{steps} steps: {us_per_step:.1f} us, '
+              '{peak_bytes_per_step:.0f} bytes allocated (peak), '
+              '{net_bytes_per_step:.0f} bytes kept per step'.format(**result))
+    return result